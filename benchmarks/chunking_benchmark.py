@@ -0,0 +1,119 @@
+"""
+Micro-benchmark for the chunkers, run on the bundled shareholder letters.
+
+Compares the two original chunkers from week_3/shareholder_letters with the
+boundary-aware engine in common/chunking.py (measured in characters and in
+tokens), and checks that the engine scales linearly by chunking the corpus
+repeated several times.
+
+Usage:
+    python benchmarks/chunking_benchmark.py [--repeat 5] [--scale 1 4 16]
+"""
+
+import argparse
+import glob
+import os
+import re
+import sys
+import time
+
+# Make the repository's shared `common` package importable when run as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.batch_embedder import make_token_counter
+from common.chunking import iter_chunk_spans
+
+LETTERS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..",
+                       "week_3", "shareholder_letters", "solution", "letters", "*.txt")
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+SENTENCE_END = re.compile(r"[.!?][\"')\]]*$")
+
+
+def paragraph_chunker(content, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """The original shareholder_letters/start chunker (overlap counted in paragraphs)."""
+    chunks = []
+    current_chunk = []
+    current_length = 0
+    for para in content.split('\n\n'):
+        para = para.strip()
+        if not para:
+            continue
+        if current_chunk and (current_length + len(para) > chunk_size):
+            chunks.append('\n\n'.join(current_chunk))
+            overlap_start = max(0, len(current_chunk) - chunk_overlap // 100)
+            current_chunk = current_chunk[overlap_start:]
+            current_length = sum(len(p) for p in current_chunk) + 2 * len(current_chunk)
+        current_chunk.append(para)
+        current_length += len(para) + 2
+    if current_chunk:
+        chunks.append('\n\n'.join(current_chunk))
+    return chunks
+
+
+def window_chunker(content, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """The original shareholder_letters/solution chunker (fixed character windows)."""
+    chunks = []
+    for i in range(0, len(content), chunk_size - chunk_overlap):
+        start = i - chunk_overlap if i > 0 else 0
+        chunk_content = content[start:start + chunk_size]
+        if chunk_content:
+            chunks.append(chunk_content)
+    return chunks
+
+
+def engine_chunker(length_fn):
+    def chunker(content):
+        return [text for _, _, text in iter_chunk_spans([content], CHUNK_SIZE, CHUNK_OVERLAP, length_fn)]
+    return chunker
+
+
+def measure(chunker, texts, repeat):
+    """Best wall time over `repeat` runs, plus the chunks from the last run."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = [chunk for text in texts for chunk in chunker(text)]
+        best = min(best, time.perf_counter() - start)
+    return best, chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement (best is reported)")
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 4, 16],
+                        help="corpus repetition factors for the scaling check")
+    args = parser.parse_args()
+
+    texts = []
+    for path in sorted(glob.glob(LETTERS)):
+        with open(path, "r") as f:
+            texts.append(f.read())
+    corpus_mb = sum(len(text.encode("utf-8")) for text in texts) / 1e6
+    print(f"Corpus: {len(texts)} letters, {corpus_mb:.2f} MB\n")
+
+    count_tokens = make_token_counter()
+    chunkers = {
+        "paragraph (original start)": paragraph_chunker,
+        "window (original solution)": window_chunker,
+        "engine, characters": engine_chunker(len),
+        "engine, tokens": engine_chunker(count_tokens),
+    }
+
+    print(f"{'chunker':<28} {'ms':>8} {'MB/s':>7} {'chunks':>7} {'avg':>6} {'max':>6} {'sentence end':>13}")
+    for name, chunker in chunkers.items():
+        seconds, chunks = measure(chunker, texts, args.repeat)
+        sizes = [len(chunk) for chunk in chunks]
+        ended = sum(1 for chunk in chunks if SENTENCE_END.search(chunk.rstrip()))
+        print(f"{name:<28} {seconds * 1000:>8.2f} {corpus_mb / seconds:>7.1f} {len(chunks):>7} "
+              f"{sum(sizes) // len(sizes):>6} {max(sizes):>6} {ended / len(chunks):>12.0%}")
+
+    print("\nScaling (engine, characters): time per MB should stay flat")
+    for factor in args.scale:
+        scaled = ["\n\n".join(texts * factor)]
+        seconds, _ = measure(engine_chunker(len), scaled, args.repeat)
+        print(f"  x{factor:<3} {corpus_mb * factor:>7.2f} MB  {seconds * 1000:>9.2f} ms  "
+              f"{seconds * 1000 / (corpus_mb * factor):>7.2f} ms/MB")
+
+
+if __name__ == "__main__":
+    main()
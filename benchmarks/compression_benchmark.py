@@ -0,0 +1,67 @@
+"""
+Recall and memory of compressed FAISS indexes against exact float32 search.
+
+Measures dimension truncation, fp16/int8 scalar quantization and product
+quantization with common/index_eval.py. By default the corpus is synthetic:
+clustered vectors whose variance falls off across dimensions, the way it does
+in Matryoshka-trained embeddings. Pass --index to use the vectors of a saved
+FaissVectorStore instead (e.g. week_3/shareholder_letters/start/faiss_index).
+The queries are held out from the corpus, so no query finds itself.
+
+Usage:
+    python benchmarks/compression_benchmark.py [--vectors 20000] [--dimension 1536] [--k 10]
+    python benchmarks/compression_benchmark.py --index week_3/shareholder_letters/start/faiss_index
+"""
+
+import argparse
+import os
+import sys
+
+import numpy
+
+# Make the repository's shared `common` package importable when run as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.index_eval import compression_report, print_report
+
+
+def synthetic_vectors(count, dimension, clusters=200, seed=0):
+    """Clustered vectors with variance decaying across dimensions."""
+    rng = numpy.random.default_rng(seed)
+    scale = 1.0 / numpy.sqrt(1.0 + numpy.arange(dimension) / 32.0)
+    centers = rng.standard_normal((clusters, dimension)) * scale
+    members = centers[rng.integers(0, clusters, count)]
+    noise = rng.standard_normal((count, dimension)) * scale * 0.6
+    return (members + noise).astype("float32")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--index", help="FaissVectorStore directory to read vectors from")
+    parser.add_argument("--namespace", default="chunks", help="namespace within --index")
+    parser.add_argument("--vectors", type=int, default=20000, help="synthetic corpus size")
+    parser.add_argument("--dimension", type=int, default=1536, help="synthetic vector dimension")
+    parser.add_argument("--queries", type=int, default=200, help="vectors held out as queries")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--index-type", default="flat", choices=["flat", "ivf", "hnsw"])
+    args = parser.parse_args()
+
+    if args.index:
+        vectors = numpy.load(os.path.join(args.index, args.namespace or "__default__", "vectors.npy"))
+        print(f"Corpus: {len(vectors)} vectors from {args.index} ({args.namespace})")
+    else:
+        vectors = synthetic_vectors(args.vectors, args.dimension)
+        print(f"Corpus: {len(vectors)} synthetic vectors")
+
+    order = numpy.random.default_rng(1).permutation(len(vectors))
+    held_out = min(args.queries, len(vectors) // 10)
+    queries, corpus = vectors[order[:held_out]], vectors[order[held_out:]]
+    k = min(args.k, len(corpus))
+    print(f"{len(corpus)} x {corpus.shape[1]} dimensions, {len(queries)} queries, {args.index_type} index\n")
+
+    print_report(compression_report(corpus, queries, k, index_type=args.index_type), k)
+    print("\nbytes/vec is the serialized index size per vector; M vec/GB is how many million "
+          "vectors fit in 1 GB of RAM at that size.")
+
+
+if __name__ == "__main__":
+    main()
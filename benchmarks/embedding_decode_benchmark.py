@@ -0,0 +1,101 @@
+"""
+Decoding cost of an embeddings response (common/openai_embeddings.py).
+
+Builds a synthetic embeddings response of --inputs vectors and turns it into
+a float32 matrix three ways:
+- float JSON: "encoding_format": "float", lists of numbers, then numpy.array
+- base64 to lists: what the openai package does by default, base64 decoded
+  into a Python list of floats per vector, then numpy.array
+- base64 to matrix: decode_embeddings, numpy.frombuffer into a preallocated matrix
+
+For each it reports the response size, the time to parse and decode it, and
+the peak memory allocated on the way (tracemalloc).
+
+Usage:
+    python benchmarks/embedding_decode_benchmark.py [--inputs 2048] [--dimensions 1536]
+"""
+
+import argparse
+import array
+import base64
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy
+
+# Make the repository's shared `common` package importable when run as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.openai_embeddings import decode_embeddings
+
+
+def response_body(vectors, encoding):
+    if encoding == "float":
+        # The API sends about 8 significant digits
+        data = [numpy.round(vector, 8).tolist() for vector in vectors.astype("float64")]
+    else:
+        data = [base64.b64encode(vector.astype("<f4").tobytes()).decode("ascii") for vector in vectors]
+    return json.dumps({"object": "list", "model": "text-embedding-3-small",
+                       "data": [{"object": "embedding", "index": row, "embedding": embedding}
+                                for row, embedding in enumerate(data)]}).encode("utf-8")
+
+
+def float_json(body):
+    items = json.loads(body)["data"]
+    return numpy.array([item["embedding"] for item in items], dtype="float32")
+
+
+def base64_to_lists(body):
+    items = json.loads(body)["data"]
+    for item in items:
+        item["embedding"] = array.array("f", base64.b64decode(item["embedding"])).tolist()
+    return numpy.array([item["embedding"] for item in items], dtype="float32")
+
+
+def base64_to_matrix(body, out):
+    return decode_embeddings(json.loads(body)["data"], out)
+
+
+def measure(fn, *args, repeats=5):
+    """(median seconds, peak MB allocated) of fn(*args)."""
+    seconds = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(*args)
+        seconds.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(seconds), peak / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--inputs", type=int, default=2048, help="vectors per response (the API's maximum)")
+    parser.add_argument("--dimensions", type=int, default=1536)
+    args = parser.parse_args()
+
+    rng = numpy.random.default_rng(0)
+    vectors = rng.standard_normal((args.inputs, args.dimensions), dtype="float32")
+    vectors /= numpy.linalg.norm(vectors, axis=1, keepdims=True)
+    float_body = response_body(vectors, "float")
+    base64_body = response_body(vectors, "base64")
+    out = numpy.empty((args.inputs, args.dimensions), dtype="float32")
+    print(f"{args.inputs} x {args.dimensions} embeddings "
+          f"({vectors.nbytes / 1e6:.1f} MB as a float32 matrix)\n")
+    print(f"{'method':<18} {'response MB':>12} {'decode ms':>10} {'peak MB':>8}")
+    for name, fn, fn_args, body in [
+        ("float JSON", float_json, (float_body,), float_body),
+        ("base64 to lists", base64_to_lists, (base64_body,), base64_body),
+        ("base64 to matrix", base64_to_matrix, (base64_body, out), base64_body),
+    ]:
+        seconds, peak = measure(fn, *fn_args)
+        print(f"{name:<18} {len(body) / 1e6:>12.1f} {seconds * 1000:>10.1f} {peak:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
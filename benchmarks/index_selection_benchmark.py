@@ -0,0 +1,55 @@
+"""
+Automatic FAISS index selection (common/index_tuning.py) on a corpus of a given size.
+
+For each corpus size, builds the candidate indexes, tunes nprobe / efSearch
+against exact neighbours of held-out vectors until recall@k reaches the
+target, and prints every candidate with the one chosen: the lowest p99 latency
+among those that reach the target. The corpus is the same synthetic clustered
+data as compression_benchmark.py, or the vectors of a saved FaissVectorStore.
+
+Usage:
+    python benchmarks/index_selection_benchmark.py [--vectors 10000 200000] [--dimension 256]
+        [--target-recall 0.95] [--k 10] [--max-bytes-per-vector 300]
+    python benchmarks/index_selection_benchmark.py --index week_3/shareholder_letters/start/faiss_index
+"""
+
+import argparse
+import os
+import sys
+
+import numpy
+
+# Make the repository's shared `common` package importable when run as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.index_tuning import print_selection, select_index
+
+from compression_benchmark import synthetic_vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--index", help="FaissVectorStore directory to read vectors from")
+    parser.add_argument("--namespace", default="chunks", help="namespace within --index")
+    parser.add_argument("--vectors", type=int, nargs="+", default=[10000, 200000], help="synthetic corpus sizes")
+    parser.add_argument("--dimension", type=int, default=256, help="synthetic vector dimension")
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--max-bytes-per-vector", type=float, help="memory budget per vector")
+    args = parser.parse_args()
+
+    if args.index:
+        corpora = [numpy.load(os.path.join(args.index, args.namespace or "__default__", "vectors.npy"))]
+        print(f"Corpus: {len(corpora[0])} vectors from {args.index} ({args.namespace})")
+    else:
+        corpora = [synthetic_vectors(count, args.dimension) for count in args.vectors]
+
+    for vectors in corpora:
+        vectors = vectors / numpy.linalg.norm(vectors, axis=1, keepdims=True)
+        print(f"\n{len(vectors)} x {vectors.shape[1]} dimensions, target recall@{args.k} {args.target_recall}")
+        _, report = select_index(vectors, args.k, args.target_recall,
+                                 max_bytes_per_vector=args.max_bytes_per_vector, verbose=False)
+        print_selection(report)
+
+
+if __name__ == "__main__":
+    main()
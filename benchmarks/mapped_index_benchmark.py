@@ -0,0 +1,116 @@
+"""
+Cold start and memory use of a memory-mapped index (common/mapped_index.py)
+compared with reading the whole index into every process.
+
+Builds a synthetic flat index of random unit vectors with short texts, then
+starts several worker processes at once for each way of opening it:
+- in-memory: faiss.read_index without flags, texts loaded from a JSON list
+- mapped: MappedIndex, which maps the index and the text table
+
+Each worker opens the index, answers one query, then answers --queries more
+(touching the whole index) and reports:
+- open ms: time to open the index and its texts
+- first query ms: latency of the first query, including page faults
+- private MB: memory only this process can use (RssAnon)
+- shared MB: file pages mapped from the page cache, one copy for all workers (RssFile)
+
+Memory columns need Linux (/proc/self/status).
+
+Usage:
+    python benchmarks/mapped_index_benchmark.py [--vectors 200000] [--dimensions 512] [--workers 4]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy
+
+# Make the repository's shared `common` package importable when run as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.mapped_index import MappedIndex
+
+
+def memory_mb():
+    """(private, shared file-backed) resident memory of this process in MB, or (nan, nan) off Linux."""
+    try:
+        with open("/proc/self/status") as f:
+            fields = dict(line.split(":", 1) for line in f)
+    except OSError:
+        return float("nan"), float("nan")
+    return int(fields["RssAnon"].split()[0]) / 1024, int(fields["RssFile"].split()[0]) / 1024
+
+
+def worker(mode, path, queries, results):
+    import faiss  # Imported up front so it isn't counted as opening time
+
+    start = time.perf_counter()
+    if mode == "mapped":
+        index = MappedIndex(path)
+        search = index.search
+    else:
+        raw = faiss.read_index(os.path.join(path, "index.faiss"))
+        with open(os.path.join(path, "texts.json")) as f:
+            texts = json.load(f)
+
+        def search(vectors, k):
+            _, rows = raw.search(numpy.asarray(vectors, dtype="float32"), k)
+            return [[texts[row] for row in query_rows] for query_rows in rows]
+    open_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    search(queries[:1], 5)
+    first_ms = (time.perf_counter() - start) * 1000
+    search(queries, 5)
+    private, shared = memory_mb()
+    results.put((open_ms, first_ms, private, shared))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--vectors", type=int, default=200_000)
+    parser.add_argument("--dimensions", type=int, default=512)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = numpy.random.default_rng(0)
+    vectors = rng.standard_normal((args.vectors, args.dimensions), dtype="float32")
+    vectors /= numpy.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = vectors[rng.choice(args.vectors, args.queries, replace=False)]
+    texts = [f"Document {row}: a short passage standing in for a chunk of a letter." for row in range(args.vectors)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "index")
+        start = time.perf_counter()
+        MappedIndex.build(path, vectors, [str(row) for row in range(args.vectors)], texts)
+        print(f"Built a flat index of {args.vectors} x {args.dimensions} vectors in "
+              f"{time.perf_counter() - start:.1f}s "
+              f"({os.path.getsize(os.path.join(path, 'index.faiss')) / 1e6:.0f} MB)")
+        with open(os.path.join(path, "texts.json"), "w") as f:
+            json.dump(texts, f)
+        del vectors, texts
+
+        print(f"\n{args.workers} workers per mode, all running at once\n")
+        print(f"{'mode':<10} {'open ms':>9} {'first query ms':>15} {'private MB':>11} {'shared MB':>10}")
+        context = multiprocessing.get_context("spawn")
+        for mode in ("in-memory", "mapped"):
+            results = context.Queue()
+            processes = [context.Process(target=worker, args=(mode, path, queries, results))
+                         for _ in range(args.workers)]
+            for process in processes:
+                process.start()
+            rows = [results.get() for _ in processes]
+            for process in processes:
+                process.join()
+            open_ms, first_ms, private, shared = (statistics.median(column) for column in zip(*rows))
+            print(f"{mode:<10} {open_ms:>9.1f} {first_ms:>15.1f} {private:>11.0f} {shared:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Offline retrieval benchmark over the bundled shareholder letters.
+
+Answers the gold questions in gold_questions.jsonl with every combination of
+chunker and index, using the deterministic HashingEmbedder from
+common/hashing_embedder.py instead of an embeddings API. It needs no API keys
+or network, and the same inputs always give the same scores.
+
+A retrieved chunk counts as relevant when it comes from one of the question's
+"sources" letters and contains one of its "evidence" phrases (whitespace and
+case are ignored). Reported per combination:
+- recall@1 and recall@k: share of questions with a relevant chunk in the top 1 / top k
+- MRR@k: mean reciprocal rank of the first relevant chunk
+- embed and build seconds for the whole corpus
+- p50/p99 latency of one query, embedding included
+
+The engine-tokens chunker counts tokens with tiktoken (see requirements.txt).
+Without it, the token counter falls back to a character estimate whose results
+can't be compared, so those rows are skipped.
+
+Usage:
+    python benchmarks/retrieval_benchmark.py [--k 5] [--dimensions 256]
+        [--chunkers paragraph window engine-chars engine-tokens]
+        [--indexes flat ivf hnsw flat-int8 bm25 hybrid]
+"""
+
+import argparse
+import glob
+import importlib.util
+import json
+import os
+import re
+import sys
+import time
+
+import numpy
+
+# Make the repository's shared `common` package importable when run as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.batch_embedder import make_token_counter
+from common.bm25 import BM25Index, hybrid_search
+from common.hashing_embedder import HashingEmbedder
+from common.vector_store import build_faiss_index
+
+from chunking_benchmark import LETTERS, engine_chunker, paragraph_chunker, window_chunker
+
+GOLD_QUESTIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gold_questions.jsonl")
+CHUNKERS = {
+    "paragraph": lambda: paragraph_chunker,
+    "window": lambda: window_chunker,
+    "engine-chars": lambda: engine_chunker(len),
+    "engine-tokens": lambda: engine_chunker(make_token_counter()),
+}
+# Vector index configurations, as build_faiss_index arguments; "bm25" and "hybrid" are handled separately
+VECTOR_INDEXES = {
+    "flat": {"index_type": "flat"},
+    "ivf": {"index_type": "ivf", "nprobe": 4},
+    "hnsw": {"index_type": "hnsw"},
+    "flat-int8": {"index_type": "flat", "quantization": "int8"},
+}
+
+
+def normalize(text):
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def load_gold(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def chunk_letters(chunker):
+    """(source, text) for every chunk of every letter."""
+    chunks = []
+    for path in sorted(glob.glob(LETTERS)):
+        with open(path, "r") as f:
+            content = f.read()
+        chunks.extend((os.path.basename(path), text) for text in chunker(content))
+    return chunks
+
+
+def relevant_rows(question, chunks):
+    """Positions of the chunks that answer a gold question."""
+    evidence = [normalize(phrase) for phrase in question["evidence"]]
+    return {row for row, (source, text) in enumerate(chunks)
+            if source in question["sources"] and any(phrase in normalize(text) for phrase in evidence)}
+
+
+def make_searcher(name, chunks, vectors, embedder):
+    """Build one index and return a search(question, k) -> row positions function."""
+    if name in ("bm25", "hybrid"):
+        bm25 = BM25Index()
+        for row, (source, text) in enumerate(chunks):
+            bm25.add(str(row), text, {"source": source})
+        # The first search builds the postings lists; count that as build time
+        bm25.search("", 1)
+        index = build_faiss_index(vectors, "flat")
+
+        def vector_search(text, n):
+            scores, rows = index.search(embedder.embed_matrix([text]), n)
+            return [{"id": str(row), "score": float(score), "metadata": {}}
+                    for score, row in zip(scores[0], rows[0]) if row >= 0]
+
+        mode = "lexical" if name == "bm25" else "hybrid"
+
+        def search(question, k):
+            return [int(match["id"]) for match in hybrid_search(question, bm25, vector_search, k, mode=mode)]
+        return search
+
+    index = build_faiss_index(vectors, **VECTOR_INDEXES[name])
+
+    def search(question, k):
+        _, rows = index.search(embedder.embed_matrix([question]), k)
+        return [int(row) for row in rows[0] if row >= 0]
+    return search
+
+
+def evaluate(search, gold, relevant, k):
+    """Recall@1, recall@k, MRR@k and per-query latencies in milliseconds."""
+    hits_at_1 = hits_at_k = reciprocal_ranks = 0.0
+    latencies = []
+    for question, expected in zip(gold, relevant):
+        start = time.perf_counter()
+        rows = search(question["question"], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        for rank, row in enumerate(rows, 1):
+            if row in expected:
+                hits_at_1 += rank == 1
+                hits_at_k += 1
+                reciprocal_ranks += 1.0 / rank
+                break
+    count = len(gold)
+    return hits_at_1 / count, hits_at_k / count, reciprocal_ranks / count, numpy.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--dimensions", type=int, default=256, help="HashingEmbedder output size")
+    parser.add_argument("--chunkers", nargs="+", default=list(CHUNKERS), choices=list(CHUNKERS))
+    parser.add_argument("--indexes", nargs="+", default=list(VECTOR_INDEXES) + ["bm25", "hybrid"],
+                        choices=list(VECTOR_INDEXES) + ["bm25", "hybrid"])
+    parser.add_argument("--gold", default=GOLD_QUESTIONS, help="JSONL of gold questions")
+    args = parser.parse_args()
+
+    chunkers = list(args.chunkers)
+    if "engine-tokens" in chunkers:
+        if importlib.util.find_spec("tiktoken") is None:
+            print("Skipping engine-tokens: tiktoken is not installed (pip install -r requirements.txt)\n")
+            chunkers.remove("engine-tokens")
+        else:
+            import tiktoken
+            encoding = tiktoken.encoding_for_model("text-embedding-3-small").name
+            print(f"engine-tokens counts tokens with tiktoken {tiktoken.__version__} ({encoding})")
+
+    gold = load_gold(args.gold)
+    embedder = HashingEmbedder(dimensions=args.dimensions)
+    print(f"{len(gold)} gold questions, HashingEmbedder with {args.dimensions} dimensions\n")
+    print(f"{'chunker':<14} {'index':<10} {'chunks':>6} {'answerable':>10} {'R@1':>5} {f'R@{args.k}':>5} "
+          f"{f'MRR@{args.k}':>6} {'embed s':>8} {'build s':>8} {'p50 ms':>7} {'p99 ms':>7}")
+
+    for chunker_name in chunkers:
+        chunks = chunk_letters(CHUNKERS[chunker_name]())
+        relevant = [relevant_rows(question, chunks) for question in gold]
+        # Questions whose evidence was split across chunk boundaries can't be found by any index
+        answerable = sum(1 for rows in relevant if rows)
+
+        start = time.perf_counter()
+        vectors = embedder.embed_matrix([text for _, text in chunks])
+        embed_seconds = time.perf_counter() - start
+
+        for index_name in args.indexes:
+            start = time.perf_counter()
+            search = make_searcher(index_name, chunks, vectors, embedder)
+            build_seconds = time.perf_counter() - start
+            recall_1, recall_k, mrr, latencies = evaluate(search, gold, relevant, args.k)
+            print(f"{chunker_name:<14} {index_name:<10} {len(chunks):>6} {answerable:>5}/{len(gold):<4} "
+                  f"{recall_1:>5.2f} {recall_k:>5.2f} {mrr:>6.3f} {embed_seconds:>8.2f} {build_seconds:>8.3f} "
+                  f"{numpy.percentile(latencies, 50):>7.3f} {numpy.percentile(latencies, 99):>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Sharded and batched search of a MappedIndex (common/mapped_index.py,
+common/query_batcher.py).
+
+Builds a synthetic flat index of random unit vectors once for each shard count
+and measures two things:
+- latency: single queries searched one after another. More shards spread one
+  query over more cores, so this only improves on a machine with several.
+- throughput: --clients threads each sending one query at a time, as a query
+  server's request handlers would. "direct" calls index.search for every query.
+  "batched" goes through a QueryBatcher, which searches all waiting queries in
+  one call. The table shows queries per second, latency and the average batch size.
+
+Usage:
+    python benchmarks/sharded_search_benchmark.py [--vectors 100000] [--dimensions 512]
+        [--shards 1 4] [--clients 16] [--queries 2000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy
+
+# Make the repository's shared `common` package importable when run as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.mapped_index import MappedIndex
+from common.query_batcher import QueryBatcher
+
+# FAISS scores a batch of queries against flat vectors with one BLAS matrix product
+# only from this many queries up (its default is 20). On 100k x 512 vectors, a batch
+# of 8 then costs 6.4 ms per query instead of 15, so small batches from a
+# QueryBatcher pay off. Single queries keep the faster one-by-one scan.
+BLAS_MIN_QUERIES = 2
+
+
+def percentiles_ms(seconds):
+    return numpy.percentile(numpy.array(seconds) * 1000, [50, 99])
+
+
+def run_clients(search, queries, clients, k):
+    """Send queries from several threads, one at a time each; returns (seconds, latencies)."""
+    latencies = [[] for _ in range(clients)]
+
+    def client(number):
+        for query in queries[number::clients]:
+            start = time.perf_counter()
+            search(query, k)
+            latencies[number].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client, args=(number,)) for number in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, [latency for client_latencies in latencies for latency in client_latencies]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dimensions", type=int, default=512)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--clients", type=int, default=16, help="threads sending queries at once")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    import faiss
+
+    # A process-wide setting, so it is set here rather than by MappedIndex
+    faiss.cvar.distance_compute_blas_threshold = BLAS_MIN_QUERIES
+
+    rng = numpy.random.default_rng(0)
+    vectors = rng.standard_normal((args.vectors, args.dimensions), dtype="float32")
+    queries = rng.standard_normal((args.queries, args.dimensions), dtype="float32")
+    ids = [str(row) for row in range(args.vectors)]
+    print(f"{args.vectors} x {args.dimensions} flat index, {os.cpu_count()} cores, k={args.k}\n")
+    print(f"{'shards':>6} {'mode':<8} {'queries/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'avg batch':>10}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for shards in sorted(set(args.shards)):
+            path = os.path.join(directory, f"shards-{shards}")
+            index = MappedIndex.build(path, vectors, ids, ids, metric="cosine", shards=shards)
+            index.search(queries[:10], args.k)  # Fault the index in before timing
+
+            latencies = []
+            for query in queries[:200]:
+                start = time.perf_counter()
+                index.search([query], args.k)
+                latencies.append(time.perf_counter() - start)
+            p50, p99 = percentiles_ms(latencies)
+            print(f"{shards:>6} {'single':<8} {len(latencies) / sum(latencies):>10.0f} {p50:>8.2f} {p99:>8.2f} "
+                  f"{1:>10.1f}")
+
+            seconds, latencies = run_clients(lambda query, k: index.search([query], k)[0], queries,
+                                             args.clients, args.k)
+            p50, p99 = percentiles_ms(latencies)
+            print(f"{shards:>6} {'direct':<8} {len(queries) / seconds:>10.0f} {p50:>8.2f} {p99:>8.2f} {1:>10.1f}")
+
+            batcher = QueryBatcher(index.search)
+            seconds, latencies = run_clients(batcher.search, queries, args.clients, args.k)
+            batcher.close()
+            p50, p99 = percentiles_ms(latencies)
+            print(f"{shards:>6} {'batched':<8} {len(queries) / seconds:>10.0f} {p50:>8.2f} {p99:>8.2f} "
+                  f"{batcher.queries / batcher.batches:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
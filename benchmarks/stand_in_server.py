@@ -0,0 +1,75 @@
+"""
+Run a local stand-in for the OpenAI and Pinecone APIs (common/api_stand_in.py).
+
+Replays recorded responses, or synthesizes them, after a delay drawn from a
+latency distribution and with injected errors, so load tests and concurrency
+experiments run offline. Then point the scripts at it:
+
+    export OPENAI_BASE_URL=http://127.0.0.1:8100/v1
+    export PINECONE_CONTROLLER_HOST=http://127.0.0.1:8100
+    export PINECONE_INDEX_HOST=http://127.0.0.1:8100
+
+Usage:
+    python benchmarks/stand_in_server.py --latency chat=lognormal:0.8:0.4 \\
+        --latency embeddings=fixed:0.1 --error-rate chat=0.02
+    python benchmarks/stand_in_server.py --record --cassette api.jsonl \\
+        --pinecone-upstream https://<your-index-host>      # record real responses
+    python benchmarks/stand_in_server.py --cassette api.jsonl --latency default=recorded
+"""
+
+import argparse
+import os
+import sys
+
+# Make the repository's shared `common` package importable when run as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.api_stand_in import DEFAULT_PORT, KINDS, OPENAI_UPSTREAM, run
+
+
+def per_kind(values, convert):
+    """Parse repeated KIND=VALUE options into a dict."""
+    settings = {}
+    for value in values:
+        kind, separator, setting = value.partition("=")
+        if not separator or kind not in KINDS + ["default"]:
+            raise SystemExit(f"Expected KIND=VALUE with KIND one of {', '.join(KINDS)} or default, got {value!r}")
+        settings[kind] = convert(setting)
+    return settings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--cassette", help="JSONL file of recorded responses")
+    parser.add_argument("--record", action="store_true", help="forward requests upstream and record the responses")
+    parser.add_argument("--on-miss", choices=["synthesize", "error"], default="synthesize",
+                        help="what to do when the cassette has no response for a request")
+    parser.add_argument("--latency", action="append", default=[], metavar="KIND=SPEC",
+                        help="e.g. chat=lognormal:0.8:0.4, embeddings=fixed:0.1, default=recorded")
+    parser.add_argument("--error-rate", action="append", default=[], metavar="KIND=RATE",
+                        help="fraction of requests that fail, e.g. chat=0.02")
+    parser.add_argument("--error-statuses", type=int, nargs="+", default=[429, 500, 503])
+    parser.add_argument("--stream-interval", type=float, default=0.01, help="seconds between streamed chunks")
+    parser.add_argument("--reply-words", type=int, default=60, help="length of synthesized chat answers")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--openai-upstream", default=OPENAI_UPSTREAM)
+    parser.add_argument("--pinecone-upstream", help="real index host to record Pinecone requests from")
+    parser.add_argument("--index-name", default="stand-in", help="name GET /indexes lists the local index under")
+    parser.add_argument("--verbose", action="store_true", help="print one line per request")
+    args = parser.parse_args()
+
+    run(args.host, args.port,
+        cassette_path=args.cassette,
+        record=args.record,
+        on_miss=args.on_miss,
+        latency=per_kind(args.latency, str),
+        error_rates=per_kind(args.error_rate, float),
+        error_statuses=tuple(args.error_statuses),
+        stream_interval=args.stream_interval,
+        reply_words=args.reply_words,
+        seed=args.seed,
+        openai_upstream=args.openai_upstream,
+        pinecone_upstream=args.pinecone_upstream,
+        index_name=args.index_name,
+        verbose=args.verbose)
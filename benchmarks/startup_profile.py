@@ -0,0 +1,113 @@
+"""
+Startup profile: how long a script takes to import, broken down by module.
+
+Runs each script's module-level code, but not its ``if __name__ == "__main__"``
+block, in a fresh interpreter under ``python -X importtime``. Reported per script:
+- interpreter start-up and the script's own module code, in seconds
+- the slowest modules it imports directly or through common/, by cumulative time
+- time spent in each top-level package (openai, pinecone, numpy, ...)
+
+No API calls are made unless the script makes them at import time, which is
+what this is meant to catch. Missing API keys only matter for scripts that
+check them at import time; such errors are reported after the profile.
+
+Usage:
+    python benchmarks/startup_profile.py week_3/shareholder_letters/start/main.py \\
+        week_4/observability/start/main.py [--top 15] [--runs 3]
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+MARKER = "startup-profile:"
+# Run in the child interpreter: import the script as a module that is not __main__
+PROFILE_CODE = f"""
+import os, runpy, sys, time, traceback
+path = sys.argv[1]
+sys.path.insert(0, os.path.dirname(path))
+print("{MARKER} start", file=sys.stderr, flush=True)
+start = time.perf_counter()
+try:
+    runpy.run_path(path, run_name="startup_profile")
+    error = ""
+except BaseException as e:
+    error = traceback.format_exception_only(type(e), e)[-1].strip()
+print(f"{MARKER} done {{time.perf_counter() - start}} {{error}}", file=sys.stderr, flush=True)
+"""
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def profile_script(path):
+    """Import a script once in a fresh interpreter and return its timings."""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", PROFILE_CODE, path],
+                            cwd=os.path.dirname(path), capture_output=True, text=True)
+    total = time.perf_counter() - start
+
+    imports = []  # (self us, cumulative us, depth, module), in completion order
+    started = False
+    script_seconds = None
+    error = ""
+    for line in result.stderr.splitlines():
+        if line.startswith(MARKER):
+            words = line[len(MARKER):].split(" ", 3)
+            if words[1] == "start":
+                started = True
+            else:
+                script_seconds = float(words[2])
+                error = words[3] if len(words) > 3 else ""
+            continue
+        match = IMPORT_LINE.match(line)
+        # Imports before the marker belong to interpreter start-up, not the script
+        if match and started:
+            imports.append((int(match.group(1)), int(match.group(2)), len(match.group(3)) // 2,
+                            match.group(4)))
+    if script_seconds is None:
+        error = error or result.stderr.strip().splitlines()[-1]
+        script_seconds = total
+    return {"total": total, "script": script_seconds, "imports": imports, "error": error}
+
+
+def print_profile(path, profile, top):
+    imports = profile["imports"]
+    print(f"{path}")
+    print(f"  {profile['total']:.3f}s in total: {profile['total'] - profile['script']:.3f}s interpreter "
+          f"start-up, {profile['script']:.3f}s importing the script ({len(imports)} modules)")
+
+    # Depth 0 imports are the ones the script (or a module it runs) asked for directly
+    direct = sorted((entry for entry in imports if entry[2] == 0), key=lambda entry: -entry[1])
+    print(f"\n  {'slowest direct imports':<40} {'cumulative ms':>14}")
+    for _, cumulative, _, module in direct[:top]:
+        print(f"  {module:<40} {cumulative / 1000:>14.1f}")
+
+    packages = defaultdict(int)
+    for self_us, _, _, module in imports:
+        packages[module.split(".")[0]] += self_us
+    print(f"\n  {'package':<40} {'self ms':>14}")
+    for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {package:<40} {self_us / 1000:>14.1f}")
+    if profile["error"]:
+        print(f"\n  Importing the script failed: {profile['error']}")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("scripts", nargs="+", help="Python files to profile")
+    parser.add_argument("--top", type=int, default=15, help="rows per table")
+    parser.add_argument("--runs", type=int, default=3, help="imports per script; the fastest is reported")
+    args = parser.parse_args()
+
+    for script in args.scripts:
+        path = os.path.abspath(script)
+        profiles = [profile_script(path) for _ in range(args.runs)]
+        print_profile(script, min(profiles, key=lambda profile: profile["total"]), args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+"""
+Shared helpers for the RAG exercises.
+
+The week folders are meant to be run as plain scripts, so each script that
+uses this package adds the repository root to ``sys.path`` before importing it.
+"""
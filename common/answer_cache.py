@@ -0,0 +1,181 @@
+"""
+Semantic cache of generated answers.
+
+Answers are stored in a SQLite file together with the embedding of the question
+that produced them. A new question whose embedding has cosine similarity of at
+least ``threshold`` with a cached, unexpired question gets that answer back
+without any search or chat call. ``lookup`` first matches the question text
+exactly (ignoring case and whitespace), so a repeated question is answered
+without embedding it at all. Ingestion calls invalidate() so answers never
+outlive the index contents they were built from.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy
+
+DEFAULT_THRESHOLD = float(os.environ.get("ANSWER_CACHE_THRESHOLD", "0.95"))
+DEFAULT_TTL = float(os.environ.get("ANSWER_CACHE_TTL", str(24 * 3600)))
+
+
+def _normalize(embedding: List[float]) -> numpy.ndarray:
+    vector = numpy.asarray(embedding, dtype="float32")
+    norm = numpy.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class AnswerCache:
+    """Answers keyed by question embedding, matched by cosine similarity."""
+
+    def __init__(self, path: str, threshold: float = DEFAULT_THRESHOLD, ttl: float = DEFAULT_TTL):
+        self.path = path
+        self.threshold = threshold
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # (namespace, model) -> (created times, unit question vectors, answers) of the entries with an
+        # embedding, and normalized question -> (created, answer) of all of them; reloaded after any write
+        self._entries: Dict[Tuple[str, str], Tuple[numpy.ndarray, numpy.ndarray, List[str],
+                                                   Dict[str, Tuple[float, str]]]] = {}
+        self._data_version = None
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " namespace TEXT NOT NULL,"
+            " model TEXT NOT NULL,"
+            " query TEXT NOT NULL,"
+            " embedding BLOB NOT NULL,"
+            " answer TEXT NOT NULL,"
+            " created REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS answers_namespace ON answers (namespace, model)")
+        self._db.commit()
+
+    def _load(self, namespace: str, model: str):
+        # data_version changes when another process (e.g. an ingestion run) commits
+        data_version = self._db.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != self._data_version:
+            self._entries.clear()
+            self._data_version = data_version
+        key = (namespace, model)
+        if key not in self._entries:
+            rows = self._db.execute(
+                "SELECT created, query, embedding, answer FROM answers WHERE namespace = ? AND model = ?"
+                " ORDER BY created",
+                (namespace, model),
+            ).fetchall()
+            # Entries stored without an embedding only match their exact text
+            embedded = [row for row in rows if row[2]]
+            created = numpy.array([row[0] for row in embedded], dtype="float64")
+            vectors = (numpy.stack([numpy.frombuffer(row[2], dtype="float32") for row in embedded])
+                       if embedded else numpy.empty((0, 0), dtype="float32"))
+            by_query = {_normalize_query(row[1]): (row[0], row[3]) for row in rows}
+            self._entries[key] = (created, vectors, [row[3] for row in embedded], by_query)
+        return self._entries[key]
+
+    def _match_text(self, query: str, namespace: str, model: str) -> Optional[str]:
+        with self._lock:
+            by_query = self._load(namespace, model)[3]
+        entry = by_query.get(_normalize_query(query))
+        if entry is not None and entry[0] >= time.time() - self.ttl:
+            return entry[1]
+        return None
+
+    def _match_embedding(self, embedding: List[float], namespace: str, model: str) -> Optional[str]:
+        query = _normalize(embedding)
+        with self._lock:
+            created, vectors, answers, _ = self._load(namespace, model)
+        if len(answers) and vectors.shape[1] == query.shape[0]:
+            similarities = vectors @ query
+            # Expired entries can never match
+            similarities[created < time.time() - self.ttl] = -1.0
+            best = int(numpy.argmax(similarities))
+            if similarities[best] >= self.threshold:
+                return answers[best]
+        return None
+
+    def _has_embeddings(self, namespace: str, model: str) -> bool:
+        with self._lock:
+            created = self._load(namespace, model)[0]
+        return bool(numpy.any(created >= time.time() - self.ttl))
+
+    def _count(self, answer: Optional[str]) -> Optional[str]:
+        with self._lock:
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return answer
+
+    def get(self, embedding: List[float], namespace: str, model: str) -> Optional[str]:
+        """Return the cached answer to the most similar unexpired question, or None."""
+        return self._count(self._match_embedding(embedding, namespace, model))
+
+    def lookup(self, query: str, namespace: str, model: str,
+               embed: Callable[[str], List[float]]) -> Tuple[Optional[str], Optional[numpy.ndarray]]:
+        """
+        Return the cached answer to the same or a near-identical question, or None.
+
+        The question text is matched exactly first. embed(query) is only called
+        when that fails and there are unexpired answers to compare embeddings with.
+
+        Returns:
+            (answer, embedding): the embedding is None when embed was not called,
+            so the caller can embed the question later only if it needs to
+        """
+        answer = self._match_text(query, namespace, model)
+        embedding = None
+        if answer is None and self._has_embeddings(namespace, model):
+            embedding = embed(query)
+            answer = self._match_embedding(embedding, namespace, model)
+        return self._count(answer), embedding
+
+    def put(self, query: str, embedding: Optional[List[float]], answer: str, namespace: str, model: str) -> None:
+        """
+        Store an answer and drop expired entries.
+
+        Without an embedding the answer is only found again by its exact question text.
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute("DELETE FROM answers WHERE created < ?", (now - self.ttl,))
+            self._db.execute(
+                "INSERT INTO answers VALUES (?, ?, ?, ?, ?, ?)",
+                (namespace, model, query, b"" if embedding is None else _normalize(embedding).tobytes(),
+                 answer, now),
+            )
+            self._db.commit()
+            self._entries.clear()
+
+    def store_stream(self, pieces: Iterable[str], query: str, embedding: Optional[List[float]],
+                     namespace: str, model: str) -> Iterator[str]:
+        """Pass a streamed answer through, caching the full text once the stream completes."""
+        received = []
+        for piece in pieces:
+            received.append(piece)
+            yield piece
+        self.put(query, embedding, "".join(received), namespace, model)
+
+    def invalidate(self, namespace: Optional[str] = None) -> None:
+        """Forget cached answers for one namespace, or for all of them."""
+        with self._lock:
+            if namespace is None:
+                self._db.execute("DELETE FROM answers")
+            else:
+                self._db.execute("DELETE FROM answers WHERE namespace = ?", (namespace,))
+            self._db.commit()
+            self._entries.clear()
@@ -0,0 +1,534 @@
+"""
+Local stand-in for the OpenAI and Pinecone APIs.
+
+Load tests and concurrency measurements should not need network access or
+spend API credits. This server answers the endpoints the scripts use:
+
+    POST /v1/chat/completions      (streaming and non-streaming)
+    POST /v1/embeddings            (float and base64 encodings)
+    POST /v1/responses             (including responses.parse structured output)
+    POST /vectors/upsert, POST /query, POST /vectors/delete,
+    GET|POST /describe_index_stats, GET /indexes, GET /indexes/<name>,
+    POST /indexes                                                       (Pinecone)
+    GET  /stats                    request counts, injected errors and latency per endpoint
+
+Each answer comes from a cassette when possible, and is synthesized otherwise:
+- Cassette: a JSONL file of recorded responses, keyed by method, path and
+  request body. In record mode every request is forwarded to the real API and
+  the response is appended to the cassette; replay mode serves them back.
+- Synthesized: chat, responses and embeddings are generated deterministically
+  (embeddings with HashingEmbedder, structured output filled in from its JSON
+  schema), and the Pinecone endpoints are served from an in-memory FAISS index.
+  GET /indexes lists that index under ``index_name`` and every name created
+  with POST /indexes, all served at the stand-in's own host.
+
+Every request first waits for a delay drawn from that endpoint's latency
+distribution, and may fail with an injected error (429/500/503 by default) at
+that endpoint's error rate. Waiting is asynchronous, so concurrent requests
+overlap the way they would against the real service.
+
+Point the clients at the stand-in with:
+
+    export OPENAI_BASE_URL=http://127.0.0.1:8100/v1
+    export PINECONE_CONTROLLER_HOST=http://127.0.0.1:8100
+    export PINECONE_INDEX_HOST=http://127.0.0.1:8100
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import random
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy
+
+from common.batch_embedder import make_token_counter
+from common.hashing_embedder import HashingEmbedder
+from common.rag_service import (HTTPError, read_request, send_json, send_response, start_chunked,
+                                write_chunk)
+from common.vector_store import FaissVectorStore
+
+DEFAULT_PORT = 8100
+MAX_BODY_BYTES = 8 * 1024 * 1024
+OPENAI_UPSTREAM = "https://api.openai.com"
+
+# Endpoint kind for each route; latency and error settings are given per kind
+ROUTES = {
+    ("POST", "/v1/chat/completions"): "chat",
+    ("POST", "/v1/embeddings"): "embeddings",
+    ("POST", "/v1/responses"): "responses",
+    ("POST", "/vectors/upsert"): "upsert",
+    ("POST", "/query"): "query",
+    ("POST", "/vectors/delete"): "delete",
+    ("GET", "/describe_index_stats"): "stats",
+    ("POST", "/describe_index_stats"): "stats",
+    ("GET", "/indexes"): "indexes",
+    ("POST", "/indexes"): "create_index",
+}
+KINDS = ["chat", "embeddings", "responses", "upsert", "query", "delete", "stats", "indexes", "create_index"]
+# These change or describe the local index, so they are always served locally
+_LOCAL_KINDS = {"upsert", "delete", "stats", "indexes", "create_index"}
+
+_WORDS = ("the business earns returns on capital that compound over many years while managers "
+          "allocate cash with discipline and insurance float funds investments in wonderful "
+          "companies bought at sensible prices").split()
+
+
+def parse_latency(spec: str) -> Callable[[random.Random, Optional[float]], float]:
+    """
+    Turn a latency spec into a sampler of delays in seconds.
+
+    Specs: "fixed:S", "uniform:LOW:HIGH", "normal:MEAN:SD", "lognormal:MEDIAN:SIGMA",
+    "exponential:MEAN", or "recorded" (the upstream time saved with each cassette entry).
+    """
+    name, _, rest = spec.partition(":")
+    values = [float(value) for value in rest.split(":")] if rest else []
+    shapes = {
+        "fixed": (1, lambda rng, a: a),
+        "uniform": (2, lambda rng, a, b: rng.uniform(a, b)),
+        "normal": (2, lambda rng, mean, sd: rng.gauss(mean, sd)),
+        "lognormal": (2, lambda rng, median, sigma: median * rng.lognormvariate(0.0, sigma)),
+        "exponential": (1, lambda rng, mean: rng.expovariate(1.0 / mean) if mean > 0 else 0.0),
+    }
+    if name == "recorded":
+        return lambda rng, recorded: recorded or 0.0
+    if name not in shapes or len(values) != shapes[name][0]:
+        raise ValueError(f"Bad latency spec {spec!r}; expected e.g. fixed:0.2, uniform:0.1:0.5, "
+                         f"normal:0.3:0.1, lognormal:0.3:0.5, exponential:0.3 or recorded")
+    sample = shapes[name][1]
+    return lambda rng, recorded: max(0.0, sample(rng, *values))
+
+
+def request_key(method: str, path: str, body: bytes) -> str:
+    """Cassette key: the same request always maps to the same key, whatever its JSON key order."""
+    try:
+        canonical = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":")) if body else ""
+    except ValueError:
+        canonical = body.decode("utf-8", "replace")
+    return hashlib.sha256(f"{method} {path} {canonical}".encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """Recorded responses in a JSONL file, one {"key", "kind", "status", "content_type", "body", "seconds"} per line."""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.records: Dict[str, Dict[str, Any]] = {}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # A torn last line from an interrupted recording
+                    self.records[record["key"]] = record
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.records.get(key)
+
+    def put(self, record: Dict[str, Any]) -> None:
+        self.records[record["key"]] = record
+        if self.path:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def example_from_schema(schema: Dict[str, Any], definitions: Optional[Dict[str, Any]] = None) -> Any:
+    """A small value that satisfies a JSON schema, for synthesized structured output."""
+    definitions = definitions if definitions is not None else schema.get("$defs", {})
+    if "$ref" in schema:
+        return example_from_schema(definitions[schema["$ref"].rsplit("/", 1)[-1]], definitions)
+    for key in ("anyOf", "oneOf"):
+        if key in schema:
+            options = [option for option in schema[key] if option.get("type") != "null"] or schema[key]
+            return example_from_schema(options[0], definitions)
+    if "enum" in schema:
+        return schema["enum"][0]
+    kind = schema.get("type")
+    if isinstance(kind, list):
+        kind = next((item for item in kind if item != "null"), "null")
+    if kind == "object":
+        return {name: example_from_schema(value, definitions)
+                for name, value in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [example_from_schema(schema.get("items", {}), definitions)]
+    return {"string": "stand-in", "integer": 1, "number": 1.0, "boolean": True, "null": None}.get(kind, "stand-in")
+
+
+class StandInServer:
+    """
+    Serve recorded or synthesized OpenAI and Pinecone responses with injected latency and errors.
+
+    Args:
+        cassette_path: JSONL file of recorded responses (created in record mode)
+        record: Forward every request upstream and save the responses to the cassette
+        on_miss: "synthesize" a response when the cassette has none, or "error" (404)
+        latency: Latency spec per endpoint kind (see parse_latency); "default" applies to the rest
+        error_rates: Fraction of requests per endpoint kind that fail; "default" applies to the rest
+        error_statuses: Status codes injected errors are drawn from
+        stream_interval: Seconds between streamed chunks
+        reply_words: Length of synthesized chat answers
+        seed: Seed for latency, error and reply sampling, so runs repeat exactly
+        openai_upstream: Where record mode sends OpenAI requests
+        pinecone_upstream: Index host record mode sends Pinecone data-plane requests to
+        index_name: Name GET /indexes lists the in-memory index under
+        verbose: Print one line per request
+    """
+
+    def __init__(self, cassette_path: Optional[str] = None, record: bool = False, on_miss: str = "synthesize",
+                 latency: Optional[Dict[str, str]] = None, error_rates: Optional[Dict[str, float]] = None,
+                 error_statuses: Tuple[int, ...] = (429, 500, 503), stream_interval: float = 0.01,
+                 reply_words: int = 60, seed: int = 0, openai_upstream: str = OPENAI_UPSTREAM,
+                 pinecone_upstream: Optional[str] = None, index_name: str = "stand-in", verbose: bool = False):
+        self.cassette = Cassette(cassette_path)
+        self.record = record
+        self.on_miss = on_miss
+        self.latency = {kind: parse_latency(spec) for kind, spec in (latency or {}).items()}
+        self.error_rates = error_rates or {}
+        self.error_statuses = error_statuses
+        self.stream_interval = stream_interval
+        self.reply_words = reply_words
+        self.openai_upstream = openai_upstream.rstrip("/")
+        self.pinecone_upstream = pinecone_upstream.rstrip("/") if pinecone_upstream else None
+        self.verbose = verbose
+        self.host_url = ""
+        self._rng = random.Random(seed)
+        self._count_tokens = make_token_counter()
+        self._embedders: Dict[int, HashingEmbedder] = {}
+        # Pinecone data plane; in memory only, never saved
+        self.store = FaissVectorStore("")
+        # Every name is served by the same in-memory index
+        self.index_names = [index_name]
+        self._created_dimension = None
+        self._http = None
+        self.stats: Dict[str, Dict[str, Any]] = defaultdict(lambda: {"requests": 0, "errors": 0, "replayed": 0,
+                                                                     "latency_seconds": []})
+
+    # Latency, errors and bookkeeping
+
+    def _setting(self, table: Dict[str, Any], kind: str, default: Any) -> Any:
+        return table.get(kind, table.get("default", default))
+
+    async def _inject(self, kind: str, recorded: Optional[float]) -> Optional[int]:
+        """Wait for the sampled latency; return an error status if this request should fail."""
+        sampler = self._setting(self.latency, kind, None)
+        if sampler is not None:
+            delay = sampler(self._rng, recorded)
+            if delay:
+                await asyncio.sleep(delay)
+        if self._rng.random() < self._setting(self.error_rates, kind, 0.0):
+            return self._rng.choice(self.error_statuses)
+        return None
+
+    def summary(self) -> Dict[str, Any]:
+        """Requests, errors, replays and latency percentiles per endpoint kind."""
+        summary = {}
+        for kind, counts in self.stats.items():
+            latencies = numpy.array(counts["latency_seconds"] or [0.0]) * 1000
+            summary[kind] = {"requests": counts["requests"], "errors": counts["errors"],
+                             "replayed": counts["replayed"],
+                             "p50_ms": round(float(numpy.percentile(latencies, 50)), 1),
+                             "p99_ms": round(float(numpy.percentile(latencies, 99)), 1)}
+        return summary
+
+    # Synthesized OpenAI responses
+
+    def _embedder(self, dimensions: int) -> HashingEmbedder:
+        if dimensions not in self._embedders:
+            # Fewer buckets than the benchmark default keep the projection matrix small at 1536 dimensions
+            self._embedders[dimensions] = HashingEmbedder(dimensions=dimensions, buckets=2 ** 12)
+        return self._embedders[dimensions]
+
+    def _reply_text(self, prompt: str, schema: Optional[Dict[str, Any]]) -> str:
+        if schema is not None:
+            return json.dumps(example_from_schema(schema))
+        # Deterministic per prompt, so replies repeat across runs
+        rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+        words = [rng.choice(_WORDS) for _ in range(self.reply_words)]
+        return "Stand-in answer: " + " ".join(words).capitalize() + "."
+
+    @staticmethod
+    def _message_text(content: Any) -> str:
+        if isinstance(content, str):
+            return content
+        if isinstance(content, list):
+            return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        return ""
+
+    def _embeddings(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        texts = request.get("input", [])
+        if isinstance(texts, str) or (texts and isinstance(texts[0], int)):
+            texts = [texts]
+        texts = [text if isinstance(text, str) else " ".join(map(str, text)) for text in texts]
+        matrix = self._embedder(int(request.get("dimensions") or 1536)).embed_matrix(texts)
+        if request.get("encoding_format") == "base64":
+            values = [base64.b64encode(row.astype("<f4").tobytes()).decode("ascii") for row in matrix]
+        else:
+            values = matrix.tolist()
+        tokens = sum(self._count_tokens(text) for text in texts)
+        return {"object": "list", "model": request.get("model", ""),
+                "data": [{"object": "embedding", "index": position, "embedding": value}
+                         for position, value in enumerate(values)],
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens}}
+
+    def _chat(self, request: Dict[str, Any]) -> Tuple[str, int, int, str]:
+        """(id, prompt tokens, completion tokens, text) of a synthesized chat answer."""
+        messages = request.get("messages", [])
+        prompt = "\n".join(self._message_text(message.get("content")) for message in messages)
+        response_format = request.get("response_format") or {}
+        schema = None
+        if response_format.get("type") == "json_schema":
+            schema = response_format.get("json_schema", {}).get("schema", {})
+        elif response_format.get("type") == "json_object":
+            schema = {"type": "object", "properties": {}}
+        text = self._reply_text(prompt, schema)
+        return (f"chatcmpl-{uuid.uuid4().hex[:24]}", self._count_tokens(prompt),
+                self._count_tokens(text), text)
+
+    def _chat_completion(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        completion_id, prompt_tokens, completion_tokens, text = self._chat(request)
+        return {"id": completion_id, "object": "chat.completion", "created": int(time.time()),
+                "model": request.get("model", ""),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": text}}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens}}
+
+    def _chat_events(self, request: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Server-sent event payloads of a synthesized streamed chat answer."""
+        completion_id, prompt_tokens, completion_tokens, text = self._chat(request)
+        base = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": request.get("model", "")}
+        pieces = [word + " " for word in text.split(" ")]
+        pieces[-1] = pieces[-1].rstrip()
+        events = [{**base, "choices": [{"index": 0, "delta": {"role": "assistant", "content": ""},
+                                        "finish_reason": None}]}]
+        events += [{**base, "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+                   for piece in pieces]
+        events.append({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if (request.get("stream_options") or {}).get("include_usage"):
+            events.append({**base, "choices": [], "usage": {
+                "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens}})
+        return events
+
+    def _response(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        items = request.get("input", "")
+        if isinstance(items, str):
+            prompt = items
+        else:
+            prompt = "\n".join(self._message_text(item.get("content")) for item in items if isinstance(item, dict))
+        prompt = "\n".join(filter(None, [request.get("instructions") or "", prompt]))
+        text_format = (request.get("text") or {}).get("format") or {}
+        schema = text_format.get("schema") if text_format.get("type") == "json_schema" else None
+        text = self._reply_text(prompt, schema)
+        input_tokens, output_tokens = self._count_tokens(prompt), self._count_tokens(text)
+        return {
+            "id": f"resp_{uuid.uuid4().hex[:24]}", "object": "response", "created_at": int(time.time()),
+            "status": "completed", "model": request.get("model", ""),
+            "output": [{"id": f"msg_{uuid.uuid4().hex[:24]}", "type": "message", "status": "completed",
+                        "role": "assistant",
+                        "content": [{"type": "output_text", "text": text, "annotations": []}]}],
+            "parallel_tool_calls": True, "tool_choice": "auto", "tools": [],
+            "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                      "total_tokens": input_tokens + output_tokens,
+                      "input_tokens_details": {"cached_tokens": 0},
+                      "output_tokens_details": {"reasoning_tokens": 0}},
+        }
+
+    # Pinecone, served from the in-memory index
+
+    def _index_model(self, name: str) -> Dict[str, Any]:
+        dimension = self.store.dimension or self._created_dimension or 1536
+        return {"name": name, "dimension": dimension, "metric": "cosine",
+                "host": self.host_url, "vector_type": "dense", "deletion_protection": "disabled",
+                "spec": {"serverless": {"cloud": "aws", "region": "us-east-1"}},
+                "status": {"ready": True, "state": "Ready"}}
+
+    def _pinecone(self, kind: str, request: Dict[str, Any]) -> Dict[str, Any]:
+        namespace = request.get("namespace", "")
+        if kind == "upsert":
+            return {"upsertedCount": self.store.upsert(request.get("vectors", []), namespace)["upserted_count"]}
+        if kind == "delete":
+            self.store.delete(request.get("ids"), namespace, bool(request.get("deleteAll")))
+            return {}
+        if kind == "query":
+            if "vector" not in request:
+                raise HTTPError(400, "The stand-in only supports queries by vector")
+            result = self.store.query(request["vector"], int(request.get("topK", 10)), namespace,
+                                      bool(request.get("includeMetadata")), bool(request.get("includeValues")))
+            return {"namespace": namespace, "matches": result["matches"], "usage": {"readUnits": 1}}
+        if kind == "stats":
+            stats = self.store.describe_index_stats()
+            return {"dimension": stats["dimension"] or self._created_dimension or 0, "indexFullness": 0.0,
+                    "totalVectorCount": stats["total_vector_count"],
+                    "namespaces": {name: {"vectorCount": summary["vector_count"]}
+                                   for name, summary in stats["namespaces"].items()}}
+        raise HTTPError(404, f"No stand-in for {kind}")
+
+    # Record mode
+
+    async def _forward(self, kind: str, method: str, path: str, headers: Dict[str, str], body: bytes):
+        """Send a request to the real API; return (status, content type, body, seconds)."""
+        import httpx  # Only record mode needs it; it comes with the openai package
+
+        if self._http is None:
+            self._http = httpx.AsyncClient(timeout=120.0)
+        if kind in ("chat", "embeddings", "responses"):
+            url = self.openai_upstream + path
+        elif self.pinecone_upstream:
+            url = self.pinecone_upstream + path
+        else:
+            raise HTTPError(400, "Recording Pinecone requests needs pinecone_upstream (the real index host)")
+        skip = {"host", "content-length", "connection", "accept-encoding"}
+        forwarded = {name: value for name, value in headers.items() if name not in skip}
+        start = time.perf_counter()
+        response = await self._http.request(method, url, headers=forwarded, content=body)
+        return (response.status_code, response.headers.get("content-type", "application/json"),
+                response.content, time.perf_counter() - start)
+
+    # Sending
+
+    async def _send_events(self, writer: asyncio.StreamWriter, events: List[bytes], keep_alive: bool):
+        start_chunked(writer, "text/event-stream", keep_alive)
+        for position, event in enumerate(events):
+            if position and self.stream_interval:
+                await asyncio.sleep(self.stream_interval)
+            await write_chunk(writer, event)
+        await write_chunk(writer, b"")
+
+    async def _send_record(self, writer: asyncio.StreamWriter, record: Dict[str, Any], keep_alive: bool):
+        body = record["body"].encode("utf-8")
+        if record["content_type"].startswith("text/event-stream"):
+            events = [event + b"\n\n" for event in body.split(b"\n\n") if event.strip()]
+            await self._send_events(writer, events, keep_alive)
+        else:
+            await send_response(writer, record["status"], body, keep_alive, record["content_type"])
+
+    async def _serve(self, kind: str, method: str, path: str, headers: Dict[str, str], body: bytes,
+                     writer: asyncio.StreamWriter, keep_alive: bool) -> int:
+        key = request_key(method, path, body)
+        request = json.loads(body) if body else {}
+        stats = self.stats[kind]
+
+        if self.record and kind not in _LOCAL_KINDS:
+            status, content_type, content, seconds = await self._forward(kind, method, path, headers, body)
+            record = {"key": key, "kind": kind, "status": status, "content_type": content_type,
+                      "body": content.decode("utf-8"), "seconds": round(seconds, 4)}
+            if status == 200:
+                self.cassette.put(record)
+            await self._send_record(writer, record, keep_alive)
+            return status
+
+        record = None if kind in _LOCAL_KINDS else self.cassette.get(key)
+        error = await self._inject(kind, record["seconds"] if record else None)
+        if error is not None:
+            stats["errors"] += 1
+            retry_headers = {"Retry-After": "1"} if error == 429 else None
+            await send_json(writer, error, {"error": {"message": f"Injected {error} from the stand-in",
+                                                      "type": "stand_in_error", "code": error}},
+                            keep_alive, headers=retry_headers)
+            return error
+        if record is not None:
+            stats["replayed"] += 1
+            await self._send_record(writer, record, keep_alive)
+            return record["status"]
+        if self.on_miss == "error" and kind not in _LOCAL_KINDS:
+            raise HTTPError(404, f"No recorded response for this {kind} request")
+
+        if kind == "chat" and request.get("stream"):
+            events = [f"data: {json.dumps(event)}\n\n".encode("utf-8") for event in self._chat_events(request)]
+            await self._send_events(writer, events + [b"data: [DONE]\n\n"], keep_alive)
+            return 200
+        if kind == "chat":
+            payload = self._chat_completion(request)
+        elif kind == "embeddings":
+            payload = await asyncio.to_thread(self._embeddings, request)
+        elif kind == "responses":
+            if request.get("stream"):
+                raise HTTPError(400, "Streamed responses are only replayed from a cassette")
+            payload = self._response(request)
+        elif kind == "indexes":
+            name = path[len("/indexes/"):] if path.startswith("/indexes/") else None
+            payload = (self._index_model(name) if name
+                       else {"indexes": [self._index_model(name) for name in self.index_names]})
+        elif kind == "create_index":
+            if not request.get("name"):
+                raise HTTPError(400, "create_index needs a name")
+            if request["name"] not in self.index_names:
+                self.index_names.append(request["name"])
+            self._created_dimension = self._created_dimension or request.get("dimension")
+            await send_json(writer, 201, self._index_model(request["name"]), keep_alive)
+            return 201
+        else:
+            payload = await asyncio.to_thread(self._pinecone, kind, request)
+        await send_json(writer, 200, payload, keep_alive)
+        return 200
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve requests on one connection until the client closes it."""
+        try:
+            while True:
+                keep_alive = False
+                started = time.perf_counter()
+                method, path, kind = "-", "-", None
+                try:
+                    request = await read_request(reader, MAX_BODY_BYTES)
+                    if request is None:
+                        break
+                    method, path, headers, body, keep_alive = request
+                    if path in ("/health", "/stats"):
+                        await send_json(writer, 200, self.summary() if path == "/stats" else {"status": "ok"},
+                                        keep_alive)
+                        status = 200
+                    else:
+                        kind = ROUTES.get((method, path))
+                        if kind is None and method == "GET" and path.startswith("/indexes/"):
+                            kind = "indexes"
+                        if kind is None:
+                            raise HTTPError(404, f"The stand-in has no route for {method} {path}")
+                        self.stats[kind]["requests"] += 1
+                        status = await self._serve(kind, method, path, headers, body, writer, keep_alive)
+                except HTTPError as e:
+                    status = e.status
+                    await send_json(writer, status, {"error": {"message": str(e)}}, keep_alive)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except Exception as e:
+                    status = 500
+                    print(f"Error serving {method} {path}: {e}")
+                    await send_json(writer, status, {"error": {"message": str(e)}}, False)
+                    keep_alive = False
+                if kind is not None:
+                    self.stats[kind]["latency_seconds"].append(time.perf_counter() - started)
+                if self.verbose:
+                    print(f"{method} {path} {status} {time.perf_counter() - started:.3f}s")
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT):
+        server = await asyncio.start_server(self.handle, host, port)
+        self.host_url = f"http://{host}:{port}"
+        mode = "recording to" if self.record else "replaying from"
+        print(f"Stand-in API on {self.host_url} ({mode} {self.cassette.path or 'no cassette'}, "
+              f"{len(self.cassette.records)} recorded responses)")
+        async with server:
+            await server.serve_forever()
+
+
+def run(host: str = "127.0.0.1", port: int = DEFAULT_PORT, **options):
+    """Run a StandInServer until interrupted, then print its per-endpoint stats."""
+    server = StandInServer(**options)
+    try:
+        asyncio.run(server.serve(host, port))
+    except KeyboardInterrupt:
+        print("Shutting down")
+    for kind, counts in server.summary().items():
+        print(f"{kind:>10}: {counts}")
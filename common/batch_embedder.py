@@ -0,0 +1,158 @@
+"""
+Token-aware batching for embedding requests.
+
+The embeddings endpoint accepts a list of inputs per request, limited by the
+number of inputs and the total number of tokens. BatchEmbedder packs texts into
+as few requests as those limits allow, sends several requests at once, and
+returns the vectors in the same order as the input texts. Given the vector
+size, it fills one preallocated float32 matrix: each request decodes into its
+own rows (see common/openai_embeddings.py).
+"""
+
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+import numpy
+
+# Limits of the OpenAI embeddings endpoint
+MAX_INPUTS_PER_REQUEST = 2048
+MAX_TOKENS_PER_REQUEST = 300_000
+MAX_TOKENS_PER_INPUT = 8191
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding(model: str):
+    """The tiktoken encoding for a model, or None when tiktoken is not installed."""
+    try:
+        import tiktoken
+    except ImportError:  # Optional: fall back to a conservative estimate
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def make_token_counter(model: str = "text-embedding-3-small") -> Callable[[str], int]:
+    """
+    Return a function that counts tokens for the given model.
+
+    Uses tiktoken when it is installed. Otherwise assumes three characters per
+    token, which overestimates for English text and so keeps requests under the limit.
+    tiktoken and its encoding are loaded on the first count, so scripts can
+    create counters at import time without slowing down startup.
+    """
+    def count(text: str) -> int:
+        encoding = _encoding(model)
+        if encoding is None:
+            return len(text) // 3 + 1
+        return len(encoding.encode(text, disallowed_special=()))
+    return count
+
+
+def pack_batches(token_counts: List[int], max_inputs: int = MAX_INPUTS_PER_REQUEST,
+                 max_tokens: int = MAX_TOKENS_PER_REQUEST) -> List[List[int]]:
+    """
+    Group input positions into request-sized batches, keeping input order.
+
+    Args:
+        token_counts: Token count of each input
+        max_inputs: Maximum number of inputs per request
+        max_tokens: Maximum total tokens per request
+
+    Returns:
+        A list of batches, each a list of positions into token_counts
+    """
+    batches = []
+    current = []
+    current_tokens = 0
+    for position, tokens in enumerate(token_counts):
+        if current and (len(current) >= max_inputs or current_tokens + tokens > max_tokens):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(position)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+class BatchEmbedder:
+    """Embed many texts with as few, concurrent requests as the API limits allow."""
+
+    def __init__(
+        self,
+        request_fn: Callable[[List[str]], List[List[float]]],
+        model: str = "text-embedding-3-small",
+        max_concurrency: int = 4,
+        max_inputs: int = MAX_INPUTS_PER_REQUEST,
+        max_tokens: int = MAX_TOKENS_PER_REQUEST,
+        max_tokens_per_input: int = MAX_TOKENS_PER_INPUT,
+        count_tokens: Optional[Callable[[str], int]] = None,
+        dimensions: Optional[int] = None,
+    ):
+        """
+        Args:
+            request_fn: Sends one embeddings request for a list of texts
+            model: Embedding model, used to pick the tokenizer
+            max_concurrency: Number of requests in flight at once
+            max_inputs: Maximum number of inputs per request
+            max_tokens: Maximum total tokens per request
+            max_tokens_per_input: Maximum tokens in a single input
+            count_tokens: Custom token counter; defaults to make_token_counter(model)
+            dimensions: Vector size. When set, embed returns one float32 matrix and calls
+                request_fn(texts, out=rows) to decode each batch into its own rows
+                (openai_embeddings.embed_texts does)
+        """
+        self.request_fn = request_fn
+        self.max_concurrency = max_concurrency
+        self.max_inputs = max_inputs
+        self.max_tokens = max_tokens
+        self.max_tokens_per_input = max_tokens_per_input
+        self.count_tokens = count_tokens or make_token_counter(model)
+        self.dimensions = dimensions
+
+    def plan(self, texts: List[str]) -> List[List[int]]:
+        """Split texts into request batches, given as lists of positions."""
+        token_counts = [self.count_tokens(text) for text in texts]
+        for position, tokens in enumerate(token_counts):
+            if tokens > self.max_tokens_per_input:
+                raise ValueError(
+                    f"Text {position} has about {tokens} tokens, over the "
+                    f"{self.max_tokens_per_input} token limit for one embedding input"
+                )
+        return pack_batches(token_counts, self.max_inputs, self.max_tokens)
+
+    def embed(self, texts: List[str]):
+        """Embed texts and return the vectors in input order, as a matrix if dimensions is set."""
+        if not texts:
+            return numpy.empty((0, self.dimensions), dtype="float32") if self.dimensions else []
+        if self.dimensions:
+            matrix = numpy.empty((len(texts), self.dimensions), dtype="float32")
+        batches = self.plan(texts)
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+
+        def run(batch):
+            batch_texts = [texts[position] for position in batch]
+            if self.dimensions:
+                # Batches are runs of consecutive positions, so their rows are one slice of the matrix
+                self.request_fn(batch_texts, out=matrix[batch[0]:batch[-1] + 1])
+                return batch, None
+            return batch, self.request_fn(batch_texts)
+
+        if len(batches) == 1 or self.max_concurrency <= 1:
+            results = map(run, batches)
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as pool:
+                results = list(pool.map(run, batches))
+
+        if self.dimensions:
+            for _ in results:  # Wait for every request; map is lazy
+                pass
+            return matrix
+        for batch, vectors in results:
+            for position, vector in zip(batch, vectors):
+                embeddings[position] = vector
+        return embeddings
@@ -0,0 +1,229 @@
+"""
+Payload-aware, parallel upserts.
+
+Pinecone rejects upsert requests larger than 2 MB or with more than 1000
+vectors. How big a vector is depends mostly on its metadata, for example when
+the chunk text is stored with it, so a fixed number of vectors per request
+either wastes requests or goes over the limit. BatchUpserter sizes each request
+by the serialized bytes of its vectors. It sends requests concurrently from one
+shared thread pool, so they travel over several of the client's pooled
+connections at once. It records the latency of every request and retries only
+the requests that failed.
+
+Vectors usually arrive in fixed-size batches from an ingestion pipeline. ``add``
+buffers them and only sends whole requests, so one request can take vectors
+from several batches; ``flush``, or leaving a ``with`` block, sends the rest.
+"""
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from common.batch_embedder import pack_batches
+
+# Limits of the Pinecone upsert endpoint
+MAX_REQUEST_BYTES = 2 * 1024 * 1024
+MAX_VECTORS_PER_REQUEST = 1000
+MAX_METADATA_BYTES = 40 * 1024
+# Leave room for the request envelope and differences in the client's encoding
+REQUEST_BYTES_TARGET = int(MAX_REQUEST_BYTES * 0.9)
+
+
+def _tolist(value):
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def payload_bytes(vector: Dict[str, Any]) -> int:
+    """Size of one {"id", "values", "metadata"} vector in a JSON request body."""
+    # Float32 rows (openai_embeddings.embed_texts) are sent as JSON lists too
+    return len(json.dumps(vector, separators=(",", ":"), ensure_ascii=False, default=_tolist).encode("utf-8"))
+
+
+@dataclass
+class BatchResult:
+    """One upsert request: its size, how long it took and which attempt it was."""
+    vectors: int
+    bytes: int
+    seconds: float
+    attempt: int
+    started: float
+    error: Optional[str] = None
+
+
+class BatchUpserter:
+    """Upsert vectors in request-sized batches, several at a time, retrying failed batches."""
+
+    def __init__(
+        self,
+        upsert_fn: Callable[..., Any],
+        max_concurrency: int = 4,
+        max_bytes: int = REQUEST_BYTES_TARGET,
+        max_vectors: int = MAX_VECTORS_PER_REQUEST,
+        max_retries: int = 3,
+        verbose: bool = True,
+    ):
+        """
+        Args:
+            upsert_fn: Sends one request, called as upsert_fn(vectors=..., namespace=...)
+            max_concurrency: Requests in flight at once, across all callers
+            max_bytes: Maximum serialized bytes per request
+            max_vectors: Maximum vectors per request
+            max_retries: Attempts per batch before the upsert fails
+            verbose: Print one line per request
+        """
+        self.upsert_fn = upsert_fn
+        self.max_concurrency = max_concurrency
+        self.max_bytes = max_bytes
+        self.max_vectors = max_vectors
+        self.max_retries = max_retries
+        self.verbose = verbose
+        self.results: List[BatchResult] = []
+        self._lock = threading.Lock()
+        # namespace -> (vector, serialized bytes) pairs added but not sent yet
+        self._buffers: Dict[str, List[Tuple[Dict[str, Any], int]]] = {}
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="upsert")
+
+    def __enter__(self) -> "BatchUpserter":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        try:
+            if exc_type is None:
+                self.flush()
+        finally:
+            self.close()
+
+    @staticmethod
+    def _sizes(vectors: List[Dict[str, Any]]) -> List[int]:
+        sizes = []
+        for vector in vectors:
+            metadata_bytes = payload_bytes(vector.get("metadata") or {})
+            if metadata_bytes > MAX_METADATA_BYTES:
+                raise ValueError(f"Vector {vector['id']} has {metadata_bytes} bytes of metadata, "
+                                 f"over the {MAX_METADATA_BYTES} byte limit")
+            sizes.append(payload_bytes(vector))
+        return sizes
+
+    def plan(self, vectors: List[Dict[str, Any]]) -> List[Tuple[List[int], int]]:
+        """Split vectors into requests, given as (positions, serialized bytes)."""
+        return self._plan(self._sizes(vectors))
+
+    def _plan(self, sizes: List[int]) -> List[Tuple[List[int], int]]:
+        return [(batch, sum(sizes[position] for position in batch))
+                for batch in pack_batches(sizes, self.max_vectors, self.max_bytes)]
+
+    def _send(self, vectors: List[Dict[str, Any]], size: int, namespace: str, attempt: int):
+        start = time.perf_counter()
+        error = None
+        try:
+            self.upsert_fn(vectors=vectors, namespace=namespace)
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            result = BatchResult(len(vectors), size, time.perf_counter() - start, attempt, start, error)
+            with self._lock:
+                self.results.append(result)
+            if self.verbose:
+                status = f"failed ({error})" if error else "ok"
+                print(f"  Upsert of {result.vectors} vectors ({size / 1024:.0f} KB) "
+                      f"{status} in {result.seconds * 1000:.0f} ms")
+
+    def upsert(self, vectors: List[Dict[str, Any]], namespace: str = "") -> int:
+        """
+        Upsert vectors and return how many were sent.
+
+        Batches run concurrently. After each round only the failed batches are
+        sent again, with exponential backoff. RuntimeError is raised if some are
+        still failing after max_retries attempts.
+        """
+        if not vectors:
+            return 0
+        return self._upsert(vectors, self.plan(vectors), namespace)
+
+    def add(self, vectors: List[Dict[str, Any]], namespace: str = "") -> int:
+        """
+        Buffer vectors and upsert the ones that fill whole requests.
+
+        The vectors that don't fill a request yet wait for the next call or for
+        flush. Returns how many vectors this call sent.
+        """
+        sized = list(zip(vectors, self._sizes(vectors)))
+        with self._lock:
+            buffer = self._buffers.setdefault(namespace, [])
+            buffer.extend(sized)
+            batches = pack_batches([size for _, size in buffer], self.max_vectors, self.max_bytes)
+            if len(batches) < 2:
+                return 0
+            # Every request but the last is full: the next vector did not fit in it
+            ready = buffer[:batches[-1][0]]
+            del buffer[:batches[-1][0]]
+        return self._upsert_sized(ready, namespace)
+
+    def flush(self, namespace: Optional[str] = None) -> int:
+        """Upsert every buffered vector of one namespace, or of all of them, and return how many were sent."""
+        with self._lock:
+            namespaces = list(self._buffers) if namespace is None else [namespace]
+            buffered = [(name, self._buffers.pop(name, [])) for name in namespaces]
+        return sum(self._upsert_sized(sized, name) for name, sized in buffered)
+
+    def close(self) -> None:
+        """Stop the request threads; buffered vectors that were not flushed are dropped."""
+        self._pool.shutdown()
+
+    def _upsert_sized(self, sized: List[Tuple[Dict[str, Any], int]], namespace: str) -> int:
+        if not sized:
+            return 0
+        return self._upsert([vector for vector, _ in sized], self._plan([size for _, size in sized]), namespace)
+
+    def _upsert(self, vectors: List[Dict[str, Any]], pending: List[Tuple[List[int], int]], namespace: str) -> int:
+        for attempt in range(1, self.max_retries + 1):
+            futures = [
+                (self._pool.submit(self._send, [vectors[position] for position in batch], size, namespace, attempt),
+                 (batch, size))
+                for batch, size in pending
+            ]
+            failed = []
+            last_error = None
+            for future, item in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    failed.append(item)
+                    last_error = e
+            if not failed:
+                return len(vectors)
+            pending = failed
+            if attempt < self.max_retries:
+                print(f"  {len(failed)} upsert batches failed ({last_error}), retrying them...")
+                time.sleep(2 ** (attempt - 1))
+
+        lost = sum(len(batch) for batch, _ in pending)
+        raise RuntimeError(f"{len(pending)} upsert batches ({lost} vectors) still failed after "
+                           f"{self.max_retries} attempts: {last_error}") from last_error
+
+    def summary(self) -> str:
+        """Request count, volume, throughput and latency percentiles of all upserts so far."""
+        with self._lock:
+            results = list(self.results)
+        sent = [result for result in results if result.error is None]
+        if not sent:
+            return "No upserts sent"
+        latencies = sorted(result.seconds for result in sent)
+        vectors = sum(result.vectors for result in sent)
+        megabytes = sum(result.bytes for result in sent) / 1e6
+        wall = (max(result.started + result.seconds for result in results)
+                - min(result.started for result in results))
+
+        def percentile(fraction):
+            return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] * 1000
+
+        return (f"Upserted {vectors} vectors ({megabytes:.1f} MB) in {len(sent)} requests, "
+                f"{len(results) - len(sent)} failed attempts; latency p50 {percentile(0.5):.0f} ms, "
+                f"p99 {percentile(0.99):.0f} ms, max {latencies[-1] * 1000:.0f} ms; "
+                f"{vectors / wall:.0f} vectors/s over {wall:.1f}s from first to last request")
@@ -0,0 +1,190 @@
+"""
+Local BM25 keyword index and reciprocal rank fusion.
+
+Vector search is good at paraphrases but can miss exact names and tickers;
+BM25 is the opposite. hybrid_search() runs both and merges the rankings with
+reciprocal rank fusion (RRF). When the keyword ranking alone is clearly
+confident it skips the embedding call and vector query entirely.
+"""
+
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+STOPWORDS = frozenset("""
+a about after all also an and any are as at be been but by can could did do does for from had has
+have how i if in into is it its it's me more most my no not of on or our out over so some such than
+that the their them then there these they this to up was we were what when where which who why will
+with would you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with stopwords and possessive 's removed."""
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        if token.endswith("'s"):
+            token = token[:-2]
+        if token and token not in STOPWORDS:
+            tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    """
+    In-memory inverted index with Okapi BM25 scoring, saved as JSON.
+
+    Documents are stored as term frequencies only; callers keep the text
+    elsewhere (e.g. the chunk store) and look it up by ID.
+    """
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.docs: Dict[str, Dict[str, int]] = {}
+        self.metadata: Dict[str, Dict[str, Any]] = {}
+        self._postings: Optional[Dict[str, List[Tuple[str, int]]]] = None
+        self._lengths: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        if path and os.path.isfile(path):
+            with open(path, "r") as f:
+                data = json.load(f)
+            self.docs = data["docs"]
+            self.metadata = data.get("metadata", {})
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, doc_id: str, text: str, metadata: Optional[Dict[str, Any]] = None) -> None:
+        with self._lock:
+            self.docs[doc_id] = dict(Counter(tokenize(text)))
+            self.metadata[doc_id] = dict(metadata or {})
+            self._postings = None
+
+    def remove(self, doc_ids: List[str]) -> None:
+        with self._lock:
+            for doc_id in doc_ids:
+                self.docs.pop(doc_id, None)
+                self.metadata.pop(doc_id, None)
+            self._postings = None
+
+    def clear(self) -> None:
+        with self._lock:
+            self.docs.clear()
+            self.metadata.clear()
+            self._postings = None
+
+    def save(self) -> None:
+        with self._lock:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"docs": self.docs, "metadata": self.metadata}, f)
+            os.replace(tmp_path, self.path)
+
+    def _build(self):
+        postings = defaultdict(list)
+        lengths = {}
+        for doc_id, frequencies in self.docs.items():
+            lengths[doc_id] = sum(frequencies.values())
+            for term, count in frequencies.items():
+                postings[term].append((doc_id, count))
+        self._lengths = lengths
+        self._average_length = (sum(lengths.values()) / len(lengths)) if lengths else 0.0
+        self._postings = dict(postings)
+
+    def idf(self, term: str) -> float:
+        document_frequency = len(self._postings.get(term, ()))
+        return math.log(1 + (len(self.docs) - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[str, float]]:
+        """Return up to top_k (doc_id, score) pairs, best first."""
+        with self._lock:
+            if self._postings is None:
+                self._build()
+            scores = defaultdict(float)
+            for term in set(tokenize(query)):
+                idf = self.idf(term)
+                for doc_id, count in self._postings.get(term, ()):
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / self._average_length)
+                    scores[doc_id] += idf * count * (self.k1 + 1) / (count + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+    def coverage(self, query: str, doc_id: str) -> float:
+        """Fraction of the query's IDF weight whose terms appear in the document."""
+        with self._lock:
+            if self._postings is None:
+                self._build()
+            terms = set(tokenize(query))
+            total = sum(self.idf(term) for term in terms)
+            matched = sum(self.idf(term) for term in terms if term in self.docs.get(doc_id, {}))
+        return matched / total if total else 0.0
+
+    def is_confident(self, query: str, ranking: List[Tuple[str, float]],
+                     min_coverage: float = 0.9, min_margin: float = 1.5) -> bool:
+        """
+        Whether the keyword ranking is trustworthy on its own.
+
+        True when the top hit contains (nearly) all of the query's IDF-weighted
+        terms and every hit that doesn't scores well below it. Overlapping
+        chunks of the same passage score alike, so the margin is measured
+        against the best partial match rather than the runner-up.
+        """
+        if not ranking or self.coverage(query, ranking[0][0]) < min_coverage:
+            return False
+        for doc_id, score in ranking[1:]:
+            if self.coverage(query, doc_id) < min_coverage:
+                return ranking[0][1] >= min_margin * score
+        return True
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Merge ranked ID lists: each ID scores sum(1 / (k + rank)) over the lists it appears in."""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, 1):
+            scores[doc_id] += 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def hybrid_search(query: str, bm25: BM25Index, vector_search: Callable[[str, int], List[Dict[str, Any]]],
+                  top_k: int = 5, mode: str = "hybrid", candidates: int = 20,
+                  fast_path: bool = True) -> List[Dict[str, Any]]:
+    """
+    Rank chunks for a query with BM25, vector search, or both.
+
+    Args:
+        query: The user's question
+        bm25: Keyword index over the same chunk IDs as the vector store
+        vector_search: Called as vector_search(query, n); returns match dicts with "id" and "score"
+        top_k: Number of results to return
+        mode: "hybrid", "vector" or "lexical"
+        candidates: How many results to take from each ranking before fusing
+        fast_path: In hybrid mode, return the BM25 ranking alone when it is confident
+
+    Returns:
+        Match dicts with "id", "score" and "metadata", plus "retrieval" saying
+        which path produced them ("lexical", "vector" or "hybrid")
+    """
+    if mode == "vector":
+        # Plain dicts: Pinecone returns ScoredVector objects, which dict() can't copy
+        return [{"id": match["id"], "score": match["score"], "metadata": match.get("metadata") or {},
+                 "retrieval": "vector"} for match in vector_search(query, top_k)]
+
+    lexical = bm25.search(query, max(candidates, top_k))
+    if mode == "lexical" or (fast_path and bm25.is_confident(query, lexical)):
+        return [{"id": doc_id, "score": score, "metadata": bm25.metadata.get(doc_id, {}), "retrieval": "lexical"}
+                for doc_id, score in lexical[:top_k]]
+
+    vector = vector_search(query, max(candidates, top_k))
+    metadata = {doc_id: bm25.metadata.get(doc_id, {}) for doc_id, _ in lexical}
+    metadata.update({match["id"]: match.get("metadata") or {} for match in vector})
+    fused = reciprocal_rank_fusion([[match["id"] for match in vector], [doc_id for doc_id, _ in lexical]])
+    return [{"id": doc_id, "score": score, "metadata": metadata.get(doc_id, {}), "retrieval": "hybrid"}
+            for doc_id, score in fused[:top_k]]
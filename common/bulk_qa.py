@@ -0,0 +1,188 @@
+"""
+Bulk question answering over a JSONL file.
+
+Every question still to be answered is embedded up front in one embed_fn call,
+which BatchEmbedder packs into as few requests as the API limits allow. The
+embeddings land in the embedding cache, so the per-question search finds them
+there. After that, vector searches and chat calls run as two concurrent
+stages with separate concurrency limits. The chat stage is also held to a
+requests-per-minute rate.
+
+Each result is appended to the output JSONL as soon as it is ready. Running
+again with the same output file skips questions that already have an answer,
+so an interrupted run picks up where it stopped. Questions that failed are
+recorded with an "error" and are retried on the next run.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Set
+
+
+class RateLimiter:
+    """Spaces calls out to at most ``per_minute`` per minute, allowing short bursts."""
+
+    def __init__(self, per_minute: float, burst: int = 1):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self.burst = max(1, burst)
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Claim the next slot and return how many seconds to wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            # Unused slots accumulate, up to `burst` of them
+            self._next = max(self._next, now - self.interval * (self.burst - 1))
+            wait = max(0.0, self._next - now)
+            self._next += self.interval
+            return wait
+
+    async def acquire(self) -> None:
+        wait = self.reserve()
+        if wait:
+            await asyncio.sleep(wait)
+
+
+def read_questions(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yield {"id", "question"} records from a JSONL file.
+
+    Lines may be objects with a "question" (and optionally an "id") or bare
+    strings; records without an id are numbered by line.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                record = {"question": record}
+            record.setdefault("id", line_number)
+            yield record
+
+
+def answered_ids(output_path: str) -> Set[str]:
+    """IDs that already have an answer in the output file (a torn last line is ignored)."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if "answer" in record and "error" not in record:
+                done.add(str(record["id"]))
+    return done
+
+
+def _open_for_append(output_path: str):
+    """Open the output for appending, starting on a fresh line if the last write was cut off."""
+    if os.path.exists(output_path) and os.path.getsize(output_path):
+        with open(output_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            torn = f.read(1) != b"\n"
+        output = open(output_path, "a", encoding="utf-8")
+        if torn:
+            output.write("\n")
+        return output
+    return open(output_path, "a", encoding="utf-8")
+
+
+async def _run(questions: List[Dict[str, Any]], search_fn, answer_fn, output, search_concurrency: int,
+               answer_concurrency: int, limiter: RateLimiter, max_retries: int) -> Dict[str, int]:
+    search_slots = asyncio.Semaphore(search_concurrency)
+    answer_slots = asyncio.Semaphore(answer_concurrency)
+    counts = {"answered": 0, "failed": 0}
+    started = time.perf_counter()
+
+    async def answer_one(record):
+        question = record["question"]
+        result = {"id": record["id"], "question": question}
+        question_started = time.perf_counter()
+        try:
+            async with search_slots:
+                documents = await asyncio.to_thread(search_fn, question)
+            async with answer_slots:
+                for attempt in range(max_retries):
+                    await limiter.acquire()
+                    try:
+                        result["answer"] = await asyncio.to_thread(answer_fn, question, documents)
+                        break
+                    except Exception as e:
+                        if attempt == max_retries - 1:
+                            raise
+                        print(f"  Question {record['id']}: attempt {attempt + 1} failed ({e}), retrying...")
+                        await asyncio.sleep(2 ** attempt)
+        except Exception as e:
+            result["error"] = str(e)
+        result["seconds"] = round(time.perf_counter() - question_started, 3)
+
+        # The event loop is single-threaded, so whole lines never interleave
+        output.write(json.dumps(result, ensure_ascii=False) + "\n")
+        output.flush()
+        counts["failed" if "error" in result else "answered"] += 1
+        done = counts["answered"] + counts["failed"]
+        if done % 50 == 0 or done == len(questions):
+            elapsed = time.perf_counter() - started
+            print(f"{done}/{len(questions)} questions done "
+                  f"({counts['failed']} failed, {done / elapsed:.1f} questions/s)")
+
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=search_concurrency + answer_concurrency))
+    await asyncio.gather(*(answer_one(record) for record in questions))
+    return counts
+
+
+def run_bulk_qa(questions_path: str, output_path: str,
+                embed_fn: Callable[[List[str]], Any],
+                search_fn: Callable[[str], Any],
+                answer_fn: Callable[[str, Any], str],
+                search_concurrency: int = 8, answer_concurrency: int = 4,
+                requests_per_minute: float = 500, max_retries: int = 3) -> Dict[str, int]:
+    """
+    Answer every question in questions_path that isn't answered in output_path yet.
+
+    Args:
+        questions_path: JSONL of questions (see read_questions)
+        output_path: JSONL that results are appended to, one line per question
+        embed_fn: Embeds a list of questions (results should land in the embedding cache)
+        search_fn: Returns the documents for one question
+        answer_fn: Answers a question from its documents
+        search_concurrency: Vector searches in flight at once
+        answer_concurrency: Chat calls in flight at once
+        requests_per_minute: Upper bound on chat calls per minute
+        max_retries: Attempts per chat call before the question is recorded as failed
+
+    Returns:
+        Counts of answered, failed and skipped questions
+    """
+    done = answered_ids(output_path)
+    questions = []
+    skipped = 0
+    for record in read_questions(questions_path):
+        if str(record["id"]) in done:
+            skipped += 1
+        else:
+            questions.append(record)
+    print(f"{len(questions)} questions to answer, {skipped} already answered")
+    if not questions:
+        return {"answered": 0, "failed": 0, "skipped": skipped}
+
+    start = time.perf_counter()
+    embed_fn(list(dict.fromkeys(record["question"] for record in questions)))
+    print(f"Embedded questions in {time.perf_counter() - start:.2f}s")
+
+    limiter = RateLimiter(requests_per_minute, burst=answer_concurrency)
+    with _open_for_append(output_path) as output:
+        counts = asyncio.run(_run(questions, search_fn, answer_fn, output, search_concurrency,
+                                  answer_concurrency, limiter, max_retries))
+    counts["skipped"] = skipped
+    return counts
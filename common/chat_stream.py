@@ -0,0 +1,84 @@
+"""
+Streamed chat completions with latency metrics.
+
+stream_chat_completion() sends a chat request with ``stream=True`` and returns a
+ChatStream, which yields the answer text as it arrives and records the time to
+first token and the generation speed once the stream is exhausted.
+"""
+
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+
+class ChatStream:
+    """Iterate over the text of a streamed chat completion while timing it."""
+
+    def __init__(self, chunks: Iterable[Any], started: Optional[float] = None):
+        self._chunks = chunks
+        self.started = time.perf_counter() if started is None else started
+        self.first_token_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.completion_tokens: Optional[int] = None
+        self.pieces: List[str] = []
+
+    def __iter__(self) -> Iterator[str]:
+        content_chunks = 0
+        for chunk in self._chunks:
+            # With include_usage the last chunk carries token counts and no choices
+            if getattr(chunk, "usage", None) is not None:
+                self.completion_tokens = chunk.usage.completion_tokens
+            for choice in chunk.choices:
+                text = choice.delta.content
+                if text:
+                    if self.first_token_at is None:
+                        self.first_token_at = time.perf_counter()
+                    content_chunks += 1
+                    self.pieces.append(text)
+                    yield text
+        self.finished_at = time.perf_counter()
+        if self.completion_tokens is None:
+            # Each content chunk is (almost always) one token
+            self.completion_tokens = content_chunks
+
+    @property
+    def text(self) -> str:
+        return "".join(self.pieces)
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        """Time to first token, total time and tokens per second (after the first token)."""
+        if self.finished_at is None:
+            return {}
+        ttft = None if self.first_token_at is None else self.first_token_at - self.started
+        generating = None if self.first_token_at is None else self.finished_at - self.first_token_at
+        return {
+            "time_to_first_token": ttft,
+            "total_seconds": self.finished_at - self.started,
+            "completion_tokens": self.completion_tokens,
+            "tokens_per_second": (self.completion_tokens / generating) if generating else None,
+        }
+
+    def summary(self) -> str:
+        stats = self.stats()
+        if not stats or stats["time_to_first_token"] is None:
+            return "No tokens received"
+        speed = stats["tokens_per_second"]
+        return (f"Time to first token: {stats['time_to_first_token']:.2f}s, "
+                f"{stats['completion_tokens']} tokens in {stats['total_seconds']:.2f}s"
+                + (f" ({speed:.1f} tokens/s)" if speed else ""))
+
+
+def stream_chat_completion(create: Callable[..., Iterable[Any]], **request) -> ChatStream:
+    """
+    Start a streamed chat completion.
+
+    Args:
+        create: The client's chat.completions.create
+        **request: Arguments for create (model, messages, temperature, ...)
+
+    Returns:
+        A ChatStream; errors from sending the request are raised here, before
+        any text is yielded, so callers can retry them
+    """
+    started = time.perf_counter()
+    chunks = create(stream=True, stream_options={"include_usage": True}, **request)
+    return ChatStream(chunks, started)
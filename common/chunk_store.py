@@ -0,0 +1,149 @@
+"""
+Span-addressed chunk store.
+
+Maps each chunk ID to the (file, byte offset, byte length) it was cut from, so a
+search hit can be turned back into text by reading just that span of the source
+file instead of the whole letter. Source files are memory-mapped once and kept
+open, and a batch of lookups reads each distinct chunk only once.
+
+Each source's size and mtime are recorded with its spans. A source that has
+changed since (or was never recorded) is not read: its chunks are left out of
+the result, so callers fall back to the whole letter until it is re-ingested.
+"""
+
+import mmap
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# SQLite limits the number of "?" placeholders in a single statement
+_SQL_BATCH = 500
+
+
+def _version(source: str) -> Optional[Tuple[int, int]]:
+    """(size, mtime_ns) of a source file, or None if it can't be read."""
+    try:
+        stat = os.stat(source)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class ChunkStore:
+    """SQLite table of chunk spans plus a small pool of memory-mapped source files."""
+
+    def __init__(self, path: str, max_open_files: int = 32):
+        self.path = path
+        self.max_open_files = max_open_files
+        self._maps: "OrderedDict[str, mmap.mmap]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS spans ("
+            " id TEXT PRIMARY KEY,"
+            " source TEXT NOT NULL,"
+            " offset INTEGER NOT NULL,"
+            " length INTEGER NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sources ("
+            " source TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL)"
+        )
+        self._db.commit()
+
+    def put_many(self, spans: Iterable[Tuple[str, str, int, int]]) -> None:
+        """Record (chunk_id, source, byte_offset, byte_length) rows, and the version of each source."""
+        rows = list(spans)
+        versions = [(source,) + version for source in {row[1] for row in rows}
+                    if (version := _version(source)) is not None]
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO spans VALUES (?, ?, ?, ?)", rows)
+            self._db.executemany("INSERT OR REPLACE INTO sources VALUES (?, ?, ?)", versions)
+            self._db.commit()
+
+    def delete_many(self, ids: List[str]) -> None:
+        with self._lock:
+            self._db.executemany("DELETE FROM spans WHERE id = ?", [(chunk_id,) for chunk_id in ids])
+            self._db.commit()
+
+    def spans(self, ids: List[str]) -> Dict[str, Tuple[str, int, int]]:
+        """Look up (source, offset, length) for each known chunk ID."""
+        unique = list(dict.fromkeys(ids))
+        found = {}
+        with self._lock:
+            for start in range(0, len(unique), _SQL_BATCH):
+                batch = unique[start:start + _SQL_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                for chunk_id, source, offset, length in self._db.execute(
+                    f"SELECT id, source, offset, length FROM spans WHERE id IN ({placeholders})", batch
+                ):
+                    found[chunk_id] = (source, offset, length)
+        return found
+
+    def _versions(self, sources: List[str]) -> Dict[str, Tuple[int, int]]:
+        """The recorded (size, mtime_ns) of each source that has one; call with the lock held."""
+        found = {}
+        for start in range(0, len(sources), _SQL_BATCH):
+            batch = sources[start:start + _SQL_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            for source, size, mtime_ns in self._db.execute(
+                f"SELECT source, size, mtime_ns FROM sources WHERE source IN ({placeholders})", batch
+            ):
+                found[source] = (size, mtime_ns)
+        return found
+
+    def _map(self, source: str, recorded: Optional[Tuple[int, int]]) -> Optional[mmap.mmap]:
+        """Map a source, or return None if it no longer matches the version its spans were cut from."""
+        if recorded is None or _version(source) != recorded:
+            # Drop a stale mapping too: reading past the end of a truncated file would crash
+            stale = self._maps.pop(source, None)
+            if stale is not None:
+                stale.close()
+            return None
+        mapped = self._maps.get(source)
+        if mapped is not None:
+            self._maps.move_to_end(source)
+            return mapped
+        with open(source, "rb") as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps[source] = mapped
+        if len(self._maps) > self.max_open_files:
+            _, oldest = self._maps.popitem(last=False)
+            oldest.close()
+        return mapped
+
+    def read(self, ids: List[str]) -> Dict[str, str]:
+        """
+        Return the text of each chunk ID found in the store.
+
+        IDs that were never recorded, or whose source file has changed since,
+        are left out, so callers can fall back to another source of text for them.
+        """
+        texts = {}
+        found = self.spans(ids)
+        with self._lock:
+            sources = sorted({source for source, _, _ in found.values()})
+            recorded = self._versions(sources)
+            # Read file by file so each source is checked and mapped once per batch
+            current, mapped = None, None
+            for chunk_id, (source, offset, length) in sorted(found.items(), key=lambda item: item[1]):
+                if source != current:
+                    current, mapped = source, self._map(source, recorded.get(source))
+                if mapped is not None:
+                    texts[chunk_id] = mapped[offset:offset + length].decode("utf-8", errors="replace")
+        return texts
+
+    def close(self) -> None:
+        with self._lock:
+            for mapped in self._maps.values():
+                mapped.close()
+            self._maps.clear()
+            self._db.close()
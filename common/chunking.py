@@ -0,0 +1,183 @@
+"""
+Boundary-aware chunking engine.
+
+Text is cut into sentence segments (paragraph breaks are sentence breaks too),
+then a single sliding window over those segments packs them into chunks of at
+most ``chunk_size`` units. Each new chunk starts with the trailing segments of
+the previous chunk that fit within ``chunk_overlap`` units, so the overlap is a
+real character (or token) count rather than a number of paragraphs.
+
+Every segment enters and leaves the window once and the window size is kept as
+a running total, so chunking is linear in the length of the text. Chunks are
+contiguous spans of the source, which lets the chunk store map them back to
+byte offsets.
+
+``length_fn`` measures a segment: ``len`` for characters, or a token counter
+such as ``common.batch_embedder.make_token_counter()`` for tokens.
+"""
+
+import re
+from collections import deque
+from itertools import islice
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from common.document_stream import iter_text
+
+# A sentence ends at ., ! or ? (plus closing quotes/brackets) followed by whitespace.
+# A blank line always ends a segment and marks a paragraph break.
+# Starting with one character class lets the regex engine skip ahead to candidates.
+_BOUNDARY = re.compile(r"[\n.!?](?:(?<=\n)[ \t]*\n\s*|(?<=[.!?])[.!?]*[\"')\]]*\s+)")
+
+
+@dataclass
+class Segment:
+    """A sentence (with its trailing whitespace) and its position in the source."""
+    text: str
+    byte_offset: int
+    size: int
+    paragraph_end: bool
+
+
+def iter_segments(blocks: Iterable[str], length_fn: Callable[[str], int] = len,
+                  max_size: Optional[int] = None) -> Iterator[Segment]:
+    """
+    Split streamed text into sentence segments.
+
+    Args:
+        blocks: The text, in one or more consecutive pieces
+        length_fn: Measures a segment in characters or tokens
+        max_size: Segments longer than this are split at whitespace (or hard-cut)
+    """
+    pending = ""
+    byte_offset = 0
+
+    def emit(text, paragraph_end):
+        nonlocal byte_offset
+        for piece, size in _split_long(text, length_fn, max_size):
+            yield Segment(piece, byte_offset, size, paragraph_end)
+            byte_offset += _byte_length(piece)
+
+    for block in blocks:
+        pending += block
+        start = 0
+        end_of_pending = len(pending)
+        for match in _BOUNDARY.finditer(pending):
+            end = match.end()
+            # Whitespace at the very end may continue in the next block
+            if end == end_of_pending:
+                break
+            text = pending[start:end]
+            paragraph_end = match.group().count("\n") >= 2
+            size = length_fn(text)
+            if max_size is None or size <= max_size:
+                # The common case, without the generators of emit()
+                yield Segment(text, byte_offset, size, paragraph_end)
+                byte_offset += _byte_length(text)
+            else:
+                yield from emit(text, paragraph_end)
+            start = end
+        pending = pending[start:]
+    if pending:
+        yield from emit(pending, True)
+
+
+def _byte_length(text: str) -> int:
+    return len(text) if text.isascii() else len(text.encode("utf-8"))
+
+
+def _split_long(text: str, length_fn: Callable[[str], int],
+               max_size: Optional[int]) -> Iterator[Tuple[str, int]]:
+    """Yield (piece, size) pieces of text no longer than max_size."""
+    size = length_fn(text)
+    if max_size is None or size <= max_size:
+        yield text, size
+        return
+    # Greedily pack words into pieces that fit, hard-cutting words that don't. The piece's
+    # size is kept as a running sum of word sizes (exact for len, an estimate for tokens)
+    # instead of re-measuring the growing piece for every word.
+    words = []
+    piece_size = 0
+    for word in re.findall(r"\S+\s*|\s+", text):
+        word_size = length_fn(word)
+        if words and piece_size + word_size > max_size:
+            piece = "".join(words)
+            yield piece, length_fn(piece)
+            words, piece_size = [], 0
+        while word_size > max_size:
+            cut = max(1, len(word) * max_size // max(1, word_size))
+            yield word[:cut], length_fn(word[:cut])
+            word = word[cut:]
+            word_size = length_fn(word)
+        words.append(word)
+        piece_size += word_size
+    if words:
+        piece = "".join(words)
+        yield piece, length_fn(piece)
+
+
+def iter_chunk_spans(blocks: Iterable[str], chunk_size: int = 1000, chunk_overlap: int = 200,
+                     length_fn: Callable[[str], int] = len,
+                     paragraph_bias: float = 0.5) -> Iterator[Tuple[int, int, str]]:
+    """
+    Pack sentence segments into overlapping chunks.
+
+    Args:
+        blocks: The text, in one or more consecutive pieces
+        chunk_size: Maximum chunk size, in length_fn units
+        chunk_overlap: Maximum text shared with the previous chunk, in length_fn units
+        length_fn: Measures text in characters (len) or tokens
+        paragraph_bias: When a chunk is full, end it at the last paragraph break
+            if that keeps at least this fraction of chunk_size
+
+    Yields:
+        (byte_offset, byte_length, text) for each chunk, with trailing whitespace trimmed
+    """
+    if chunk_overlap >= chunk_size:
+        raise ValueError("chunk_overlap must be smaller than chunk_size")
+
+    window = deque()
+    window_size = 0
+    carried = 0  # Leading segments of the window already emitted in the previous chunk
+
+    def emit(count):
+        text = "".join([segment.text for segment in islice(window, count)]).rstrip()
+        return window[0].byte_offset, _byte_length(text), text
+
+    def cut_point():
+        # Prefer ending on a paragraph break if it keeps the chunk reasonably full.
+        # Returns the segment count and its size, so the caller doesn't re-add them.
+        size = 0
+        best, best_size = len(window), window_size
+        for i, segment in enumerate(window):
+            size += segment.size
+            if i >= carried and segment.paragraph_end and size >= chunk_size * paragraph_bias:
+                best, best_size = i + 1, size
+        return best, best_size
+
+    for segment in iter_segments(blocks, length_fn, chunk_size):
+        while window and window_size + segment.size > chunk_size:
+            if carried == len(window):
+                # Only overlap is left and it can't fit with the next segment: drop it
+                window_size -= window.popleft().size
+                carried -= 1
+                continue
+            count, tail = cut_point()
+            yield emit(count)
+            # Keep the end of the chunk that fits in the overlap as the start of the next one
+            while count and tail > chunk_overlap:
+                tail -= window[0].size
+                window_size -= window.popleft().size
+                count -= 1
+            carried = count
+        window.append(segment)
+        window_size += segment.size
+
+    if len(window) > carried:
+        yield emit(len(window))
+
+
+def iter_document_chunks(doc: Dict[str, Any], chunk_size: int = 1000, chunk_overlap: int = 200,
+                         length_fn: Callable[[str], int] = len) -> Iterator[Tuple[int, int, str]]:
+    """Chunk a document from common.document_stream, streaming memory-mapped files."""
+    return iter_chunk_spans(iter_text(doc), chunk_size, chunk_overlap, length_fn)
@@ -0,0 +1,146 @@
+"""
+Token-budgeted context assembly for the chat prompt.
+
+Retrieved chunks overlap their neighbours (the chunker repeats up to
+``chunk_overlap`` characters) and the same passage is often hit more than once.
+pack_context() merges overlapping chunks into single passages, drops text that
+is already included, and then fills a token budget with whole passages in score
+order. A passage that doesn't fit is cut at the last sentence that does, never
+mid-sentence.
+"""
+
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
+
+from common.batch_embedder import make_token_counter
+from common.chunking import iter_segments
+
+DEFAULT_MAX_TOKENS = 3000
+
+
+@dataclass
+class PackedContext:
+    """The context string plus how much of the retrieved text made it in."""
+    text: str
+    tokens: int
+    retrieved_tokens: int
+    passages: List[Tuple[str, float]] = field(default_factory=list)
+
+    def summary(self) -> str:
+        return (f"Context: {self.tokens} tokens in {len(self.passages)} passages "
+                f"({self.retrieved_tokens} tokens retrieved)")
+
+
+def _overlap(a: str, b: str, min_overlap: int) -> int:
+    """Length of the longest suffix of a that is also a prefix of b, or 0 if under min_overlap."""
+    probe = b[:min_overlap]
+    if len(probe) < min_overlap:
+        return 0
+    start = a.find(probe, max(0, len(a) - len(b)))
+    while start != -1:
+        if b.startswith(a[start:]):
+            return len(a) - start
+        start = a.find(probe, start + 1)
+    return 0
+
+
+def _merge(a: str, b: str, min_overlap: int) -> Optional[str]:
+    """Combine two passages that contain or overlap each other, else None."""
+    if b in a:
+        return a
+    if a in b:
+        return b
+    overlap = _overlap(a, b, min_overlap)
+    if overlap:
+        return a + b[overlap:]
+    overlap = _overlap(b, a, min_overlap)
+    if overlap:
+        return b + a[overlap:]
+    return None
+
+
+def merge_passages(documents: List[Tuple[str, float]], min_overlap: int = 20) -> List[Tuple[str, float]]:
+    """
+    Merge overlapping and duplicate chunks, best score first.
+
+    A merged passage keeps the best score of the chunks it was built from.
+    """
+    passages = []
+    for text, score in sorted(documents, key=lambda doc: doc[1], reverse=True):
+        text = text.strip()
+        if not text:
+            continue
+        passages.append([text, score])
+        # A new chunk can bridge two passages, so keep merging until nothing changes
+        merged = True
+        while merged:
+            merged = False
+            for i in range(len(passages)):
+                for j in range(i + 1, len(passages)):
+                    combined = _merge(passages[i][0], passages[j][0], min_overlap)
+                    if combined is not None:
+                        passages[i] = [combined, max(passages[i][1], passages[j][1])]
+                        del passages[j]
+                        merged = True
+                        break
+                if merged:
+                    break
+    passages.sort(key=lambda passage: passage[1], reverse=True)
+    return [(text, score) for text, score in passages]
+
+
+def _truncate(text: str, max_tokens: int, count_tokens: Callable[[str], int]) -> str:
+    """The longest run of leading sentences of text that fits in max_tokens."""
+    pieces = []
+    size = 0
+    for segment in iter_segments([text], count_tokens):
+        if size + segment.size > max_tokens:
+            break
+        pieces.append(segment.text)
+        size += segment.size
+    # Segment sizes are counted separately, so check the joined text too
+    while pieces and count_tokens("".join(pieces).rstrip()) > max_tokens:
+        pieces.pop()
+    return "".join(pieces).rstrip()
+
+
+def pack_context(documents: List[Tuple[str, float]], max_tokens: int = DEFAULT_MAX_TOKENS,
+                 count_tokens: Optional[Callable[[str], int]] = None, separator: str = "\n\n",
+                 min_overlap: int = 20, min_fill: int = 50) -> PackedContext:
+    """
+    Build a prompt context from retrieved chunks within a token budget.
+
+    Args:
+        documents: (text, score) pairs from search_documents
+        max_tokens: Token budget for the whole context, separators included
+        count_tokens: Token counter for the chat model (see make_token_counter)
+        separator: Placed between passages
+        min_overlap: Shortest shared text, in characters, that counts as an overlap
+        min_fill: Don't cut a passage down to fewer than this many tokens; skip it instead
+
+    Returns:
+        The packed context; passages appear in score order
+    """
+    if count_tokens is None:
+        count_tokens = make_token_counter()
+    retrieved_tokens = sum(count_tokens(text) for text, _ in documents)
+    separator_tokens = count_tokens(separator)
+
+    selected = []
+    used = 0
+    for text, score in merge_passages(documents, min_overlap):
+        remaining = max_tokens - used - (separator_tokens if selected else 0)
+        if remaining < min_fill:
+            break
+        tokens = count_tokens(text)
+        if tokens > remaining:
+            text = _truncate(text, remaining, count_tokens)
+            if not text:
+                continue
+            tokens = count_tokens(text)
+            if tokens < min_fill:
+                continue
+        used += tokens + (separator_tokens if selected else 0)
+        selected.append((text, score))
+
+    return PackedContext(separator.join(text for text, _ in selected), used, retrieved_tokens, selected)
@@ -0,0 +1,68 @@
+"""
+Streaming document loading for the RAG exercises.
+
+Documents are read one at a time, and files above ``MMAP_THRESHOLD`` are never
+read into memory at all: their text is decoded from a memory-mapped file in
+fixed-size blocks as the chunker asks for it. Combined with the generator-based
+chunker in common/chunking.py, peak memory depends on the largest chunk, not
+the size of the corpus.
+
+A document is a dict {"content": str or None, "metadata": {"source": path}}.
+``content`` is None for memory-mapped documents; use iter_text() to read them.
+"""
+
+import codecs
+import glob
+import hashlib
+import mmap
+import os
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+MMAP_THRESHOLD = 4 * 1024 * 1024
+BLOCK_SIZE = 1024 * 1024
+
+
+def load_document(path: str, mmap_threshold: int = MMAP_THRESHOLD) -> Dict[str, Any]:
+    """Load a small file into memory, or describe a large one for memory-mapped reading."""
+    if os.path.getsize(path) >= mmap_threshold:
+        return {"content": None, "metadata": {"source": path}}
+    # newline="" keeps "\r\n" as-is so character positions map back to byte offsets
+    with open(path, "r", encoding="utf-8", newline="") as file:
+        return {"content": file.read(), "metadata": {"source": path}}
+
+
+def iter_documents(pattern: Optional[str] = None, paths: Optional[Iterable[str]] = None,
+                   mmap_threshold: int = MMAP_THRESHOLD) -> Iterator[Dict[str, Any]]:
+    """Yield documents one at a time from a glob pattern or an explicit list of paths."""
+    if paths is None:
+        paths = sorted(glob.glob(pattern))
+    for path in paths:
+        yield load_document(path, mmap_threshold)
+
+
+def iter_text(doc: Dict[str, Any], block_size: int = BLOCK_SIZE) -> Iterator[str]:
+    """Yield a document's text in blocks, decoding memory-mapped files incrementally."""
+    if doc["content"] is not None:
+        yield doc["content"]
+        return
+
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    with open(doc["metadata"]["source"], "rb") as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for start in range(0, len(mapped), block_size):
+                text = decoder.decode(mapped[start:start + block_size])
+                if text:
+                    yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def document_hash(doc: Dict[str, Any]) -> str:
+    """Content hash of a document, streamed for memory-mapped files."""
+    if "hash" not in doc:
+        digest = hashlib.sha256()
+        for block in iter_text(doc):
+            digest.update(block.encode("utf-8"))
+        doc["hash"] = digest.hexdigest()
+    return doc["hash"]
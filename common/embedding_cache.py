@@ -0,0 +1,156 @@
+"""
+Persistent, content-addressed cache for embedding vectors.
+
+Vectors are stored in a SQLite file keyed by a hash of (model, dimensions, text),
+so unchanged chunks and repeated queries never hit the embeddings API twice.
+When the file grows past ``max_bytes`` the least recently used entries are evicted.
+Cached vectors come back as float32 rows without conversion to Python floats,
+and ``embed`` returns one float32 matrix.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, List, Optional
+
+import numpy
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    "EMBEDDING_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "section-aimmba", "embeddings.sqlite"),
+)
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# SQLite limits the number of "?" placeholders in a single statement
+_SQL_BATCH = 500
+
+
+class EmbeddingCache:
+    """On-disk LRU cache of embedding vectors."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._db.commit()
+        # Running size of all vectors, so writes don't have to sum the whole table
+        self._total_bytes = self._table_bytes()
+
+    def _table_bytes(self) -> int:
+        return self._db.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def key(model: str, dimensions: Optional[int], text: str) -> str:
+        """Content address for one (model, dimensions, text) triple."""
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{model}:{dimensions or 0}:{digest}"
+
+    def get_many(self, model: str, dimensions: Optional[int], texts: List[str]) -> List[Optional[numpy.ndarray]]:
+        """Look up cached vectors as read-only float32 arrays, returning None for every miss."""
+        keys = [self.key(model, dimensions, text) for text in texts]
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), _SQL_BATCH):
+                batch = keys[start:start + _SQL_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update(rows)
+                # Touch the hits so they survive eviction
+                self._db.execute(
+                    f"UPDATE embeddings SET last_used = ? WHERE key IN ({placeholders})",
+                    [time.time()] + batch,
+                )
+            self._db.commit()
+
+        results = [None if found.get(key) is None else numpy.frombuffer(found[key], dtype="float32")
+                   for key in keys]
+        hits = sum(result is not None for result in results)
+        with self._lock:
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return results
+
+    def put_many(self, model: str, dimensions: Optional[int], texts: List[str], embeddings: List[List[float]]) -> None:
+        """Store vectors for the given texts and evict old entries if over the size cap."""
+        now = time.time()
+        rows = [
+            (self.key(model, dimensions, text), numpy.asarray(embedding, dtype="float32").tobytes(), now)
+            for text, embedding in zip(texts, embeddings)
+        ]
+        with self._lock:
+            # Replaced rows no longer count towards the total
+            replaced = 0
+            keys = [row[0] for row in rows]
+            for start in range(0, len(keys), _SQL_BATCH):
+                batch = keys[start:start + _SQL_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                replaced += self._db.execute(
+                    f"SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchone()[0]
+            self._db.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", rows)
+            self._db.commit()
+            # Keys repeated within rows are stored once; the total is corrected when it next looks too big
+            self._total_bytes += sum(len(row[1]) for row in rows) - replaced
+            self._evict()
+
+    def _evict(self):
+        if self._total_bytes <= self.max_bytes:
+            return
+        # Other processes may have written to the file too; count exactly before evicting
+        self._total_bytes = total = self._table_bytes()
+        if total <= self.max_bytes:
+            return
+        # Trim to 90% of the cap so we don't evict on every write
+        excess = total - int(self.max_bytes * 0.9)
+        doomed = []
+        for key, size in self._db.execute("SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_used"):
+            doomed.append((key,))
+            excess -= size
+            self._total_bytes -= size
+            if excess <= 0:
+                break
+        self._db.executemany("DELETE FROM embeddings WHERE key = ?", doomed)
+        self._db.commit()
+
+    def embed(self, texts: List[str], model: str, dimensions: Optional[int],
+              embed_fn: Callable[[List[str]], List[List[float]]]) -> numpy.ndarray:
+        """
+        Return embeddings for texts as a float32 matrix, calling embed_fn only for cache misses.
+
+        Args:
+            texts: Texts to embed
+            model: Embedding model name, part of the cache key
+            dimensions: Requested output dimensions, part of the cache key
+            embed_fn: Called with the list of distinct uncached texts; may return a
+                float32 matrix (openai_embeddings.embed_texts) or lists of floats
+        """
+        embeddings = self.get_many(model, dimensions, texts)
+        missing = list(dict.fromkeys(text for text, embedding in zip(texts, embeddings) if embedding is None))
+        if missing:
+            vectors = embed_fn(missing)
+            self.put_many(model, dimensions, missing, vectors)
+            fresh = dict(zip(missing, vectors))
+            embeddings = [fresh[text] if embedding is None else embedding
+                          for text, embedding in zip(texts, embeddings)]
+        if not embeddings:
+            return numpy.empty((0, dimensions or 0), dtype="float32")
+        return numpy.array(embeddings, dtype="float32")
@@ -0,0 +1,70 @@
+"""
+Deterministic, offline text embeddings: feature hashing plus a random projection.
+
+Each text is split into words and word pairs. Every feature is hashed into one
+of ``buckets`` slots with a random sign, giving a sparse count vector. A fixed
+Gaussian random projection maps that vector down to ``dimensions`` values,
+which roughly preserves the angles between texts, and the result is
+normalized. Texts that share words therefore get similar vectors, with no
+model and no network. The output depends only on the text and the seed, so
+benchmarks that use it give the same results on every machine.
+
+It is a stand-in for measuring chunking and indexing choices, not a
+replacement for a real embedding model: it knows nothing about synonyms.
+"""
+
+import hashlib
+import math
+from collections import Counter
+from typing import List
+
+import numpy
+
+from common.bm25 import tokenize
+
+
+class HashingEmbedder:
+    """Embed texts locally with hashed word and word-pair features."""
+
+    def __init__(self, dimensions: int = 256, buckets: int = 2 ** 15, seed: int = 0):
+        """
+        Args:
+            dimensions: Length of the output vectors
+            buckets: Hashed feature slots before projection
+            seed: Seed for the projection matrix
+        """
+        self.dimensions = dimensions
+        self.buckets = buckets
+        rng = numpy.random.default_rng(seed)
+        self._projection = (rng.standard_normal((buckets, dimensions)) / math.sqrt(dimensions)).astype("float32")
+        self._features = {}
+
+    def _feature(self, feature: str):
+        """(bucket, sign) of a feature, from a stable hash (Python's own hash() changes per process)."""
+        slot = self._features.get(feature)
+        if slot is None:
+            digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            slot = self._features[feature] = (digest % self.buckets, 1.0 if digest >> 63 else -1.0)
+        return slot
+
+    def embed_matrix(self, texts: List[str]) -> numpy.ndarray:
+        """Embed texts into an (n, dimensions) float32 matrix of unit vectors."""
+        matrix = numpy.zeros((len(texts), self.dimensions), dtype="float32")
+        for row, text in enumerate(texts):
+            words = tokenize(text)
+            counts = Counter(words)
+            counts.update(f"{first} {second}" for first, second in zip(words, words[1:]))
+            if not counts:
+                continue
+            slots = [self._feature(feature) for feature in counts]
+            # Sub-linear term frequency, so one repeated word doesn't dominate
+            weights = numpy.array([sign * (1.0 + math.log(count))
+                                   for (_, sign), count in zip(slots, counts.values())], dtype="float32")
+            vector = weights @ self._projection[[bucket for bucket, _ in slots]]
+            norm = numpy.linalg.norm(vector)
+            matrix[row] = vector / norm if norm else vector
+        return matrix
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, returning one list of floats per text like the OpenAI helpers."""
+        return self.embed_matrix(texts).tolist()
@@ -0,0 +1,144 @@
+"""
+Recall, memory and latency of FAISS index configurations.
+
+Every configuration is measured against an exact float32 search over the full
+vectors. That search gives the true top k for each query, and a configuration's
+recall@k is the fraction of those k neighbours it also returns. This makes the
+cost of dimension truncation and quantization visible before a setting is
+chosen for a large corpus.
+"""
+
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy
+
+from common.vector_store import build_faiss_index, index_bytes_per_vector, rerank_exact
+
+
+def _prepare(vectors: numpy.ndarray, metric: str, truncate_dimension: Optional[int] = None) -> numpy.ndarray:
+    vectors = numpy.asarray(vectors, dtype="float32")
+    if truncate_dimension:
+        vectors = vectors[:, :truncate_dimension]
+    if metric == "cosine":
+        norms = numpy.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / numpy.maximum(norms, 1e-12)
+    return numpy.ascontiguousarray(vectors)
+
+
+def exact_neighbors(vectors: numpy.ndarray, queries: numpy.ndarray, k: int = 10,
+                    metric: str = "cosine") -> numpy.ndarray:
+    """Row numbers of the true top k vectors for each query (exact float32 search)."""
+    index = build_faiss_index(_prepare(vectors, metric), "flat", metric)
+    _, rows = index.search(_prepare(queries, metric), k)
+    return rows
+
+
+def recall_at_k(found: numpy.ndarray, expected: numpy.ndarray) -> float:
+    """Mean fraction of each query's expected neighbours that appear in its results."""
+    k = expected.shape[1]
+    hits = sum(len(set(row[row >= 0]) & set(truth)) for row, truth in zip(found, expected))
+    return hits / (k * len(expected))
+
+
+def evaluate_index(vectors: numpy.ndarray, queries: numpy.ndarray, expected: numpy.ndarray,
+                   metric: str = "cosine", index_type: str = "flat",
+                   truncate_dimension: Optional[int] = None, rerank: int = 0, **index_options) -> Dict[str, Any]:
+    """
+    Build one index configuration and measure it.
+
+    Args:
+        vectors: (n, d) float32 corpus vectors at full dimension
+        queries: (q, d) float32 query vectors
+        expected: Exact neighbours from exact_neighbors
+        metric: "cosine", "dotproduct" or "euclidean"
+        index_type: "flat", "ivf" or "hnsw"
+        truncate_dimension: Keep only this many leading dimensions
+        rerank: Fetch rerank * k candidates and re-score them with the raw vectors
+        index_options: Passed to build_faiss_index (quantization, pq_m, nprobe, ...)
+
+    Returns:
+        Dimension, bytes per vector (index only; rerank also reads the raw vectors,
+        which can stay on disk), recall@k, build seconds and per-query latency
+    """
+    base = _prepare(vectors, metric, truncate_dimension)
+    probes = _prepare(queries, metric, truncate_dimension)
+
+    start = time.perf_counter()
+    index = build_faiss_index(base, index_type, metric, **index_options)
+    build_seconds = time.perf_counter() - start
+
+    # One query at a time, as the RAG scripts search
+    k = expected.shape[1]
+    latencies = []
+    found = []
+    for probe in probes:
+        start = time.perf_counter()
+        if rerank > 1:
+            _, rows = index.search(probe[None, :], k * rerank)
+            _, rows = rerank_exact(base, probe, rows[0], k, metric)
+        else:
+            _, rows = index.search(probe[None, :], k)
+            rows = rows[0]
+        latencies.append(time.perf_counter() - start)
+        found.append(numpy.pad(rows, (0, k - len(rows)), constant_values=-1))
+
+    latencies_ms = numpy.array(latencies) * 1000
+    return {
+        "dimension": base.shape[1],
+        "bytes_per_vector": index_bytes_per_vector(index),
+        "recall": recall_at_k(numpy.array(found), expected),
+        "build_seconds": build_seconds,
+        "p50_ms": float(numpy.percentile(latencies_ms, 50)),
+        "p99_ms": float(numpy.percentile(latencies_ms, 99)),
+    }
+
+
+def default_configs(dimension: int) -> List[Dict[str, Any]]:
+    """Float32 baseline, scalar and product quantization, and truncation combined with them."""
+    configs = [
+        {"name": "float32", "quantization": "none"},
+        {"name": "fp16", "quantization": "fp16"},
+        {"name": "int8", "quantization": "int8"},
+        {"name": f"pq{dimension // 8}", "quantization": "pq", "pq_m": dimension // 8},
+        {"name": f"pq{dimension // 8} rerank4", "quantization": "pq", "pq_m": dimension // 8, "rerank": 4},
+    ]
+    for truncated in (dimension // 2, dimension // 4):
+        if truncated >= 64:
+            configs.append({"name": f"{truncated}d int8", "truncate_dimension": truncated,
+                            "quantization": "int8"})
+    truncated = dimension // 4
+    if truncated >= 64:
+        configs.append({"name": f"{truncated}d pq{truncated // 8}", "truncate_dimension": truncated,
+                        "quantization": "pq", "pq_m": truncated // 8})
+        configs.append({"name": f"{truncated}d pq{truncated // 8} rerank4", "truncate_dimension": truncated,
+                        "quantization": "pq", "pq_m": truncated // 8, "rerank": 4})
+    return configs
+
+
+def compression_report(vectors: numpy.ndarray, queries: numpy.ndarray, k: int = 10,
+                       metric: str = "cosine", index_type: str = "flat",
+                       configs: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """
+    Measure each configuration (default_configs if none are given) against exact float32 search.
+
+    Each config is a dict with a "name" plus evaluate_index keyword arguments.
+    """
+    vectors = numpy.asarray(vectors, dtype="float32")
+    expected = exact_neighbors(vectors, queries, k, metric)
+    rows = []
+    for config in configs or default_configs(vectors.shape[1]):
+        options = {key: value for key, value in config.items() if key != "name"}
+        options.setdefault("index_type", index_type)
+        result = evaluate_index(vectors, queries, expected, metric, **options)
+        rows.append({"name": config["name"], **result})
+    return rows
+
+
+def print_report(rows: List[Dict[str, Any]], k: int = 10) -> None:
+    print(f"{'config':<20} {'dims':>5} {'bytes/vec':>10} {'M vec/GB':>9} {f'recall@{k}':>10} "
+          f"{'build s':>8} {'p50 ms':>7} {'p99 ms':>7}")
+    for row in rows:
+        print(f"{row['name']:<20} {row['dimension']:>5} {row['bytes_per_vector']:>10.1f} "
+              f"{1e3 / row['bytes_per_vector']:>9.2f} {row['recall']:>10.3f} "
+              f"{row['build_seconds']:>8.2f} {row['p50_ms']:>7.3f} {row['p99_ms']:>7.3f}")
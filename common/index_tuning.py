@@ -0,0 +1,240 @@
+"""
+Automatic choice and tuning of a FAISS index for a corpus.
+
+Exact search (Flat) takes time proportional to the corpus size. Past a few
+tens of thousands of vectors an approximate index answers much faster, but how
+much recall it gives up depends on the data and on its search setting: nprobe
+for IVF, efSearch for HNSW. select_index measures this instead of guessing:
+
+1. Hold out some vectors as queries and find their true neighbours by exact search.
+2. Build each candidate over the remaining vectors, training IVF and PQ on a sample.
+3. Raise nprobe / efSearch until recall@k on the held-out queries reaches the target.
+4. Keep the candidate that reaches the target with the lowest p99 latency, and
+   add the held-out vectors to it.
+
+Small corpora get Flat. Larger ones try IVF-Flat, HNSW and IVF-PQ, skipping
+any whose estimated size exceeds max_bytes_per_vector.
+"""
+
+import math
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy
+
+from common.index_eval import exact_neighbors, recall_at_k
+from common.vector_store import build_faiss_index, index_bytes_per_vector
+
+# Up to this many vectors exact search is fast enough and needs no tuning
+FLAT_MAX_VECTORS = 20_000
+# Vectors held out to tune against
+TUNING_QUERIES = 200
+# IVF partitions are trained on this many vectors per partition
+TRAINING_POINTS_PER_LIST = 40
+# Search settings tried in order, cheapest first
+EF_SEARCH_VALUES = [16, 32, 64, 128, 256, 512, 1024]
+# Stop widening the search once recall improves by less than this
+MIN_RECALL_GAIN = 0.002
+
+
+def _pq_m(dimension: int) -> int:
+    """PQ sub-vectors for IVF-PQ: about a quarter of the dimensions, dividing them evenly."""
+    pq_m = max(1, dimension // 4)
+    while dimension % pq_m:
+        pq_m -= 1
+    return pq_m
+
+
+def candidate_configs(count: int, dimension: int, max_bytes_per_vector: Optional[float] = None,
+                      flat_max_vectors: int = FLAT_MAX_VECTORS, hnsw_m: int = 32) -> List[Dict[str, Any]]:
+    """
+    Index configurations worth trying for a corpus, as build_faiss_index arguments.
+
+    Each has a "name" and an estimated "bytes" per vector, used to skip
+    configurations over max_bytes_per_vector.
+    """
+    if count <= flat_max_vectors:
+        configs = [{"name": "flat", "index_type": "flat", "bytes": 4 * dimension}]
+    else:
+        # FAISS suggests 4 * sqrt(n) to 16 * sqrt(n) partitions
+        nlist = 2 ** round(math.log2(4 * math.sqrt(count)))
+        pq_m = _pq_m(dimension)
+        configs = [
+            {"name": f"ivf{nlist},flat", "index_type": "ivf", "nlist": nlist, "bytes": 4 * dimension + 8},
+            # Level 0 of the graph keeps 2 * M neighbour IDs per vector
+            {"name": f"hnsw{hnsw_m}", "index_type": "hnsw", "hnsw_m": hnsw_m,
+             "bytes": 4 * dimension + 8 * hnsw_m + 8},
+            {"name": f"ivf{nlist},pq{pq_m}", "index_type": "ivf", "nlist": nlist, "quantization": "pq",
+             "pq_m": pq_m, "bytes": pq_m + 8},
+        ]
+    fitting = [config for config in configs
+               if not max_bytes_per_vector or config["bytes"] <= max_bytes_per_vector]
+    if not fitting:
+        smallest = min(config["bytes"] for config in configs)
+        raise ValueError(f"No index fits in {max_bytes_per_vector} bytes per vector "
+                         f"(the smallest needs about {smallest})")
+    return fitting
+
+
+def _search_settings(config: Dict[str, Any], k: int) -> Tuple[Optional[str], List[Optional[int]]]:
+    """The search parameter to tune for a configuration and the values to try, cheapest first."""
+    if config["index_type"] == "ivf":
+        return "nprobe", [2 ** power for power in range(int(math.log2(config["nlist"])) + 1)]
+    if config["index_type"] == "hnsw":
+        return "efSearch", [value for value in EF_SEARCH_VALUES if value >= k] or [k]
+    return None, [None]
+
+
+def _latencies_ms(index, queries: numpy.ndarray, k: int) -> numpy.ndarray:
+    """Latency of each query searched on its own, as the RAG scripts search."""
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query[None, :], k)
+        latencies.append(time.perf_counter() - start)
+    return numpy.array(latencies) * 1000
+
+
+def _evaluate(config, vectors, keep, held_out, expected, k, target_recall, train_size, metric):
+    """Build one candidate over the kept rows and tune its search setting."""
+    options = {key: value for key, value in config.items() if key not in ("name", "bytes")}
+    start = time.perf_counter()
+    index = build_faiss_index(vectors[keep], metric=metric, ids=keep, train_size=train_size, **options)
+    build_seconds = time.perf_counter() - start
+
+    import faiss
+    parameters = faiss.ParameterSpace()
+    parameter, values = _search_settings(config, k)
+    queries = vectors[held_out]
+    previous = None
+    for value in values:
+        if parameter:
+            parameters.set_index_parameter(index, parameter, value)
+        _, found = index.search(queries, k)
+        recall = recall_at_k(found, expected)
+        if recall >= target_recall:
+            break
+        if previous is not None and recall - previous[1] < MIN_RECALL_GAIN:
+            # Searching wider no longer helps (e.g. PQ's own error dominates): keep the cheaper setting
+            value, recall = previous
+            parameters.set_index_parameter(index, parameter, value)
+            break
+        previous = (value, recall)
+
+    latencies = _latencies_ms(index, queries, k)
+    result = {
+        "name": config["name"],
+        "parameter": parameter,
+        "value": value,
+        "recall": recall,
+        "met_target": recall >= target_recall,
+        "build_seconds": build_seconds,
+        "bytes_per_vector": index_bytes_per_vector(index),
+        "p50_ms": float(numpy.percentile(latencies, 50)),
+        "p99_ms": float(numpy.percentile(latencies, 99)),
+    }
+    return index, result
+
+
+def _better(result: Dict[str, Any], best: Optional[Dict[str, Any]]) -> bool:
+    """Whether a candidate beats the best so far: reaching the target first, then lower p99."""
+    if best is None:
+        return True
+    if result["met_target"] != best["met_target"]:
+        return result["met_target"]
+    if result["met_target"]:
+        return result["p99_ms"] < best["p99_ms"]
+    return result["recall"] > best["recall"]
+
+
+def select_index(vectors: numpy.ndarray, k: int = 10, target_recall: float = 0.95, metric: str = "cosine",
+                 max_bytes_per_vector: Optional[float] = None, flat_max_vectors: int = FLAT_MAX_VECTORS,
+                 tuning_queries: int = TUNING_QUERIES, verbose: bool = True):
+    """
+    Choose, build and tune a FAISS index for vectors.
+
+    Args:
+        vectors: (n, d) float32 matrix, already normalized for cosine
+        k: Number of neighbours recall is measured at
+        target_recall: Recall@k the index must reach on held-out queries
+        metric: "cosine"/"dotproduct" (inner product) or "euclidean" (L2)
+        max_bytes_per_vector: Skip configurations estimated to need more memory than this
+        flat_max_vectors: Corpora up to this size get exact search
+        tuning_queries: Vectors held out as queries while tuning
+        verbose: Print each candidate's results
+
+    Returns:
+        The index, holding every vector under its row number, and a report with
+        the chosen configuration and the results of every candidate
+    """
+    vectors = numpy.ascontiguousarray(vectors, dtype="float32")
+    count, dimension = vectors.shape
+    configs = candidate_configs(count, dimension, max_bytes_per_vector, flat_max_vectors)
+    k = max(1, min(k, count - 1))
+
+    if len(configs) == 1 and configs[0]["index_type"] == "flat":
+        # Exact search has nothing to tune: build over everything and time some queries
+        start = time.perf_counter()
+        index = build_faiss_index(vectors, "flat", metric)
+        build_seconds = time.perf_counter() - start
+        latencies = _latencies_ms(index, vectors[:tuning_queries], k)
+        chosen = {"name": "flat", "parameter": None, "value": None, "recall": 1.0, "met_target": True,
+                  "build_seconds": build_seconds, "bytes_per_vector": index_bytes_per_vector(index),
+                  "p50_ms": float(numpy.percentile(latencies, 50)),
+                  "p99_ms": float(numpy.percentile(latencies, 99))}
+        candidates = [chosen]
+    else:
+        order = numpy.random.default_rng(0).permutation(count)
+        held_out = numpy.sort(order[:min(tuning_queries, count // 10)])
+        keep = numpy.sort(order[len(held_out):])
+        # Exact neighbours among the kept rows, as row numbers of the full matrix
+        expected = keep[exact_neighbors(vectors[keep], vectors[held_out], k, metric)]
+        train_size = TRAINING_POINTS_PER_LIST * max(config.get("nlist", 1) for config in configs)
+
+        index = chosen = None
+        candidates = []
+        for config in configs:
+            candidate, result = _evaluate(config, vectors, keep, held_out, expected, k,
+                                          target_recall, train_size, metric)
+            candidates.append(result)
+            if verbose:
+                print(f"  {_describe(result)}")
+            if _better(result, chosen):
+                index, chosen = candidate, result
+            del candidate
+        index.add_with_ids(vectors[held_out], held_out.astype("int64"))
+
+    report = {
+        "count": count,
+        "dimension": dimension,
+        "k": k,
+        "target_recall": target_recall,
+        "chosen": {**chosen, "memory_mb": chosen["bytes_per_vector"] * count / 1e6},
+        "candidates": candidates,
+    }
+    if verbose:
+        print(f"Chose {_describe(chosen)}")
+        if not chosen["met_target"]:
+            print(f"No candidate reached recall@{k} {target_recall}; kept the most accurate")
+    return index, report
+
+
+def _describe(result: Dict[str, Any]) -> str:
+    setting = f" {result['parameter']}={result['value']}" if result["parameter"] else ""
+    return (f"{result['name']}{setting}: recall {result['recall']:.3f}, build {result['build_seconds']:.1f}s, "
+            f"{result['bytes_per_vector']:.0f} bytes/vector, p50 {result['p50_ms']:.2f} ms, "
+            f"p99 {result['p99_ms']:.2f} ms")
+
+
+def print_selection(report: Dict[str, Any]) -> None:
+    k = report["k"]
+    print(f"{'config':<18} {'setting':<14} {f'recall@{k}':>10} {'build s':>8} {'bytes/vec':>10} "
+          f"{'p50 ms':>7} {'p99 ms':>7}")
+    for result in report["candidates"]:
+        setting = f"{result['parameter']}={result['value']}" if result["parameter"] else "-"
+        marker = " <- chosen" if result["name"] == report["chosen"]["name"] else ""
+        print(f"{result['name']:<18} {setting:<14} {result['recall']:>10.3f} {result['build_seconds']:>8.2f} "
+              f"{result['bytes_per_vector']:>10.1f} {result['p50_ms']:>7.3f} {result['p99_ms']:>7.3f}{marker}")
+    chosen = report["chosen"]
+    print(f"\n{report['count']} vectors: {chosen['name']} needs {chosen['memory_mb']:.1f} MB "
+          f"and meets the recall@{k} target of {report['target_recall']}: {'yes' if chosen['met_target'] else 'no'}")
@@ -0,0 +1,135 @@
+"""
+Ingestion manifest for change-aware re-indexing.
+
+The manifest records, per namespace, the content hash of every ingested letter
+and the IDs of the chunks it produced. Comparing it with the letters on disk
+tells us which letters are new or changed (re-embed) and which chunk IDs are
+stale (delete), so a re-run only pays for what actually changed.
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, Dict, Iterable, List, Tuple
+
+from common.document_stream import document_hash
+
+
+def content_hash(text: str) -> str:
+    """Stable hash of a piece of text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def document_key(source: str) -> str:
+    """Key a document by file name so the manifest survives moving the repo."""
+    return os.path.basename(source)
+
+
+def chunk_id(source: str, content: str, seen: Dict[str, int] = None) -> str:
+    """
+    Content-derived vector ID for a chunk.
+
+    The ID only changes when the chunk text changes. Pass the same ``seen``
+    dict for every chunk of a document so repeated text gets a distinct suffix.
+    """
+    base = f"{document_key(source)}:{content_hash(content)[:16]}"
+    if seen is None:
+        return base
+    count = seen.get(base, 0)
+    seen[base] = count + 1
+    return base if count == 0 else f"{base}-{count}"
+
+
+class IngestManifest:
+    """JSON file mapping each ingested document to its content hash and chunk IDs."""
+
+    def __init__(self, path: str, namespace: str, settings: Dict[str, Any] = None):
+        self.path = path
+        self.namespace = namespace
+        self.settings = settings or {}
+        self.data = {"namespaces": {}}
+        if os.path.isfile(path):
+            with open(path, "r") as f:
+                self.data = json.load(f)
+
+        entry = self.data["namespaces"].get(namespace)
+        if entry is None or entry.get("settings") != self.settings:
+            # Chunking or embedding settings changed: every stored chunk is stale
+            previous = entry["documents"] if entry else {}
+            entry = {"settings": self.settings, "documents": {}, "orphaned_ids": self._all_ids(previous)}
+            self.data["namespaces"][namespace] = entry
+        self.entry = entry
+
+    @staticmethod
+    def _all_ids(documents: Dict[str, Dict[str, Any]]) -> List[str]:
+        return [vector_id for doc in documents.values() for vector_id in doc["chunk_ids"]]
+
+    @property
+    def documents(self) -> Dict[str, Dict[str, Any]]:
+        return self.entry["documents"]
+
+    def diff(self, documents: Iterable[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """
+        Compare documents on disk with the manifest.
+
+        Documents may be a lazy stream; only their metadata and hash are kept.
+
+        Returns:
+            (changed, removed): documents that are new or whose content changed,
+            as {"metadata", "hash"} dicts without their text, and keys of
+            manifest documents that no longer exist on disk
+        """
+        on_disk = set()
+        changed = []
+        for doc in documents:
+            key = document_key(doc["metadata"]["source"])
+            on_disk.add(key)
+            recorded = self.documents.get(key)
+            digest = document_hash(doc)
+            if recorded is None or recorded["hash"] != digest:
+                changed.append({"metadata": doc["metadata"], "hash": digest})
+        removed = [key for key in self.documents if key not in on_disk]
+        return changed, removed
+
+    def chunk_ids(self, source: str) -> List[str]:
+        """Chunk IDs currently recorded for a document."""
+        return self.documents.get(document_key(source), {}).get("chunk_ids", [])
+
+    def stale_ids(self, new_chunk_ids: Dict[str, List[str]], removed: List[str]) -> List[str]:
+        """Chunk IDs stored for changed or removed documents that are not being re-upserted."""
+        # Chunk IDs don't depend on the settings, so an orphan that is being
+        # re-upserted under the same ID must survive
+        upserted = {vector_id for ids in new_chunk_ids.values() for vector_id in ids}
+        stale = [vector_id for vector_id in self.entry.get("orphaned_ids", []) if vector_id not in upserted]
+        for key, ids in new_chunk_ids.items():
+            keep = set(ids)
+            stale.extend(vector_id for vector_id in self.documents.get(key, {}).get("chunk_ids", [])
+                         if vector_id not in keep)
+        for key in removed:
+            stale.extend(self.documents[key]["chunk_ids"])
+        return stale
+
+    def record(self, doc: Dict[str, Any], ids: List[str]) -> None:
+        """Remember the content hash and chunk IDs of an ingested document."""
+        self.documents[document_key(doc["metadata"]["source"])] = {
+            "hash": document_hash(doc),
+            "chunk_ids": ids,
+        }
+
+    def forget(self, key: str) -> None:
+        self.documents.pop(key, None)
+
+    def reset(self) -> None:
+        """Forget everything, e.g. after the index was cleared."""
+        self.entry["documents"] = {}
+        self.entry["orphaned_ids"] = []
+
+    def save(self) -> None:
+        self.entry["orphaned_ids"] = []
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(tmp_path, self.path)
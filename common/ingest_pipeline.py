@@ -0,0 +1,126 @@
+"""
+Pipelined ingestion: chunking, embedding and upserting run as overlapping stages.
+
+Each stage is a group of asyncio workers connected to the next stage by a
+bounded queue. A slow stage fills its input queue, which blocks the stage in
+front of it (backpressure), so memory stays bounded while the network calls of
+the embed and upsert stages overlap instead of adding up.
+
+The stage functions are ordinary blocking functions (the OpenAI and Pinecone
+clients are synchronous); they run in worker threads via ``asyncio.to_thread``.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, List
+
+_DONE = object()
+
+
+@dataclass
+class StageStats:
+    """Throughput counters for one pipeline stage."""
+    name: str
+    batches: int = 0
+    items: int = 0
+    busy_seconds: float = 0.0
+
+    def summary(self, elapsed: float) -> str:
+        rate = self.items / elapsed if elapsed > 0 else 0.0
+        return (f"{self.name:>7}: {self.items} items in {self.batches} batches, "
+                f"{rate:.1f} items/s, busy {self.busy_seconds:.2f}s")
+
+
+async def _timed(stats: StageStats, fn: Callable, *args) -> Any:
+    start = time.perf_counter()
+    result = await asyncio.to_thread(fn, *args)
+    stats.busy_seconds += time.perf_counter() - start
+    return result
+
+
+async def run_pipeline(
+    chunks: Iterable[Dict[str, Any]],
+    embed_fn: Callable[[List[str]], List[List[float]]],
+    upsert_fn: Callable[[List[Dict[str, Any]], List[List[float]]], Any],
+    batch_size: int = 100,
+    embed_concurrency: int = 2,
+    upsert_concurrency: int = 2,
+    queue_size: int = 4,
+) -> Dict[str, StageStats]:
+    """
+    Stream chunks through the embed and upsert stages.
+
+    Args:
+        chunks: Chunk dicts with a "content" key; may be a lazy generator
+        embed_fn: Returns one embedding per text
+        upsert_fn: Stores a batch, called with (chunk_batch, embeddings)
+        batch_size: Chunks per embed/upsert batch
+        embed_concurrency: Embedding batches in flight at once
+        upsert_concurrency: Upsert batches in flight at once
+        queue_size: Batches buffered between stages before the producer blocks
+
+    Returns:
+        StageStats for the "chunk", "embed" and "upsert" stages
+    """
+    stats = {name: StageStats(name) for name in ("chunk", "embed", "upsert")}
+    to_embed: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    to_upsert: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    iterator = iter(chunks)
+
+    async def produce():
+        while True:
+            batch = await _timed(stats["chunk"], lambda: list(islice(iterator, batch_size)))
+            if not batch:
+                break
+            stats["chunk"].batches += 1
+            stats["chunk"].items += len(batch)
+            await to_embed.put(batch)
+        for _ in range(embed_concurrency):
+            await to_embed.put(_DONE)
+
+    async def embed_worker():
+        while (batch := await to_embed.get()) is not _DONE:
+            embeddings = await _timed(stats["embed"], embed_fn, [chunk["content"] for chunk in batch])
+            stats["embed"].batches += 1
+            stats["embed"].items += len(batch)
+            await to_upsert.put((batch, embeddings))
+
+    async def upsert_worker():
+        while (item := await to_upsert.get()) is not _DONE:
+            batch, embeddings = item
+            await _timed(stats["upsert"], upsert_fn, batch, embeddings)
+            stats["upsert"].batches += 1
+            stats["upsert"].items += len(batch)
+
+    async def embed_stage():
+        await asyncio.gather(*(embed_worker() for _ in range(embed_concurrency)))
+        for _ in range(upsert_concurrency):
+            await to_upsert.put(_DONE)
+
+    tasks = [
+        asyncio.ensure_future(produce()),
+        asyncio.ensure_future(embed_stage()),
+        asyncio.ensure_future(asyncio.gather(*(upsert_worker() for _ in range(upsert_concurrency)))),
+    ]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        # One failed batch stops the whole pipeline instead of leaving workers blocked on queues
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    return stats
+
+
+def ingest(chunks, embed_fn, upsert_fn, **options) -> Dict[str, StageStats]:
+    """Run the pipeline to completion from synchronous code and print per-stage throughput."""
+    start = time.perf_counter()
+    stats = asyncio.run(run_pipeline(chunks, embed_fn, upsert_fn, **options))
+    elapsed = time.perf_counter() - start
+    print(f"Ingestion finished in {elapsed:.2f}s")
+    for stage in stats.values():
+        print(stage.summary(elapsed))
+    return stats
@@ -0,0 +1,128 @@
+"""
+Shared, pooled OpenAI clients for every script in the workbook.
+
+Each openai.OpenAI() owns its own HTTP connection pool, so creating one per
+call opens a new TCP and TLS connection for every request. get_openai_client
+returns one client per API key and base URL for the whole process. Its httpx
+pool is thread safe, so worker threads share its keep-alive connections.
+get_async_openai_client does the same for asyncio code. It returns one client
+per event loop, because an async pool's connections belong to the loop that
+opened them. A forked child process starts with no clients instead of sharing
+its parent's sockets.
+
+Pool limits and timeouts come from the environment:
+- LLM_MAX_CONNECTIONS: open connections per client (default 20)
+- LLM_MAX_KEEPALIVE: idle connections kept open for reuse (default 10)
+- LLM_KEEPALIVE_SECONDS: how long an idle connection is kept (default 30)
+- LLM_CONNECT_TIMEOUT: seconds to open a connection (default 5)
+- LLM_TIMEOUT: seconds to wait for a response (default 60)
+- LLM_MAX_RETRIES: retries of failed requests, with backoff (default 2)
+"""
+
+import atexit
+import os
+import threading
+import weakref
+from typing import Any, Dict, Optional, Tuple
+
+MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE = int(os.environ.get("LLM_MAX_KEEPALIVE", "10"))
+KEEPALIVE_SECONDS = float(os.environ.get("LLM_KEEPALIVE_SECONDS", "30"))
+CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT", "5"))
+TIMEOUT = float(os.environ.get("LLM_TIMEOUT", "60"))
+MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "2"))
+
+_lock = threading.Lock()
+_clients: Dict[Tuple, Any] = {}
+# Event loop -> that loop's async clients, dropped when the loop is garbage collected
+_async_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def _pool_settings():
+    """httpx pool limits and timeouts from the LLM_* settings."""
+    import httpx  # Installed with the openai package
+
+    limits = httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE,
+                          keepalive_expiry=KEEPALIVE_SECONDS)
+    timeout = httpx.Timeout(TIMEOUT, connect=CONNECT_TIMEOUT)
+    return limits, timeout
+
+
+def _key(api_key: Optional[str], base_url: Optional[str], options: Dict[str, Any]) -> Tuple:
+    # The SDK falls back to these variables; resolve them now so a changed key gets its own client
+    return (api_key or os.environ.get("OPENAI_API_KEY"), base_url or os.environ.get("OPENAI_BASE_URL"),
+            tuple(sorted(options.items())))
+
+
+def get_openai_client(api_key: Optional[str] = None, base_url: Optional[str] = None, **options):
+    """
+    Return the process's OpenAI client for these settings, creating it on first use.
+
+    Args:
+        api_key: Defaults to OPENAI_API_KEY
+        base_url: Defaults to OPENAI_BASE_URL, or the OpenAI API
+        options: Other openai.OpenAI arguments, such as organization or max_retries
+    """
+    key = _key(api_key, base_url, options)
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                import openai
+
+                limits, timeout = _pool_settings()
+                options.setdefault("max_retries", MAX_RETRIES)
+                client = openai.OpenAI(api_key=key[0], base_url=key[1], timeout=timeout,
+                                       http_client=openai.DefaultHttpxClient(limits=limits, timeout=timeout),
+                                       **options)
+                _clients[key] = client
+    return client
+
+
+def get_async_openai_client(api_key: Optional[str] = None, base_url: Optional[str] = None, **options):
+    """
+    Return the AsyncOpenAI client for these settings on the running event loop.
+
+    Tasks on the same loop share one connection pool. Must be called from a
+    coroutine. Takes the same arguments as get_openai_client.
+    """
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    key = _key(api_key, base_url, options)
+    with _lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(key)
+        if client is None:
+            import openai
+
+            limits, timeout = _pool_settings()
+            options.setdefault("max_retries", MAX_RETRIES)
+            client = openai.AsyncOpenAI(api_key=key[0], base_url=key[1], timeout=timeout,
+                                        http_client=openai.DefaultAsyncHttpxClient(limits=limits, timeout=timeout),
+                                        **options)
+            clients[key] = client
+    return client
+
+
+def close_clients() -> None:
+    """Close the pooled connections of every synchronous client; later calls create new clients."""
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
+
+
+def _forget_clients() -> None:
+    # The parent's connections and lock must not be used from a forked child
+    global _lock
+    _lock = threading.Lock()
+    _clients.clear()
+    _async_clients.clear()
+
+
+atexit.register(close_clients)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_clients)
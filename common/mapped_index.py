@@ -0,0 +1,238 @@
+"""
+A FAISS index that is built once, saved, and reopened memory-mapped, with its
+IDs and texts stored beside it.
+
+An index directory holds:
+- index.faiss: the FAISS index, opened with read_mapped_index, or index-0.faiss,
+  index-1.faiss, ... when it is split into shards
+- ids.bin, texts.bin: every ID and text, UTF-8 encoded back to back
+- ids.offsets.npy, texts.offsets.npy: where each string starts, plus the end of the last
+- manifest.json: the build settings and a fingerprint of the IDs and texts
+
+Opening parses only manifest.json and maps the other files, so a fresh process
+can answer its first query within milliseconds. Worker processes that open the
+same directory share one copy of the index in the page cache instead of each
+loading its own. Files are never changed in place: ``build`` writes a new
+directory and swaps it in, and processes that still have the old files mapped
+keep a consistent view.
+
+A sharded index splits the rows into contiguous ranges with one FAISS index
+each. Opening combines them in a faiss.IndexShards, which searches every shard
+in its own thread and merges their top k. One query then runs on as many cores
+as there are shards. search takes a batch of queries in one call; see
+common/query_batcher.py to coalesce concurrent single queries into batches.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import shutil
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy
+
+from common.vector_store import build_faiss_index, read_mapped_index
+
+
+class StringTable:
+    """Read-only list of strings, memory-mapped from a UTF-8 blob and an offsets array."""
+
+    def __init__(self, prefix: str):
+        self._offsets = numpy.load(prefix + ".offsets.npy", mmap_mode="r")
+        with open(prefix + ".bin", "rb") as f:
+            # mmap can't map an empty file
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, row: int) -> str:
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        return self._data[int(self._offsets[row]):int(self._offsets[row + 1])].decode("utf-8")
+
+    @staticmethod
+    def write(prefix: str, strings: Sequence[str]) -> None:
+        offsets = [0]
+        with open(prefix + ".bin", "wb") as f:
+            for string in strings:
+                data = string.encode("utf-8")
+                f.write(data)
+                offsets.append(offsets[-1] + len(data))
+        numpy.save(prefix + ".offsets.npy", numpy.array(offsets, dtype="int64"))
+
+
+def fingerprint(ids: Sequence[str], texts: Sequence[str], settings: Optional[Dict[str, Any]] = None) -> str:
+    """Hash of the IDs, texts and build settings; a different hash means the index must be rebuilt."""
+    digest = hashlib.sha256(json.dumps(settings or {}, sort_keys=True).encode("utf-8"))
+    for vector_id, text in zip(ids, texts):
+        for value in (vector_id, text):
+            data = value.encode("utf-8")
+            digest.update(len(data).to_bytes(8, "little"))
+            digest.update(data)
+    return digest.hexdigest()
+
+
+def read_manifest(path: str) -> Optional[Dict[str, Any]]:
+    """The manifest of the index saved at path, or None if there isn't one."""
+    try:
+        with open(os.path.join(path, "manifest.json"), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class MappedIndex:
+    """A saved FAISS index and its IDs and texts, opened memory-mapped for searching."""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Directory written by MappedIndex.build
+        """
+        self.path = path
+        self.manifest = read_manifest(path)
+        if self.manifest is None:
+            raise FileNotFoundError(f"No index at {path}; build it with MappedIndex.build")
+        self.metric = self.manifest["metric"]
+        import faiss
+
+        shards = self.manifest.get("shards", 1)
+        if shards == 1:
+            self.index = read_mapped_index(os.path.join(path, "index.faiss"))
+        else:
+            # successive_ids: each shard numbers its rows from 0, and the search adds the
+            # row counts of the shards before it
+            self.index = faiss.IndexShards(self.manifest["dimension"], True, True)
+            for shard in range(shards):
+                self.index.add_shard(read_mapped_index(os.path.join(path, f"index-{shard}.faiss")))
+        self.ids = StringTable(os.path.join(path, "ids"))
+        self.texts = StringTable(os.path.join(path, "texts"))
+
+    def __len__(self):
+        return self.index.ntotal
+
+    def search(self, queries, k: int = 5) -> List[List[Dict[str, Any]]]:
+        """
+        Find the k nearest texts for each query vector.
+
+        Pass all waiting queries at once: one batched search costs far less
+        than the same queries searched one by one.
+
+        Returns one list per query of {"id", "text", "score"} dicts, best first.
+        The score is the squared L2 distance (lower is better) for "euclidean"
+        and the similarity (higher is better) otherwise.
+        """
+        queries = numpy.array(queries, dtype="float32", ndmin=2)
+        if self.metric == "cosine":
+            queries /= numpy.maximum(numpy.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        scores, rows = self.index.search(queries, min(k, len(self)))
+        return [[{"id": self.ids[row], "text": self.texts[row], "score": float(score)}
+                 for score, row in zip(query_scores, query_rows) if row >= 0]
+                for query_scores, query_rows in zip(scores, rows)]
+
+    @classmethod
+    def build(cls, path: str, vectors, ids: Sequence[str], texts: Sequence[str], metric: str = "euclidean",
+              index_type: str = "flat", settings: Optional[Dict[str, Any]] = None, shards: int = 1,
+              **index_options) -> "MappedIndex":
+        """
+        Build an index over vectors, save it with its IDs and texts at path, and open it.
+
+        Args:
+            path: Directory to write; an existing index there is replaced
+            vectors: One vector per text
+            ids: One ID per text
+            texts: The texts, returned with search results
+            metric: "euclidean", "cosine" or "dotproduct"
+            index_type: "flat", "ivf" or "hnsw" (see build_faiss_index), or "auto" to
+                pick and tune one with common.index_tuning.select_index
+            settings: Anything else the vectors depend on, such as the embedding model
+            shards: Split the rows into this many indexes, searched in parallel
+                (at most one per core is useful); "auto" picks one for each shard
+            index_options: Passed to build_faiss_index, or to select_index for "auto"
+                (k, target_recall, max_bytes_per_vector, ...)
+        """
+        import faiss
+
+        # No copy of a float32 matrix, such as openai_embeddings.embed_texts returns
+        vectors = numpy.atleast_2d(numpy.asarray(vectors, dtype="float32"))
+        if not len(vectors) == len(ids) == len(texts):
+            raise ValueError(f"Got {len(vectors)} vectors, {len(ids)} IDs and {len(texts)} texts")
+        if metric == "cosine":
+            # A new array, so the caller's vectors are left as they were
+            vectors = vectors / numpy.maximum(numpy.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        shards = cls._shard_count(shards, len(vectors))
+
+        staging = path + ".building"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        selection = []
+        for shard, rows in enumerate(numpy.array_split(numpy.arange(len(vectors)), shards)):
+            shard_vectors = vectors[rows[0]:rows[-1] + 1] if len(rows) else vectors
+            if index_type == "auto":
+                from common.index_tuning import select_index
+                index, report = select_index(shard_vectors, metric=metric, **index_options)
+                selection.append(report["chosen"])
+            else:
+                index = build_faiss_index(shard_vectors, index_type, metric, **index_options)
+            name = "index.faiss" if shards == 1 else f"index-{shard}.faiss"
+            faiss.write_index(index, os.path.join(staging, name))
+            del index
+        StringTable.write(os.path.join(staging, "ids"), ids)
+        StringTable.write(os.path.join(staging, "texts"), texts)
+        manifest = {
+            "count": len(texts),
+            "dimension": vectors.shape[1],
+            "metric": metric,
+            "index_type": index_type,
+            "shards": shards,
+            "fingerprint": fingerprint(ids, texts, cls._build_settings(metric, index_type, settings, shards,
+                                                                       index_options)),
+            # For "auto": the chosen configuration of each shard, its search setting, recall, memory and latency
+            "selection": selection or None,
+        }
+        with open(os.path.join(staging, "manifest.json"), "w") as f:
+            json.dump(manifest, f)
+
+        # Swap the new directory in; open files of the old one stay readable until closed
+        retired = path + ".old"
+        shutil.rmtree(retired, ignore_errors=True)
+        if os.path.exists(path):
+            os.rename(path, retired)
+        os.rename(staging, path)
+        shutil.rmtree(retired, ignore_errors=True)
+        return cls(path)
+
+    @classmethod
+    def open_or_build(cls, path: str, ids: Sequence[str], texts: Sequence[str],
+                      embed_fn: Callable[[List[str]], List[List[float]]], metric: str = "euclidean",
+                      index_type: str = "flat", settings: Optional[Dict[str, Any]] = None, shards: int = 1,
+                      **index_options) -> "MappedIndex":
+        """
+        Open the index at path if it was built from these IDs, texts and settings.
+
+        Otherwise embed the texts with embed_fn and build it; see build for the arguments.
+        """
+        # Clamp the shard count as build does, or the fingerprints never match
+        shards = cls._shard_count(shards, len(texts))
+        expected = fingerprint(ids, texts, cls._build_settings(metric, index_type, settings, shards, index_options))
+        manifest = read_manifest(path)
+        if manifest is not None and manifest.get("fingerprint") == expected:
+            return cls(path)
+        print(f"Building the index at {path} for {len(texts)} texts...")
+        vectors = embed_fn(list(texts))
+        return cls.build(path, vectors, ids, texts, metric, index_type, settings, shards, **index_options)
+
+    @staticmethod
+    def _shard_count(shards: int, count: int) -> int:
+        """At least one shard, and no more shards than rows."""
+        return max(1, min(shards, count))
+
+    @staticmethod
+    def _build_settings(metric, index_type, settings, shards, index_options) -> Dict[str, Any]:
+        build_settings = {"metric": metric, "index_type": index_type, "settings": settings or {}, **index_options}
+        if shards != 1:
+            # Left out for one shard so indexes built before sharding keep their fingerprint
+            build_settings["shards"] = shards
+        return build_settings
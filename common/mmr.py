@@ -0,0 +1,76 @@
+"""
+Maximal marginal relevance (MMR) re-selection of search results.
+
+Overlapping chunks produce near-identical vectors, so a plain top_k often
+returns several copies of the same passage. MMR over-fetches candidates and
+then picks them one at a time, scoring each remaining candidate by
+
+    lambda_mult * sim(query, candidate) - (1 - lambda_mult) * max sim(candidate, picked)
+
+so a candidate that repeats something already picked loses out to one that
+adds new information. All similarities come from two matrix products, and each
+step updates the running "max similarity to the picked set" in one vector op.
+"""
+
+from typing import Any, Dict, List, Sequence
+
+import numpy
+
+
+def _unit_rows(vectors: numpy.ndarray) -> numpy.ndarray:
+    norms = numpy.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def mmr_select(query_vector: Sequence[float], candidate_vectors: Sequence[Sequence[float]],
+               k: int, lambda_mult: float = 0.7) -> List[int]:
+    """
+    Choose k candidates by maximal marginal relevance.
+
+    Args:
+        query_vector: The query embedding
+        candidate_vectors: One embedding per candidate
+        k: Number of candidates to choose
+        lambda_mult: 1.0 ranks by relevance only; lower values favour diversity
+
+    Returns:
+        Positions into candidate_vectors, in the order they were chosen
+    """
+    candidates = numpy.asarray(candidate_vectors, dtype="float32")
+    if candidates.ndim != 2 or not len(candidates):
+        return []
+    candidates = _unit_rows(candidates)
+    # A store that truncates dimensions returns shortened values: compare on the leading ones
+    query = _unit_rows(numpy.asarray(query_vector, dtype="float32")[None, :candidates.shape[1]])[0]
+
+    relevance = candidates @ query
+    similarity = candidates @ candidates.T
+    k = min(k, len(candidates))
+
+    first = int(numpy.argmax(relevance))
+    selected = [first]
+    redundancy = similarity[first].copy()
+    available = numpy.ones(len(candidates), dtype=bool)
+    available[first] = False
+    for _ in range(k - 1):
+        scores = lambda_mult * relevance - (1.0 - lambda_mult) * redundancy
+        scores[~available] = -numpy.inf
+        best = int(numpy.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        numpy.maximum(redundancy, similarity[best], out=redundancy)
+    return selected
+
+
+def mmr_rerank(query_vector: Sequence[float], matches: List[Dict[str, Any]],
+               k: int, lambda_mult: float = 0.7) -> List[Dict[str, Any]]:
+    """
+    Re-select vector store matches (queried with include_values=True) by MMR.
+
+    Matches keep their original similarity score; only the selection and order change.
+    """
+    if not matches:
+        return []
+    order = mmr_select(query_vector, [match["values"] for match in matches], k, lambda_mult)
+    return [matches[position] for position in order]
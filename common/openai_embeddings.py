@@ -0,0 +1,76 @@
+"""
+OpenAI embeddings as float32 NumPy matrices.
+
+The embeddings endpoint can send each vector as base64-encoded little-endian
+float32 bytes instead of a JSON list of numbers. The response is then about a
+quarter of the size, and the bytes copy straight into a float32 array. The
+openai package already asks for base64 when no encoding is given, but it then
+turns every vector into a Python list: one float object per dimension. Callers
+convert those lists back with numpy.array before FAISS can use them.
+
+embed_texts asks for base64 explicitly and decodes each vector with
+numpy.frombuffer into one contiguous float32 matrix, preallocated or passed in
+by the caller. FAISS, FaissVectorStore, MappedIndex and the embedding cache take
+that matrix as is. Only Pinecone, whose client sends JSON, needs lists
+(PineconeVectorStore converts them).
+"""
+
+import base64
+from typing import Any, Optional, Sequence
+
+import numpy
+
+
+def decode_embeddings(items: Sequence[Any], out: Optional[numpy.ndarray] = None) -> numpy.ndarray:
+    """
+    Decode the vectors of an embeddings response into the rows of a float32 matrix.
+
+    Args:
+        items: response.data, or the "data" list of the JSON response. Each item's
+            embedding is a base64 string, or a list of floats if the server ignored
+            the requested encoding
+        out: (len(items), dimensions) float32 matrix to fill; allocated when omitted
+
+    Returns:
+        The matrix, row i holding the embedding with index i
+    """
+    for item in items:
+        row, encoded = (item["index"], item["embedding"]) if isinstance(item, dict) else (item.index, item.embedding)
+        if isinstance(encoded, str):
+            vector = numpy.frombuffer(base64.b64decode(encoded), dtype="<f4")
+        else:
+            vector = numpy.asarray(encoded, dtype="float32")
+        if out is None:
+            out = numpy.empty((len(items), len(vector)), dtype="float32")
+        elif len(vector) != out.shape[1]:
+            raise ValueError(f"Got a {len(vector)}-dimensional embedding for a matrix of {out.shape[1]} columns")
+        out[row] = vector
+    if out is None:
+        out = numpy.empty((0, 0), dtype="float32")
+    return out
+
+
+def embed_texts(texts: Sequence[str], model: str = "text-embedding-3-small", dimensions: Optional[int] = None,
+                out: Optional[numpy.ndarray] = None, client=None) -> numpy.ndarray:
+    """
+    Embed texts in one request and return their vectors as a float32 matrix.
+
+    Args:
+        texts: Texts to embed, within the endpoint's input and token limits
+            (BatchEmbedder splits larger lists)
+        model: Embedding model
+        dimensions: Shorten the vectors to this many dimensions (text-embedding-3 models)
+        out: (len(texts), dimensions) float32 matrix, or a slice of rows of a larger
+            one, to decode into instead of allocating a new matrix
+        client: OpenAI client; defaults to the shared one from common.llm_clients
+    """
+    if out is not None and len(out) != len(texts):
+        raise ValueError(f"out has {len(out)} rows for {len(texts)} texts")
+    if not texts:
+        return out if out is not None else numpy.empty((0, dimensions or 0), dtype="float32")
+    if client is None:
+        from common.llm_clients import get_openai_client
+        client = get_openai_client()
+    options = {"dimensions": dimensions} if dimensions else {}
+    response = client.embeddings.create(model=model, input=list(texts), encoding_format="base64", **options)
+    return decode_embeddings(response.data, out)
@@ -0,0 +1,97 @@
+"""
+Coalesce concurrent single-vector searches into batched searches.
+
+A FAISS search over a batch of queries costs much less per query than the
+same queries searched one at a time: flat indexes turn the batch into one
+matrix multiplication, and every search call has a fixed overhead. A query
+server usually receives one question per request, though. QueryBatcher sits in
+between. Request threads call search(vector, k) as usual. One worker thread
+takes every query waiting in the queue, runs them as a single batched search,
+and hands each caller its own results.
+
+By default the worker does not wait for a batch to fill. While one batch is
+being searched, the next requests queue up and become the next batch. That
+way batches grow with the load, and a lone query is never delayed. Set
+max_wait_ms to hold the first query of a batch back a little longer when
+throughput matters more than latency.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List
+
+import numpy
+
+
+class QueryBatcher:
+    """Run concurrent search(vector, k) calls as batched calls of a search function."""
+
+    def __init__(self, search_fn: Callable[[numpy.ndarray, int], List[Any]], max_batch: int = 256,
+                 max_wait_ms: float = 0.0):
+        """
+        Args:
+            search_fn: Takes a (n, d) float32 matrix of queries and k, and returns one result
+                list per query, best first (MappedIndex.search, for example)
+            max_batch: Most queries searched in one call
+            max_wait_ms: How long to wait for more queries after the first one arrives
+        """
+        self.search_fn = search_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.queries = 0
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="query-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, vector, k: int = 5) -> Future:
+        """Queue one query and return a Future of its results (asyncio.wrap_future awaits it)."""
+        future: Future = Future()
+        self._queue.put((numpy.asarray(vector, dtype="float32").reshape(-1), k, future))
+        return future
+
+    def search(self, vector, k: int = 5) -> List[Any]:
+        """Search one query vector, batched with whatever other queries are waiting."""
+        return self.submit(vector, k).result()
+
+    def close(self) -> None:
+        """Finish the queries already queued and stop the worker thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _next_batch(self, first) -> list:
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                remaining = deadline - time.monotonic()
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Stop after this batch
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._next_batch(first)
+            # Search everything at the largest k asked for and trim each caller's results
+            k = max(item[1] for item in batch)
+            try:
+                results = self.search_fn(numpy.stack([item[0] for item in batch]), k)
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.queries += len(batch)
+            for (_, query_k, future), result in zip(batch, results):
+                future.set_result(result[:query_k])
@@ -0,0 +1,220 @@
+"""
+Long-running HTTP query service for the RAG scripts.
+
+Importing a script's main module once creates its OpenAI and vector-store
+clients; this service keeps them (and their connection pools) alive between
+questions, so each request only pays for the embedding, the vector query and
+the chat call. Requests are handled concurrently by an asyncio server, and the
+blocking answer function runs on a bounded thread pool.
+
+Endpoints:
+    GET  /health   {"status": "ok"}
+    POST /ask      {"question": "...", "namespace": "chunks", "stream": false}
+                   -> {"question", "answer", "seconds"}
+                   With "stream": true the answer is sent as plain text with
+                   chunked transfer encoding, as it is generated.
+
+Built on asyncio streams only, so it needs no web framework.
+"""
+
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+_REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 429: "Too Many Requests", 500: "Internal Server Error",
+            502: "Bad Gateway", 503: "Service Unavailable"}
+MAX_BODY_BYTES = 1024 * 1024
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+async def read_request(reader: asyncio.StreamReader, max_body: int = MAX_BODY_BYTES
+                       ) -> Optional[Tuple[str, str, Dict[str, str], bytes, bool]]:
+    """Read one HTTP/1.x request: (method, path, lower-cased headers, body, keep_alive), or None at EOF."""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, path, version = request_line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise HTTPError(400, "Invalid Content-Length")
+    if length < 0:
+        raise HTTPError(400, "Invalid Content-Length")
+    if length > max_body:
+        raise HTTPError(413, "Request body too large")
+    body = await reader.readexactly(length) if length else b""
+    keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+    return method, path.split("?", 1)[0], headers, body, keep_alive
+
+
+async def send_response(writer: asyncio.StreamWriter, status: int, body: bytes, keep_alive: bool,
+                        content_type: str = "application/json", headers: Optional[Dict[str, str]] = None):
+    """Write a complete response with a Content-Length."""
+    extra = "".join(f"{name}: {value}\r\n" for name, value in (headers or {}).items())
+    writer.write(
+        f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"{extra}"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+
+
+async def send_json(writer: asyncio.StreamWriter, status: int, payload: Any, keep_alive: bool,
+                    headers: Optional[Dict[str, str]] = None):
+    await send_response(writer, status, json.dumps(payload).encode("utf-8"), keep_alive, headers=headers)
+
+
+def start_chunked(writer: asyncio.StreamWriter, content_type: str, keep_alive: bool) -> None:
+    """Write the headers of a response whose body follows in chunks (see write_chunk)."""
+    writer.write(
+        "HTTP/1.1 200 OK\r\n"
+        f"Content-Type: {content_type}\r\n"
+        "Transfer-Encoding: chunked\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1")
+    )
+
+
+async def write_chunk(writer: asyncio.StreamWriter, data: bytes) -> None:
+    """Send one chunk of a chunked response; an empty chunk ends the response."""
+    writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+    await writer.drain()
+
+
+class RagService:
+    """
+    Serve answer_fn(question, namespace, stream=False) over HTTP.
+
+    Args:
+        answer_fn: Returns the answer string, an iterator of answer text when
+            stream=True, or None when nothing relevant was found
+        namespace: Namespace used when a request doesn't name one
+        max_concurrency: Questions answered at the same time; more wait in line
+        warm_up: Called once before the first request, e.g. to open index connections
+    """
+
+    def __init__(self, answer_fn: Callable[..., Any], namespace: str = "chunks",
+                 max_concurrency: int = 8, warm_up: Optional[Callable[[], None]] = None):
+        self.answer_fn = answer_fn
+        self.namespace = namespace
+        self.max_concurrency = max_concurrency
+        self.warm_up = warm_up
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="ask")
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def _stream(self, writer: asyncio.StreamWriter, pieces, keep_alive: bool):
+        start_chunked(writer, "text/plain; charset=utf-8", keep_alive)
+        # Each next() may wait on the model, so pull pieces on the thread pool
+        while True:
+            try:
+                piece = await self._run(next, pieces, None)
+            except Exception as e:
+                # Headers are already sent: all we can do is cut the response short
+                print(f"Error while streaming an answer: {e}")
+                raise ConnectionAbortedError(str(e))
+            if piece is None:
+                break
+            data = piece.encode("utf-8")
+            if data:
+                await write_chunk(writer, data)
+        await write_chunk(writer, b"")
+
+    async def _ask(self, body: bytes, writer: asyncio.StreamWriter, keep_alive: bool) -> int:
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "Body must be JSON")
+        question = request.get("question") if isinstance(request, dict) else None
+        if not isinstance(question, str) or not question.strip():
+            raise HTTPError(400, "Missing \"question\"")
+        namespace = request.get("namespace") or self.namespace
+        stream = bool(request.get("stream"))
+
+        started = time.perf_counter()
+        answer = await self._run(lambda: self.answer_fn(question, namespace, stream=stream))
+        if stream and answer is not None:
+            await self._stream(writer, iter(answer), keep_alive)
+        else:
+            await send_json(writer, 200, {"question": question, "answer": answer,
+                                           "seconds": round(time.perf_counter() - started, 3)}, keep_alive)
+        return 200
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve requests on one connection until the client closes it."""
+        try:
+            while True:
+                keep_alive = False
+                started = time.perf_counter()
+                method, path = "-", "-"
+                try:
+                    request = await read_request(reader)
+                    if request is None:
+                        break
+                    method, path, _, body, keep_alive = request
+                    if path == "/health":
+                        if method != "GET":
+                            raise HTTPError(405, "Use GET")
+                        await send_json(writer, 200, {"status": "ok"}, keep_alive)
+                        status = 200
+                    elif path == "/ask":
+                        if method != "POST":
+                            raise HTTPError(405, "Use POST")
+                        status = await self._ask(body, writer, keep_alive)
+                    else:
+                        raise HTTPError(404, f"No route for {path}")
+                except HTTPError as e:
+                    status = e.status
+                    await send_json(writer, status, {"error": str(e)}, keep_alive)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except Exception as e:
+                    status = 500
+                    print(f"Error answering {method} {path}: {e}")
+                    await send_json(writer, status, {"error": str(e)}, False)
+                    keep_alive = False
+                print(f"{method} {path} {status} {time.perf_counter() - started:.2f}s")
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8000):
+        if self.warm_up is not None:
+            await self._run(self.warm_up)
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"Serving POST /ask on http://{host}:{port} "
+              f"(up to {self.max_concurrency} questions at a time)")
+        async with server:
+            await server.serve_forever()
+
+
+def run(answer_fn: Callable[..., Any], host: str = "127.0.0.1", port: int = 8000, **options):
+    """Run a RagService until interrupted."""
+    service = RagService(answer_fn, **options)
+    try:
+        asyncio.run(service.serve(host, port))
+    except KeyboardInterrupt:
+        print("Shutting down")
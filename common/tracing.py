@@ -0,0 +1,55 @@
+"""
+LangSmith tracing that costs nothing until it is used.
+
+Importing langsmith takes a few hundred milliseconds, and its ``traceable``
+decorator needs it as soon as a traced script is imported. ``traceable`` here
+accepts the same options but wraps the function on its first call instead.
+While tracing is switched off (LANGCHAIN_TRACING_V2 or LANGSMITH_TRACING is
+not "true"), functions are called directly and langsmith is never imported.
+"""
+
+import functools
+import os
+import threading
+from typing import Any, Callable
+
+# Environment variables LangSmith itself checks to decide whether to trace, first one set wins
+_TRACING_VARIABLES = ("LANGSMITH_TRACING_V2", "LANGCHAIN_TRACING_V2", "LANGSMITH_TRACING", "LANGCHAIN_TRACING")
+
+
+def tracing_enabled() -> bool:
+    """Whether LangSmith tracing is switched on in the environment, by LangSmith's own rules."""
+    for name in _TRACING_VARIABLES:
+        value = os.environ.get(name)
+        if value is not None:
+            return value == "true"
+    return False
+
+
+def traceable(**options) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Like langsmith.traceable(**options), but langsmith is imported on the first traced call."""
+    def decorate(fn):
+        traced = None
+        lock = threading.Lock()
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            nonlocal traced
+            if not tracing_enabled():
+                return fn(*args, **kwargs)
+            if traced is None:
+                with lock:
+                    if traced is None:
+                        from langsmith import traceable as langsmith_traceable
+                        traced = langsmith_traceable(**options)(fn)
+            return traced(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def current_run():
+    """The LangSmith run being traced, or None when tracing is off."""
+    if not tracing_enabled():
+        return None
+    from langsmith import get_current_run_tree
+    return get_current_run_tree()
@@ -0,0 +1,493 @@
+"""
+Pluggable vector stores for the RAG exercises.
+
+Two backends share the same small interface:
+- PineconeVectorStore wraps a hosted Pinecone index
+- FaissVectorStore keeps the vectors in-process with FAISS and saves them to disk
+
+Both return plain dictionaries from ``query`` and ``describe_index_stats`` so the
+calling code doesn't need to know which backend it is talking to. FAISS is
+imported only when a FAISS index is built, read or written, so scripts that
+use Pinecone don't pay for loading it.
+"""
+
+import functools
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy
+
+
+class VectorStore:
+    """Interface shared by all vector store backends."""
+
+    def upsert(self, vectors: List[Dict[str, Any]], namespace: str = "") -> Dict[str, Any]:
+        """Insert or overwrite vectors given as {"id", "values", "metadata"} dicts."""
+        raise NotImplementedError
+
+    def query(
+        self,
+        vector: List[float],
+        top_k: int = 5,
+        namespace: str = "",
+        include_metadata: bool = True,
+        include_values: bool = False,
+    ) -> Dict[str, Any]:
+        """Return {"matches": [{"id", "score", "metadata", "values"}, ...]} sorted by score."""
+        raise NotImplementedError
+
+    def delete(self, ids: Optional[List[str]] = None, namespace: str = "", delete_all: bool = False) -> None:
+        """Delete vectors by ID, or every vector in the namespace."""
+        raise NotImplementedError
+
+    def describe_index_stats(self) -> Dict[str, Any]:
+        """Return {"dimension", "total_vector_count", "namespaces": {name: {"vector_count"}}}."""
+        raise NotImplementedError
+
+    def save(self) -> None:
+        """Persist any pending changes. Hosted backends have nothing to do."""
+
+
+def _as_list(values) -> List[float]:
+    """A vector as a list of floats, for APIs that don't take NumPy arrays."""
+    return values.tolist() if isinstance(values, numpy.ndarray) else list(values)
+
+
+class PineconeVectorStore(VectorStore):
+    """Vector store backed by a hosted Pinecone index."""
+
+    def __init__(self, index):
+        self.index = index
+
+    def upsert(self, vectors, namespace=""):
+        # The Pinecone client sends JSON, so float32 rows become lists only here
+        vectors = [{**vector, "values": _as_list(vector["values"])} for vector in vectors]
+        response = self.index.upsert(vectors=vectors, namespace=namespace)
+        return {"upserted_count": getattr(response, "upserted_count", len(vectors))}
+
+    def query(self, vector, top_k=5, namespace="", include_metadata=True, include_values=False):
+        result = self.index.query(
+            vector=_as_list(vector),
+            top_k=top_k,
+            namespace=namespace,
+            include_metadata=include_metadata,
+            include_values=include_values,
+        )
+        matches = []
+        for match in result.matches:
+            matches.append({
+                "id": match.id,
+                "score": match.score,
+                "metadata": dict(match.metadata or {}),
+                "values": list(match.values or []),
+            })
+        return {"matches": matches, "namespace": namespace}
+
+    def delete(self, ids=None, namespace="", delete_all=False):
+        if delete_all:
+            self.index.delete(delete_all=True, namespace=namespace)
+        elif ids:
+            # Pinecone accepts at most 1000 IDs per delete request
+            for start in range(0, len(ids), 1000):
+                self.index.delete(ids=ids[start:start + 1000], namespace=namespace)
+
+    def describe_index_stats(self):
+        stats = self.index.describe_index_stats()
+        return {
+            "dimension": stats.dimension,
+            "total_vector_count": stats.total_vector_count,
+            "namespaces": {
+                name: {"vector_count": summary.vector_count}
+                for name, summary in (stats.namespaces or {}).items()
+            },
+        }
+
+
+# Scalar quantizer code types (faiss.ScalarQuantizer attributes), by the name build_faiss_index accepts
+_SCALAR_TYPES = {"fp16": "QT_fp16", "int8": "QT_8bit"}
+
+
+def build_faiss_index(vectors: numpy.ndarray, index_type: str = "flat", metric: str = "cosine",
+                      quantization: str = "none", pq_m: Optional[int] = None, nlist: int = 100,
+                      nprobe: int = 10, hnsw_m: int = 32, ef_search: int = 64,
+                      ids: Optional[numpy.ndarray] = None, train_size: Optional[int] = None):
+    """
+    Build a FAISS index over a float32 matrix.
+
+    Args:
+        vectors: (n, d) float32 matrix, already normalized for cosine
+        index_type: "flat" (exact), "ivf" or "hnsw"
+        metric: "cosine"/"dotproduct" (inner product) or "euclidean" (L2)
+        quantization: How vectors are stored in the index: "none" (float32, 4 bytes per
+            dimension), "fp16" (2 bytes), "int8" (1 byte) or "pq" (pq_m bytes per vector)
+        pq_m: Product quantization sub-vectors; must divide the dimension (default: dimension / 8)
+        nlist: IVF partitions; reduced automatically for small corpora
+        nprobe: IVF partitions scanned per query
+        hnsw_m: HNSW graph degree
+        ef_search: HNSW search breadth
+        ids: int64 IDs to return for the vectors instead of their row numbers; indexes
+            other than IVF are wrapped in an IndexIDMap for this
+        train_size: Train IVF and PQ on this many randomly chosen vectors instead of all of them
+    """
+    import faiss
+
+    dimension = vectors.shape[1]
+    metric_type = faiss.METRIC_L2 if metric == "euclidean" else faiss.METRIC_INNER_PRODUCT
+    if quantization not in ("none", "pq") and quantization not in _SCALAR_TYPES:
+        raise ValueError(f"Unknown FAISS quantization: {quantization}")
+    pq_m = pq_m or max(1, dimension // 8)
+    if quantization == "pq" and dimension % pq_m:
+        raise ValueError(f"pq_m ({pq_m}) must divide the vector dimension ({dimension})")
+    scalar_type = None
+    if quantization in _SCALAR_TYPES:
+        scalar_type = getattr(faiss.ScalarQuantizer, _SCALAR_TYPES[quantization])
+    training = vectors
+    if train_size and train_size < len(vectors):
+        rows = numpy.random.default_rng(0).choice(len(vectors), train_size, replace=False)
+        training = vectors[numpy.sort(rows)]
+    # Each PQ sub-quantizer learns 2**pq_bits centroids, which needs at least that many points
+    pq_bits = max(1, min(8, int(numpy.log2(max(2, len(training))))))
+
+    if index_type == "hnsw":
+        if quantization == "pq":
+            index = faiss.IndexHNSWPQ(dimension, pq_m, hnsw_m, pq_bits, metric_type)
+        elif scalar_type is not None:
+            index = faiss.IndexHNSWSQ(dimension, scalar_type, hnsw_m, metric_type)
+        else:
+            index = faiss.IndexHNSWFlat(dimension, hnsw_m, metric_type)
+        index.hnsw.efSearch = ef_search
+    elif index_type == "ivf":
+        # FAISS wants roughly 39 training points per partition
+        nlist = max(1, min(nlist, len(training) // 39))
+        quantizer = faiss.IndexFlat(dimension, metric_type)
+        if quantization == "pq":
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, pq_bits, metric_type)
+        elif scalar_type is not None:
+            index = faiss.IndexIVFScalarQuantizer(quantizer, dimension, nlist, scalar_type, metric_type)
+        else:
+            index = faiss.IndexIVFFlat(quantizer, dimension, nlist, metric_type)
+        index.nprobe = min(nprobe, nlist)
+    elif index_type == "flat":
+        if quantization == "pq":
+            index = faiss.IndexPQ(dimension, pq_m, pq_bits, metric_type)
+        elif scalar_type is not None:
+            index = faiss.IndexScalarQuantizer(dimension, scalar_type, metric_type)
+        else:
+            index = faiss.IndexFlat(dimension, metric_type)
+    else:
+        raise ValueError(f"Unknown FAISS index type: {index_type}")
+
+    if not index.is_trained:
+        index.train(training)
+    if ids is None:
+        index.add(vectors)
+        return index
+    if index_type != "ivf":
+        index = faiss.IndexIDMap(index)
+    index.add_with_ids(vectors, numpy.asarray(ids, dtype="int64"))
+    return index
+
+
+def index_bytes_per_vector(index) -> float:
+    """Serialized size of a FAISS index per stored vector: codes plus graph, lists and codebooks."""
+    import faiss
+
+    return faiss.serialize_index(index).nbytes / max(1, index.ntotal)
+
+
+def read_mapped_index(path: str):
+    """
+    Open a saved FAISS index memory-mapped and read-only.
+
+    IO_FLAG_MMAP alone still copies flat, scalar-quantized and PQ codes into
+    memory. IO_FLAG_MMAP_IFC (FAISS 1.10+) maps those too, so opening takes
+    milliseconds and processes that open the same file share its pages. Never
+    add vectors to the returned index: rebuild it instead.
+    """
+    import faiss
+
+    return faiss.read_index(path, getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP))
+
+
+def rerank_exact(vectors, query: numpy.ndarray, rows: numpy.ndarray, k: int, metric: str = "cosine"):
+    """
+    Re-score candidate rows with their raw vectors and keep the best k.
+
+    A quantized index only approximates similarities, so fetching a few times k
+    candidates and re-scoring them exactly recovers most of the lost recall. Only
+    the candidate rows are read, so memory-mapped vectors can stay on disk.
+
+    Returns:
+        (scores, rows) in the index's convention: higher inner product, lower L2 first
+    """
+    # Sorted rows read the memory-mapped file front to back
+    rows = numpy.sort(rows[rows >= 0])
+    candidates = numpy.asarray(vectors[rows], dtype="float32")
+    if metric == "euclidean":
+        scores = ((candidates - query) ** 2).sum(axis=1)
+        best = numpy.argsort(scores)[:k]
+    else:
+        scores = candidates @ query
+        best = numpy.argsort(-scores)[:k]
+    return scores[best], rows[best]
+
+
+def _synchronized(method):
+    """Run a FaissVectorStore method while holding the store's lock."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class _Namespace:
+    """Vectors, IDs and metadata for one namespace of a FaissVectorStore."""
+
+    def __init__(self, dimension: int):
+        self.vectors = numpy.zeros((0, dimension), dtype="float32")
+        self.ids: List[str] = []
+        self.metadata: List[Dict[str, Any]] = []
+        self.rows: Dict[str, int] = {}
+        self.index = None
+        self.dirty = True  # Index needs rebuilding
+        self.modified = True  # Files on disk are out of date
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class FaissVectorStore(VectorStore):
+    """
+    Local vector store backed by FAISS.
+
+    Each namespace is saved to ``<path>/<namespace>/`` as three files:
+    - index.faiss: the search index, reopened memory-mapped (see read_mapped_index)
+    - vectors.npy: the raw vectors, reopened with numpy memory-mapping
+    - records.json: vector IDs and metadata, in row order, and the index settings
+
+    The raw vectors are the source of truth. Upserts and deletes mark the
+    namespace dirty and the index is rebuilt on the next query or save, as it is
+    when the saved index was built with different settings.
+
+    ``rerank`` makes a query fetch rerank * top_k candidates from the index and
+    re-score them exactly with the raw vectors (see rerank_exact), which is worth
+    doing when the index is quantized.
+
+    ``truncate_dimension`` keeps only the leading dimensions of every vector
+    (stored and queried), renormalized for cosine. OpenAI's text-embedding-3
+    models are trained so that a prefix is still a good embedding. Combine it
+    with ``quantization`` (see build_faiss_index) to shrink the index further.
+    """
+
+    def __init__(self, path: str, dimension: Optional[int] = None, index_type: str = "flat",
+                 metric: str = "cosine", truncate_dimension: Optional[int] = None, rerank: int = 0,
+                 **index_options):
+        self.path = path
+        self.dimension = truncate_dimension or dimension
+        self.truncate_dimension = truncate_dimension
+        self.rerank = rerank
+        self.index_type = index_type
+        self.metric = metric
+        self.index_options = index_options
+        self._settings = {"index_type": index_type, "metric": metric,
+                          "truncate_dimension": truncate_dimension, **index_options}
+        self.namespaces: Dict[str, _Namespace] = {}
+        # Upserts may arrive from several ingestion worker threads at once
+        self._lock = threading.RLock()
+        if os.path.isdir(path):
+            self._load()
+
+    def _load(self):
+        for name in sorted(os.listdir(self.path)):
+            directory = os.path.join(self.path, name)
+            records_path = os.path.join(directory, "records.json")
+            if not os.path.isfile(records_path):
+                continue
+            with open(records_path, "r") as f:
+                records = json.load(f)
+
+            vectors_path = os.path.join(directory, "vectors.npy")
+            if not records["ids"] or not os.path.isfile(vectors_path):
+                continue
+            vectors = numpy.load(vectors_path, mmap_mode="r")
+            if self.dimension and vectors.shape[1] != self.dimension:
+                raise ValueError(f"{directory} holds {vectors.shape[1]}-dimensional vectors but the store "
+                                 f"expects {self.dimension}; delete it and ingest again")
+            ns = _Namespace(vectors.shape[1])
+            ns.vectors = vectors
+            ns.ids = records["ids"]
+            ns.metadata = records["metadata"]
+            ns.rows = {vector_id: row for row, vector_id in enumerate(ns.ids)}
+
+            index_path = os.path.join(directory, "index.faiss")
+            if os.path.isfile(index_path) and records.get("settings") == self._settings:
+                ns.index = read_mapped_index(index_path)
+                ns.dirty = False
+            # A missing or differently configured index is rebuilt and saved again
+            ns.modified = ns.dirty
+
+            self.dimension = self.dimension or vectors.shape[1]
+            self.namespaces[self._namespace_key(name)] = ns
+
+    @staticmethod
+    def _namespace_dir(namespace: str) -> str:
+        return namespace or "__default__"
+
+    @staticmethod
+    def _namespace_key(directory: str) -> str:
+        return "" if directory == "__default__" else directory
+
+    def _prepare(self, values) -> numpy.ndarray:
+        vectors = numpy.array(values, dtype="float32", ndmin=2)
+        if self.truncate_dimension:
+            vectors = vectors[:, :self.truncate_dimension]
+        if self.metric == "cosine":
+            norms = numpy.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / numpy.maximum(norms, 1e-12)
+        return vectors
+
+    def _ensure_index(self, ns: _Namespace):
+        if ns.dirty or ns.index is None:
+            ns.index = build_faiss_index(numpy.ascontiguousarray(ns.vectors), self.index_type,
+                                         self.metric, **self.index_options)
+            ns.dirty = False
+        return ns.index
+
+    @_synchronized
+    def upsert(self, vectors, namespace=""):
+        if not vectors:
+            return {"upserted_count": 0}
+        # An ID repeated within one call keeps its last vector, as separate upserts would
+        vectors = list({vector["id"]: vector for vector in vectors}.values())
+        values = self._prepare([vector["values"] for vector in vectors])
+        if self.dimension is None:
+            self.dimension = values.shape[1]
+        elif values.shape[1] != self.dimension:
+            raise ValueError(f"Vector dimension {values.shape[1]} does not match store dimension {self.dimension}")
+
+        ns = self.namespaces.setdefault(namespace, _Namespace(self.dimension))
+        new_values = []
+        if isinstance(ns.vectors, numpy.memmap):
+            # Copy out of the read-only memory-mapped file before modifying rows in place
+            ns.vectors = numpy.array(ns.vectors)
+        for vector, row_values in zip(vectors, values):
+            row = ns.rows.get(vector["id"])
+            if row is None:
+                ns.rows[vector["id"]] = len(ns.ids)
+                ns.ids.append(vector["id"])
+                ns.metadata.append(dict(vector.get("metadata") or {}))
+                new_values.append(row_values)
+            else:
+                ns.vectors[row] = row_values
+                ns.metadata[row] = dict(vector.get("metadata") or {})
+
+        if new_values:
+            ns.vectors = numpy.vstack([ns.vectors, numpy.array(new_values, dtype="float32")])
+        ns.dirty = True
+        ns.modified = True
+        return {"upserted_count": len(vectors)}
+
+    @_synchronized
+    def query(self, vector, top_k=5, namespace="", include_metadata=True, include_values=False):
+        ns = self.namespaces.get(namespace)
+        if ns is None or len(ns) == 0:
+            return {"matches": [], "namespace": namespace}
+
+        index = self._ensure_index(ns)
+        query = self._prepare(vector)
+        top_k = min(top_k, len(ns))
+        if self.rerank > 1:
+            _, rows = index.search(query, min(top_k * self.rerank, len(ns)))
+            scores, rows = rerank_exact(ns.vectors, query[0], rows[0], top_k, self.metric)
+        else:
+            scores, rows = index.search(query, top_k)
+            scores, rows = scores[0], rows[0]
+
+        matches = []
+        for score, row in zip(scores, rows):
+            if row < 0:
+                continue
+            matches.append({
+                "id": ns.ids[row],
+                # Report L2 as a similarity so higher is always better
+                "score": float(-score if self.metric == "euclidean" else score),
+                "metadata": dict(ns.metadata[row]) if include_metadata else {},
+                "values": ns.vectors[row].tolist() if include_values else [],
+            })
+        return {"matches": matches, "namespace": namespace}
+
+    @_synchronized
+    def delete(self, ids=None, namespace="", delete_all=False):
+        ns = self.namespaces.get(namespace)
+        if ns is None:
+            return
+        if delete_all:
+            self.namespaces[namespace] = _Namespace(self.dimension)
+            return
+
+        doomed = {ns.rows[vector_id] for vector_id in ids or [] if vector_id in ns.rows}
+        if not doomed:
+            return
+        keep = [row for row in range(len(ns)) if row not in doomed]
+        ns.vectors = numpy.asarray(ns.vectors)[keep]
+        ns.ids = [ns.ids[row] for row in keep]
+        ns.metadata = [ns.metadata[row] for row in keep]
+        ns.rows = {vector_id: row for row, vector_id in enumerate(ns.ids)}
+        ns.dirty = True
+        ns.modified = True
+
+    @_synchronized
+    def describe_index_stats(self):
+        return {
+            "dimension": self.dimension,
+            "total_vector_count": sum(len(ns) for ns in self.namespaces.values()),
+            "namespaces": {
+                name: {"vector_count": len(ns)}
+                for name, ns in self.namespaces.items() if len(ns)
+            },
+        }
+
+    @_synchronized
+    def save(self):
+        """Write modified namespaces to disk and reopen them memory-mapped."""
+        import faiss
+
+        os.makedirs(self.path, exist_ok=True)
+        for name, ns in self.namespaces.items():
+            if not ns.modified:
+                continue
+            directory = os.path.join(self.path, self._namespace_dir(name))
+            os.makedirs(directory, exist_ok=True)
+            index_path = os.path.join(directory, "index.faiss")
+            vectors_path = os.path.join(directory, "vectors.npy")
+
+            if len(ns) == 0:
+                for stale in (index_path, vectors_path):
+                    if os.path.exists(stale):
+                        os.remove(stale)
+                _write_json(os.path.join(directory, "records.json"), {"ids": [], "metadata": []})
+                ns.modified = False
+                continue
+
+            # Write to temporary files and swap them in, so readers that still
+            # have the old files memory-mapped keep a consistent view
+            faiss.write_index(self._ensure_index(ns), index_path + ".tmp")
+            with open(vectors_path + ".tmp", "wb") as f:
+                numpy.save(f, numpy.asarray(ns.vectors))
+            os.replace(index_path + ".tmp", index_path)
+            os.replace(vectors_path + ".tmp", vectors_path)
+            _write_json(os.path.join(directory, "records.json"),
+                        {"ids": ns.ids, "metadata": ns.metadata, "settings": self._settings})
+
+            ns.vectors = numpy.load(vectors_path, mmap_mode="r")
+            ns.index = read_mapped_index(index_path)
+            ns.modified = False
+
+
+def _write_json(path: str, data: Any) -> None:
+    with open(path + ".tmp", "w") as f:
+        json.dump(data, f)
+    os.replace(path + ".tmp", path)
@@ -0,0 +1,61 @@
+import pytest
+
+from common.batch_embedder import pack_batches
+from common.batch_upserter import (MAX_METADATA_BYTES, MAX_REQUEST_BYTES, MAX_VECTORS_PER_REQUEST,
+                                   BatchUpserter, payload_bytes)
+
+
+def vector(position, text_bytes=0):
+    return {"id": f"v{position}", "values": [0.5] * 8, "metadata": {"text": "x" * text_bytes}}
+
+
+class Recorder:
+    def __init__(self):
+        self.requests = []
+
+    def __call__(self, vectors, namespace):
+        self.requests.append((namespace, [vector["id"] for vector in vectors]))
+
+
+def test_pack_batches_respects_both_limits_and_keeps_order():
+    assert pack_batches([1, 1, 1, 1, 1], max_inputs=2, max_tokens=100) == [[0, 1], [2, 3], [4]]
+    assert pack_batches([60, 50, 10, 90], max_inputs=10, max_tokens=100) == [[0], [1, 2], [3]]
+    # An input over the token limit still gets a request of its own
+    assert pack_batches([150, 10], max_inputs=10, max_tokens=100) == [[0], [1]]
+
+
+def test_plan_caps_vectors_per_request():
+    upserter = BatchUpserter(Recorder(), verbose=False)
+    plan = upserter.plan([vector(i) for i in range(2500)])
+    assert [len(positions) for positions, _ in plan] == [MAX_VECTORS_PER_REQUEST, MAX_VECTORS_PER_REQUEST, 500]
+    upserter.close()
+
+
+def test_plan_keeps_requests_under_two_megabytes():
+    vectors = [vector(i, text_bytes=30_000) for i in range(200)]
+    upserter = BatchUpserter(Recorder(), verbose=False)
+    plan = upserter.plan(vectors)
+    assert len(plan) > 1
+    assert all(size <= MAX_REQUEST_BYTES for _, size in plan)
+    assert sum(size for _, size in plan) == sum(payload_bytes(v) for v in vectors)
+    assert [p for positions, _ in plan for p in positions] == list(range(200))
+    upserter.close()
+
+
+def test_oversized_metadata_is_rejected():
+    upserter = BatchUpserter(Recorder(), verbose=False)
+    with pytest.raises(ValueError):
+        upserter.plan([vector(0, text_bytes=MAX_METADATA_BYTES + 1)])
+    upserter.close()
+
+
+def test_add_sends_only_full_requests_until_flushed():
+    recorder = Recorder()
+    with BatchUpserter(recorder, max_vectors=3, verbose=False) as upserter:
+        assert upserter.add([vector(i) for i in range(2)], namespace="a") == 0
+        assert upserter.add([vector(i) for i in range(2, 7)], namespace="a") == 6
+        assert upserter.add([vector(7)], namespace="b") == 0
+    assert sorted(recorder.requests) == [
+        ("a", ["v0", "v1", "v2"]), ("a", ["v3", "v4", "v5"]), ("a", ["v6"]), ("b", ["v7"]),
+    ]
+
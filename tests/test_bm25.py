@@ -0,0 +1,78 @@
+import pytest
+
+from common.bm25 import BM25Index, hybrid_search, reciprocal_rank_fusion, tokenize
+from common.hashing_embedder import HashingEmbedder
+from common.vector_store import FaissVectorStore
+
+CHUNKS = {
+    "insurance": "Our insurance float grew again this year, and underwriting was profitable.",
+    "railroad": "BNSF, our railroad, moved more freight than any other railroad in the country.",
+    "energy": "Berkshire Hathaway Energy invested heavily in wind and solar generation.",
+    "buybacks": "We repurchased shares when they traded below intrinsic value.",
+}
+
+
+@pytest.fixture
+def bm25():
+    index = BM25Index()
+    for doc_id, text in CHUNKS.items():
+        index.add(doc_id, text, {"source": f"{doc_id}.txt"})
+    return index
+
+
+@pytest.fixture
+def vector_search(tmp_path):
+    embedder = HashingEmbedder(dimensions=64)
+    store = FaissVectorStore(str(tmp_path / "faiss"))
+    store.upsert([{"id": doc_id, "values": values, "metadata": {"source": f"{doc_id}.txt"}}
+                  for doc_id, values in zip(CHUNKS, embedder.embed(list(CHUNKS.values())))])
+
+    def search(query, top_k):
+        return store.query(embedder.embed([query])[0], top_k=top_k)["matches"]
+    return search
+
+
+def test_tokenize_drops_stopwords_and_possessives():
+    assert tokenize("The railroad's freight and Berkshire's float") == ["railroad", "freight", "berkshire", "float"]
+
+
+def test_search_ranks_matching_documents_first(bm25):
+    ranking = bm25.search("railroad freight", top_k=2)
+    assert ranking[0][0] == "railroad"
+    assert len(ranking) == 1
+    assert bm25.search("nothing matches this") == []
+
+
+def test_removed_documents_are_not_found(bm25):
+    bm25.remove(["railroad"])
+    assert bm25.search("railroad") == []
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "a", "d"]], k=60)
+    assert [doc_id for doc_id, _ in fused] in (["a", "b", "c", "d"], ["b", "a", "c", "d"])
+    assert fused[0][1] == pytest.approx(1 / 61 + 1 / 62)
+    assert dict(fused)["d"] == pytest.approx(1 / 63)
+
+
+def test_confident_keyword_match_skips_vector_search(bm25):
+    def vector_search(query, top_k):
+        raise AssertionError("vector search should not run")
+
+    matches = hybrid_search("BNSF railroad freight", bm25, vector_search, top_k=2)
+    assert matches[0]["id"] == "railroad"
+    assert matches[0]["retrieval"] == "lexical"
+    assert matches[0]["metadata"] == {"source": "railroad.txt"}
+
+
+def test_hybrid_fuses_both_rankings(bm25, vector_search):
+    matches = hybrid_search("wind and solar shares", bm25, vector_search, top_k=3)
+    assert {match["retrieval"] for match in matches} == {"hybrid"}
+    assert {"energy", "buybacks"} <= {match["id"] for match in matches}
+    assert all(match["metadata"]["source"] == f"{match['id']}.txt" for match in matches)
+
+
+def test_vector_mode_returns_plain_dicts(bm25, vector_search):
+    matches = hybrid_search("wind solar generation", bm25, vector_search, top_k=1, mode="vector")
+    assert matches == [{"id": "energy", "score": matches[0]["score"],
+                        "metadata": {"source": "energy.txt"}, "retrieval": "vector"}]
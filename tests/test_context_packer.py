@@ -0,0 +1,35 @@
+from common.context_packer import merge_passages, pack_context
+
+# One token per word keeps budgets easy to reason about
+count_words = lambda text: len(text.split())
+
+
+def test_overlapping_and_duplicate_chunks_are_merged():
+    documents = [
+        ("The first sentence. The second sentence overlaps.", 0.9),
+        ("The second sentence overlaps. A third one follows.", 0.7),
+        ("The first sentence.", 0.5),
+    ]
+    assert merge_passages(documents) == [
+        ("The first sentence. The second sentence overlaps. A third one follows.", 0.9),
+    ]
+
+
+def test_passages_fill_the_budget_in_score_order():
+    documents = [("Low scoring passage here.", 0.2), ("High scoring passage here.", 0.8)]
+    packed = pack_context(documents, max_tokens=100, count_tokens=count_words, separator="\n\n", min_fill=1)
+    assert packed.text == "High scoring passage here.\n\nLow scoring passage here."
+    assert packed.tokens == packed.retrieved_tokens == 8
+
+
+def test_a_passage_that_does_not_fit_is_cut_at_a_sentence_boundary():
+    text = "One two three four. Five six seven eight. Nine ten eleven twelve."
+    packed = pack_context([(text, 1.0)], max_tokens=10, count_tokens=count_words, min_fill=1)
+    assert packed.text == "One two three four. Five six seven eight."
+    assert packed.tokens == 8
+
+
+def test_a_cut_shorter_than_min_fill_is_skipped():
+    documents = [("One two three four five six. Seven eight.", 0.9), ("Nine ten.", 0.5)]
+    packed = pack_context(documents, max_tokens=5, count_tokens=count_words, separator=" ", min_fill=2)
+    assert packed.text == "Nine ten."
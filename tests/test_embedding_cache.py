@@ -0,0 +1,61 @@
+import time
+
+import numpy
+
+from common.embedding_cache import EmbeddingCache
+
+MODEL = "test-model"
+
+
+def vectors(count, dimensions=4):
+    return [[float(i)] * dimensions for i in range(count)]
+
+
+def test_embed_calls_embed_fn_only_for_misses(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+    calls = []
+
+    def embed_fn(texts):
+        calls.append(list(texts))
+        return [[float(len(text))] * 4 for text in texts]
+
+    first = cache.embed(["a", "bb", "a"], MODEL, None, embed_fn)
+    second = cache.embed(["bb", "ccc"], MODEL, None, embed_fn)
+
+    assert calls == [["a", "bb"], ["ccc"]]
+    assert first.dtype == numpy.float32 and first.shape == (3, 4)
+    assert second[:, 0].tolist() == [2.0, 3.0]
+    assert cache.hits == 1 and cache.misses == 4
+
+
+def test_dimensions_are_part_of_the_key(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+    cache.put_many(MODEL, 256, ["text"], vectors(1))
+    assert cache.get_many(MODEL, 512, ["text"]) == [None]
+    assert cache.get_many(MODEL, 256, ["text"])[0] is not None
+
+
+def test_evicts_least_recently_used_past_the_byte_cap(tmp_path):
+    # Each vector is 4 float32 values, 16 bytes; the cap holds four of them
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"), max_bytes=64)
+    texts = ["t0", "t1", "t2", "t3"]
+    for text in texts:
+        cache.put_many(MODEL, None, [text], vectors(1))
+        time.sleep(0.01)
+    assert cache._total_bytes == 64
+
+    # Touch t0 so t1 and t2 become the oldest entries
+    cache.get_many(MODEL, None, ["t0"])
+    cache.put_many(MODEL, None, ["t4"], vectors(1))
+
+    # Trimmed to 90% of the cap, so the two oldest go
+    found = cache.get_many(MODEL, None, texts + ["t4"])
+    assert [vector is not None for vector in found] == [True, False, False, True, True]
+    assert cache._total_bytes == cache._table_bytes() == 48
+
+
+def test_replacing_a_vector_does_not_grow_the_total(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+    cache.put_many(MODEL, None, ["t0", "t1"], vectors(2))
+    cache.put_many(MODEL, None, ["t0"], vectors(1))
+    assert cache._total_bytes == cache._table_bytes() == 32
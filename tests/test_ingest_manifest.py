@@ -0,0 +1,55 @@
+from common.ingest_manifest import IngestManifest, chunk_id
+
+
+def document(source, content):
+    return {"content": content, "metadata": {"source": source}}
+
+
+def test_chunk_ids_depend_on_content_and_repeat_count():
+    seen = {}
+    first = chunk_id("/letters/2020.txt", "Same text.", seen)
+    second = chunk_id("/elsewhere/2020.txt", "Same text.", seen)
+    assert first.startswith("2020.txt:")
+    assert second == f"{first}-1"
+    assert chunk_id("/letters/2020.txt", "Other text.") != first
+
+
+def test_diff_finds_changed_and_removed_documents(tmp_path):
+    manifest = IngestManifest(str(tmp_path / "manifest.json"), "chunks")
+    manifest.record(document("/letters/a.txt", "alpha"), ["a1"])
+    manifest.record(document("/letters/b.txt", "beta"), ["b1"])
+    manifest.record(document("/letters/c.txt", "gamma"), ["c1"])
+
+    changed, removed = manifest.diff(iter([
+        document("/letters/a.txt", "alpha"),
+        document("/letters/b.txt", "beta, edited"),
+        document("/letters/d.txt", "delta"),
+    ]))
+
+    assert [doc["metadata"]["source"] for doc in changed] == ["/letters/b.txt", "/letters/d.txt"]
+    assert all("content" not in doc for doc in changed)
+    assert removed == ["c.txt"]
+
+
+def test_stale_ids_keep_chunks_that_are_upserted_again(tmp_path):
+    manifest = IngestManifest(str(tmp_path / "manifest.json"), "chunks")
+    manifest.record(document("/letters/b.txt", "beta"), ["b1", "b2"])
+    manifest.record(document("/letters/c.txt", "gamma"), ["c1"])
+
+    stale = manifest.stale_ids({"b.txt": ["b2", "b3"]}, ["c.txt"])
+    assert sorted(stale) == ["b1", "c1"]
+
+
+def test_changed_settings_orphan_old_ids_except_reupserted_ones(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    manifest = IngestManifest(path, "chunks", {"chunk_size": 1000})
+    manifest.record(document("/letters/a.txt", "alpha"), ["a1", "a2"])
+    manifest.save()
+
+    reopened = IngestManifest(path, "chunks", {"chunk_size": 500})
+    assert reopened.documents == {}
+    assert reopened.stale_ids({"a.txt": ["a2", "a3"]}, []) == ["a1"]
+
+    # Saving clears the orphans, so they are deleted only once
+    reopened.save()
+    assert IngestManifest(path, "chunks", {"chunk_size": 500}).stale_ids({}, []) == []
@@ -0,0 +1,31 @@
+from common.mmr import mmr_rerank, mmr_select
+
+
+def test_relevance_only_keeps_similarity_order():
+    candidates = [[1.0, 0.0], [0.9, 0.1], [0.0, 1.0]]
+    assert mmr_select([1.0, 0.0], candidates, k=3, lambda_mult=1.0) == [0, 1, 2]
+
+
+def test_near_duplicates_lose_to_new_information():
+    # Candidates 0 and 1 are the same passage; 2 is less relevant but different
+    candidates = [[1.0, 0.0, 0.0], [0.99, 0.01, 0.0], [0.6, 0.0, 0.8]]
+    assert mmr_select([1.0, 0.0, 0.0], candidates, k=2, lambda_mult=0.3) == [0, 2]
+
+
+def test_k_is_capped_and_empty_input_is_allowed():
+    assert mmr_select([1.0, 0.0], [[1.0, 0.0]], k=5) == [0]
+    assert mmr_select([1.0, 0.0], [], k=5) == []
+
+
+def test_truncated_candidates_use_the_leading_query_dimensions():
+    assert mmr_select([0.0, 1.0, 5.0], [[1.0, 0.0], [0.0, 1.0]], k=1) == [1]
+
+
+def test_rerank_returns_the_original_matches():
+    matches = [{"id": "a", "score": 0.9, "values": [1.0, 0.0]},
+               {"id": "b", "score": 0.89, "values": [1.0, 0.0]},
+               {"id": "c", "score": 0.5, "values": [0.0, 1.0]}]
+    reranked = mmr_rerank([1.0, 0.2], matches, k=2, lambda_mult=0.5)
+    assert [match["id"] for match in reranked] == ["a", "c"]
+    assert reranked[0] is matches[0]
+    assert mmr_rerank([1.0, 0.0], [], k=2) == []
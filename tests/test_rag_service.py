@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+
+from common.rag_service import HTTPError, read_request
+
+
+def parse(raw, **options):
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(raw)
+        reader.feed_eof()
+        return await read_request(reader, **options)
+    return asyncio.run(run())
+
+
+def test_reads_a_request_with_a_body():
+    method, path, headers, body, keep_alive = parse(
+        b"POST /ask?debug=1 HTTP/1.1\r\nHost: localhost\r\nContent-Length: 17\r\n\r\n{\"question\": \"?\"}"
+    )
+    assert (method, path, body, keep_alive) == ("POST", "/ask", b"{\"question\": \"?\"}", True)
+    assert headers == {"host": "localhost", "content-length": "17"}
+
+
+def test_keep_alive_follows_version_and_connection_header():
+    assert parse(b"GET /health HTTP/1.1\r\nConnection: close\r\n\r\n")[4] is False
+    assert parse(b"GET /health HTTP/1.0\r\n\r\n")[4] is False
+
+
+def test_end_of_stream_returns_none():
+    assert parse(b"") is None
+
+
+@pytest.mark.parametrize("raw, status", [
+    (b"GARBAGE\r\n\r\n", 400),
+    (b"POST /ask HTTP/1.1\r\nContent-Length: ten\r\n\r\n", 400),
+    (b"POST /ask HTTP/1.1\r\nContent-Length: -1\r\n\r\n", 400),
+    (b"POST /ask HTTP/1.1\r\nContent-Length: 2048\r\n\r\n", 413),
+])
+def test_bad_requests_raise_http_errors(raw, status):
+    with pytest.raises(HTTPError) as error:
+        parse(raw, max_body=1024)
+    assert error.value.status == status
+
+
+def test_a_body_shorter_than_its_content_length_is_incomplete():
+    with pytest.raises(asyncio.IncompleteReadError):
+        parse(b"POST /ask HTTP/1.1\r\nContent-Length: 10\r\n\r\nshort")
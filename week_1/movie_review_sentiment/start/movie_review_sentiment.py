@@ -1,7 +1,9 @@
-from openai import OpenAI
+import os
+import sys
 
-# Initialize OpenAI client
-client = OpenAI()
+# Make the repository's shared `common` package importable when run as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+from common.llm_clients import get_openai_client
 
 def analyze_sentiment(review):
     """
@@ -26,7 +28,7 @@ def analyze_sentiment(review):
         sentiment: [positive/negative]
     """
 
-    response = client.chat.completions.create(
+    response = get_openai_client().chat.completions.create(
         model="gpt-4o-mini-2024-07-18",
         messages=[{"role": "user", "content": prompt}],
         temperature=0.7
@@ -1,8 +1,12 @@
-from openai import OpenAI
 from pydantic import BaseModel, Field
 from typing import List, Optional
 from pprint import pprint
 import os
+import sys
+
+# Make the repository's shared `common` package importable when run as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+from common.llm_clients import get_openai_client
 
 class Ingredient(BaseModel):
     """
@@ -24,7 +28,7 @@ def get_recipe_from_text(recipe_text: str) -> Recipe:
     """
     Convert recipe text into a structured Recipe object using OpenAI.
     """
-    client = OpenAI()
+    client = get_openai_client()
 
     # Make the API call
     response = client.responses.parse(
@@ -5,10 +5,15 @@ texts = [
     "The Shawshank Redemption is a story about hope and friendship",
 ]
 
-from openai import OpenAI
+import os
+import sys
+
+# Make the repository's shared `common` package importable when run as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from common.llm_clients import get_openai_client
 
 def get_embedding(text):
-    client = OpenAI()
+    client = get_openai_client()
     response = client.embeddings.create(
         model="text-embedding-3-small",
         input=text
@@ -1,41 +1,43 @@
-from openai import OpenAI
-import faiss
-import numpy
-
-# Example documents about movies
-texts = [
-    "The Godfather is a classic mafia crime drama about a boss avoiding prison",
-    "Inception explores dreams within dreams",
-    "The Shawshank Redemption is a story about hope and friendship",
-]
-
-def get_embedding(text):
-    client = OpenAI()
-    response = client.embeddings.create(
-        model="text-embedding-3-small",
-        input=text
-    )
-
-    return response.data[0].embedding
-
-embeddings = []
-for text in texts:
-    embedding = get_embedding(text)
-    embeddings.append(embedding)
-
-
-dimension = len(embeddings[0])
-index = faiss.IndexFlatL2(dimension)
-
-index.add(numpy.array(embeddings, dtype='float32'))
-
-query = 'Tell me about a prison movie'
-# Shawshank should be first, even though the word "prison" is never mentioned
-
-query_embedding = get_embedding(query)
-distances, indicies = index.search(numpy.array([query_embedding], dtype='float32'), 3)
-
-print("Best Matches with Distance (lower is better)")
-for i in range(3):
-    print(f"Match {i+1}, Distance: {distances[0][i]:.4f}")
-    print(texts[indicies[0][i]]) 
\ No newline at end of file
+import os
+import sys
+
+# Make the repository's shared `common` package importable when run as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+from common.mapped_index import MappedIndex
+from common.openai_embeddings import embed_texts
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+# Built and saved on the first run, then reopened memory-mapped; rebuilt when the texts change
+INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "faiss_index")
+# Split the index into this many parts searched in parallel, up to one per CPU core; pays off for large corpora
+INDEX_SHARDS = int(os.environ.get("INDEX_SHARDS", "1"))
+
+# Example documents about movies, by ID
+texts = {
+    "the-godfather": "The Godfather is a classic mafia crime drama about a boss avoiding prison",
+    "inception": "Inception explores dreams within dreams",
+    "the-shawshank-redemption": "The Shawshank Redemption is a story about hope and friendship",
+}
+
+def get_embeddings(texts):
+    """Embed several texts in one request, decoded from base64 straight into a float32 matrix."""
+    return embed_texts(texts, EMBEDDING_MODEL)
+
+# Only embeds the texts when the saved index is missing or was built from different texts.
+# "auto" keeps exact search for a handful of texts and picks and tunes IVF or HNSW for large corpora
+index = MappedIndex.open_or_build(INDEX_PATH, list(texts), list(texts.values()), get_embeddings,
+                                  index_type="auto", settings={"model": EMBEDDING_MODEL}, shards=INDEX_SHARDS)
+
+queries = ['Tell me about a prison movie', 'Which movie is about the mob?']
+# Shawshank should be first for the first query, even though the word "prison" is never mentioned
+
+# One embeddings request and one batched search for all the queries
+query_embeddings = get_embeddings(queries)
+results = index.search(query_embeddings, 3)
+
+for query, matches in zip(queries, results):
+    print(f"\n{query}")
+    print("Best Matches with Distance (lower is better)")
+    for i, match in enumerate(matches):
+        print(f"Match {i+1}, Distance: {match['score']:.4f}")
+        print(match["text"])
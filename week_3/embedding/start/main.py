@@ -1,7 +1,12 @@
-from openai import OpenAI
+import os
+import sys
 import faiss
 import numpy 
 
+# Make the repository's shared `common` package importable when run as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+from common.llm_clients import get_openai_client
+
 # Example documents about movies
 summaries = [
     "The Godfather is a classic mafia crime drama",
@@ -12,9 +17,9 @@ summaries = [
 def get_embedding(text):
     # TODO: Implement the OpenAI embedding functionality
     # Documentation: https://platform.openai.com/docs/guides/embeddings
-    # 1. Create an OpenAI client
+    # 1. Get the shared OpenAI client (one connection pool for all calls)
 
-    client = OpenAI()
+    client = get_openai_client()
 
     # 2. Make an API call to generate embeddings using the text-embedding-3-small model
 
@@ -0,0 +1,52 @@
+"""
+Answer a JSONL file of questions about the letters.
+
+Each input line is {"id": ..., "question": "..."} (or just a JSON string). Every
+pending question is embedded up front in as few requests as the API allows, then
+the vector searches and the chat calls run concurrently, with chat calls held
+to --rpm requests per minute. Results are appended to the output file as they
+finish:
+
+    {"id": ..., "question": "...", "answer": "...", "seconds": 1.2}
+
+If the run is interrupted, run the same command again: questions that already
+have an answer in the output are skipped, and failed ones are retried.
+
+Usage:
+    python bulk_ask.py questions.jsonl [--output answers.jsonl] [--rpm 500]
+"""
+
+import argparse
+import os
+import sys
+
+# Make the repository's shared `common` package importable when run as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+from common.bulk_qa import run_bulk_qa
+
+import main
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions about the letters")
+    parser.add_argument("questions", help="JSONL file with one question per line")
+    parser.add_argument("--output", help="JSONL file for the answers (default: <questions>.answers.jsonl)")
+    parser.add_argument("--namespace", default="chunks")
+    parser.add_argument("--search-concurrency", type=int, default=8, help="vector searches in flight at once")
+    parser.add_argument("--answer-concurrency", type=int, default=4, help="chat calls in flight at once")
+    parser.add_argument("--rpm", type=float, default=500, help="maximum chat calls per minute")
+    args = parser.parse_args()
+
+    output = args.output or os.path.splitext(args.questions)[0] + ".answers.jsonl"
+    counts = run_bulk_qa(
+        args.questions,
+        output,
+        # Lands every question's embedding in the cache, so the searches below don't call the API
+        embed_fn=main.get_embeddings,
+        search_fn=lambda question: main.search_documents(question, args.namespace, verbose=False),
+        answer_fn=lambda question, documents: main.ask_openai(question, documents, verbose=False),
+        search_concurrency=args.search_concurrency,
+        answer_concurrency=args.answer_concurrency,
+        requests_per_minute=args.rpm,
+    )
+    print(f"Answered {counts['answered']}, failed {counts['failed']}, "
+          f"skipped {counts['skipped']} already answered. Results in {output}")
@@ -1,9 +1,27 @@
 import os
-import glob
-import openai
+import sys
 import re
+import threading
 from typing import List
-from pinecone import Pinecone
+
+import numpy
+
+# Make the repository's shared `common` package importable when run as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+from common.answer_cache import AnswerCache
+from common.batch_embedder import BatchEmbedder, make_token_counter
+from common.batch_upserter import BatchUpserter
+from common.chat_stream import stream_chat_completion
+from common.chunking import iter_document_chunks
+from common.context_packer import pack_context
+from common.document_stream import iter_documents
+from common.embedding_cache import EmbeddingCache
+from common.ingest_manifest import IngestManifest, chunk_id, document_key
+from common.ingest_pipeline import ingest
+from common.llm_clients import get_openai_client
+from common.mmr import mmr_rerank
+from common.openai_embeddings import embed_texts
+from common.vector_store import FaissVectorStore, PineconeVectorStore
 
 def get_api_key_from_zshrc():
     """Read the Pinecone API key from .zshrc file."""
@@ -20,203 +38,339 @@ def get_api_key_from_zshrc():
         print(f"Error reading .zshrc: {e}")
     return None
 
-# Initialize OpenAI client
-client = openai.OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+# The openai, pinecone and faiss packages are imported, and the clients created,
+# on first use, so importing this module doesn't wait on them or on the network.
+# get_openai_client returns the process's shared, pooled client (common/llm_clients.py).
+# serve.py and bulk_ask.py call the getters from several threads, so creation is locked
+_lock = threading.Lock()
+_vector_store = None
 
 # Pinecone Serverless settings (update these for your project):
 # See your Pinecone console for correct values
 # Pinecone configuration
 INDEX_NAME = "letters-test"
+INDEX_HOST = os.environ.get("PINECONE_INDEX_HOST", "letters-test-gyip7p4.svc.aped-4627-b74a.pinecone.io")
 EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIMENSIONS = 512  # Must match the index dimension
 CHAT_MODEL = "gpt-4o-mini-2024-07-18"
+# Token budget for the retrieved text sent with each question
+CONTEXT_TOKENS = int(os.environ.get("CONTEXT_TOKENS", "3000"))
+count_chat_tokens = make_token_counter(CHAT_MODEL)
+# Print answers token by token as they are generated (set to 0 to wait for the full answer)
+STREAM_ANSWERS = os.environ.get("STREAM_ANSWERS", "1") == "1"
+# Re-select search hits by maximal marginal relevance so near-duplicate chunks don't crowd the prompt
+SEARCH_MMR = os.environ.get("SEARCH_MMR", "1") == "1"
+MMR_FETCH_K = 20  # Candidates fetched, with their vectors, before MMR picks from them
+MMR_LAMBDA = float(os.environ.get("MMR_LAMBDA", "0.7"))  # 1.0 = relevance only
+
+# Number of embedding requests sent at the same time during ingestion
+EMBEDDING_CONCURRENCY = int(os.environ.get("EMBEDDING_CONCURRENCY", "4"))
+# Number of upsert requests sent at the same time during ingestion
+UPSERT_CONCURRENCY = int(os.environ.get("UPSERT_CONCURRENCY", "4"))
+
+# Vector store backend: "pinecone" (hosted) or "faiss" (local, saved next to this script)
+VECTOR_STORE = os.environ.get("VECTOR_STORE", "pinecone")
+FAISS_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "faiss_index")
+FAISS_INDEX_TYPE = os.environ.get("FAISS_INDEX_TYPE", "hnsw")
+# Smaller vectors: "none" (float32), "fp16", "int8" or "pq", optionally truncated to fewer dimensions
+FAISS_QUANTIZATION = os.environ.get("FAISS_QUANTIZATION", "none")
+FAISS_TRUNCATE_DIMS = int(os.environ.get("FAISS_TRUNCATE_DIMS", "0")) or None
+# Re-score this many times top_k candidates with the raw vectors (worthwhile with "pq")
+FAISS_RERANK = int(os.environ.get("FAISS_RERANK", "0"))
+
+# Records which letters (and which chunk IDs) are already in the index, per backend
+MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), f"ingest_manifest_{VECTOR_STORE}.json")
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
 
-# Get API key from .zshrc or environment
-pinecone_api_key = os.environ.get("PINECONE_API_KEY") or get_api_key_from_zshrc()
-if not pinecone_api_key:
-    raise ValueError("Pinecone API key not found. Please set PINECONE_API_KEY in your environment or .zshrc file.")
-
-# Initialize Pinecone client
-pc = Pinecone(api_key=pinecone_api_key)
-
-# Connect to the index
-index = pc.Index(INDEX_NAME, host="letters-test-gyip7p4.svc.aped-4627-b74a.pinecone.io")
-
-# Verify the index connection
-try:
-    stats = index.describe_index_stats()
-    print(f"Successfully connected to index: {INDEX_NAME}")
-    print(f"Index stats: {stats}")
-except Exception as e:
-    print(f"Error connecting to index: {e}")
-    print("Please verify your API key and endpoint URL.")
-
-def load_documents():
-    """Load all text documents from the letters directory."""
-    documents = []
+def connect_vector_store():
+    """Connect to the configured vector store."""
+    if VECTOR_STORE == "faiss":
+        store = FaissVectorStore(FAISS_INDEX_PATH, index_type=FAISS_INDEX_TYPE, quantization=FAISS_QUANTIZATION,
+                                 truncate_dimension=FAISS_TRUNCATE_DIMS, rerank=FAISS_RERANK)
+        print(f"Using local FAISS index at: {FAISS_INDEX_PATH}")
+        return store
+
+    # Get API key from .zshrc or environment
+    pinecone_api_key = os.environ.get("PINECONE_API_KEY") or get_api_key_from_zshrc()
+    if not pinecone_api_key:
+        raise ValueError("Pinecone API key not found. Please set PINECONE_API_KEY in your environment or .zshrc file.")
+
+    # Initialize Pinecone client and connect to the index
+    from pinecone import Pinecone
+    pc = Pinecone(api_key=pinecone_api_key)
+    store = PineconeVectorStore(pc.Index(INDEX_NAME, host=INDEX_HOST))
+
+    # Verify the index connection
+    try:
+        stats = store.describe_index_stats()
+        print(f"Successfully connected to index: {INDEX_NAME}")
+        print(f"Index stats: {stats}")
+    except Exception as e:
+        print(f"Error connecting to index: {e}")
+        print("Please verify your API key and endpoint URL.")
+    return store
+
+def get_vector_store():
+    """Return the configured vector store, connecting on first use."""
+    global _vector_store
+    if _vector_store is None:
+        with _lock:
+            if _vector_store is None:
+                _vector_store = connect_vector_store()
+    return _vector_store
+
+# On-disk cache so unchanged chunks and repeated queries skip the embeddings API
+_embedding_cache = None
+
+def get_embedding_cache():
+    """Return the embedding cache, opening it on first use."""
+    global _embedding_cache
+    if _embedding_cache is None:
+        with _lock:
+            if _embedding_cache is None:
+                _embedding_cache = EmbeddingCache()
+    return _embedding_cache
+
+# Answers to earlier questions, reused for near-identical ones until the next ingestion
+_answer_cache = None
+
+def get_answer_cache():
+    """Return the answer cache, opening it on first use."""
+    global _answer_cache
+    if _answer_cache is None:
+        with _lock:
+            if _answer_cache is None:
+                _answer_cache = AnswerCache(os.path.join(os.path.dirname(os.path.abspath(__file__)), "answer_cache.sqlite"))
+    return _answer_cache
+
+def load_documents(paths=None):
+    """
+    Load text documents from the letters directory one at a time.
+    Large files are memory-mapped instead of read into memory.
+    """
     script_dir = os.path.dirname(os.path.abspath(__file__))
     path = os.path.join(script_dir, "letters/*.txt")
-    files = glob.glob(path)
-    
-    for file_path in files:
-        with open(file_path, 'r') as file:
-            content = file.read()
-            documents.append({"content": content, "metadata": {"source": file_path}})
+    count = 0
+    for doc in iter_documents(path, paths):
+        count += 1
+        yield doc
     
-    print(f"Found {len(documents)} letters")
-    return documents
+    print(f"Found {count} letters")
 
-def chunk_documents(documents, chunk_size=1000, chunk_overlap=200):
+def chunk_documents(documents, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
     """
     Split documents into meaningful chunks while preserving context.
-    Tries to split at paragraph boundaries when possible.
+    Chunks end on paragraph or sentence boundaries, and each one starts with
+    up to chunk_overlap characters from the end of the previous one.
+    Each chunk gets an ID derived from its letter and its text.
+    Chunks are yielded one at a time so they can stream into the embedder.
     """
-    chunks = []
+    chunk_count = 0
+    doc_count = 0
     
     for doc in documents:
-        content = doc["content"]
+        doc_count += 1
         metadata = doc["metadata"]
+        seen_ids = {}
         
-        # First, split into paragraphs (double newlines)
-        paragraphs = content.split('\n\n')
-        current_chunk = []
-        current_length = 0
-        
-        for para in paragraphs:
-            para = para.strip()
-            if not para:
-                continue
-                
-            # If adding this paragraph would exceed chunk size, finalize current chunk
-            if current_chunk and (current_length + len(para) > chunk_size):
-                chunk_text = '\n\n'.join(current_chunk)
-                chunks.append({
-                    "content": chunk_text,
-                    "metadata": metadata
-                })
-                
-                # Start new chunk with overlap from previous chunk
-                overlap_start = max(0, len(current_chunk) - chunk_overlap // 100)
-                current_chunk = current_chunk[overlap_start:]
-                current_length = sum(len(p) for p in current_chunk) + 2 * len(current_chunk)  # +2 for newlines
-            
-            current_chunk.append(para)
-            current_length += len(para) + 2  # +2 for newlines
-        
-        # Add the last chunk if it's not empty
-        if current_chunk:
-            chunk_text = '\n\n'.join(current_chunk)
-            chunks.append({
+        for offset, length, chunk_text in iter_document_chunks(doc, chunk_size, chunk_overlap):
+            chunk_count += 1
+            yield {
+                "id": chunk_id(metadata["source"], chunk_text, seen_ids),
                 "content": chunk_text,
-                "metadata": metadata
-            })
+                "metadata": metadata,
+                "span": (offset, length)
+            }
     
-    print(f"Created {len(chunks)} chunks from {len(documents)} documents")
-    return chunks
+    print(f"Created {chunk_count} chunks from {doc_count} documents")
 
-def get_embedding(text: str) -> List[float]:
+def get_embedding(text: str) -> numpy.ndarray:
     """Get embedding for a single piece of text."""
-    response = client.embeddings.create(
-        model=EMBEDDING_MODEL,
-        input=text,
-        dimensions=512  # Ensure we match the index dimension
-    )
-    return response.data[0].embedding
+    return request_embeddings([text])[0]
+
+def request_embeddings(texts: List[str], out=None) -> numpy.ndarray:
+    """
+    Get embeddings for several texts in a single API request.
+
+    The vectors arrive base64-encoded and are decoded into a float32 matrix,
+    or into out: this request's rows of the matrix BatchEmbedder preallocates.
+    """
+    # EMBEDDING_DIMENSIONS ensures we match the index dimension
+    return embed_texts(texts, EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, out=out, client=get_openai_client())
+
+# Packs texts into as few requests as the token limits allow and sends them concurrently,
+# each one decoding into its own rows of a single float32 matrix
+batch_embedder = BatchEmbedder(request_embeddings, model=EMBEDDING_MODEL, max_concurrency=EMBEDDING_CONCURRENCY,
+                               dimensions=EMBEDDING_DIMENSIONS)
 
 def get_embeddings(texts: List[str]):
-    """Generate embeddings for a list of texts using OpenAI."""
-    embeddings = [get_embedding(text) for text in texts]
+    """Generate embeddings for a list of texts using OpenAI, reusing cached vectors."""
+    embeddings = get_embedding_cache().embed(texts, EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, batch_embedder.embed)
     return embeddings
 
+def embed_query(text):
+    """Embed one question."""
+    return get_embeddings([text])[0]
+
+def cached_embedding(text):
+    """The text's embedding if it was computed before, without calling the API; otherwise None."""
+    return get_embedding_cache().get_many(EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, [text])[0]
+
 def embed_documents(chunks, namespace):
-    """Embed documents and store them in Pinecone."""
-    # Use the global index object (classic API)
-    global index
-    batch_size = 100
-    for i in range(0, len(chunks), batch_size):
-        chunk_batch = chunks[i:i+batch_size]
-        
-        # Get text from each chunk
-        texts = [chunk["content"] for chunk in chunk_batch]
-        
-        # Get embeddings
-        embeddings = get_embeddings(texts)
-        
+    """Embed documents and store them in the vector store."""
+    index = get_vector_store()
+    # Sizes upsert requests by payload bytes (chunk text rides along in the metadata) and sends them in parallel.
+    # Vectors are buffered across pipeline batches, so every request but the last is full
+    upserter = BatchUpserter(index.upsert, max_concurrency=UPSERT_CONCURRENCY)
+
+    def upsert_batch(chunk_batch, embeddings):
         # Prepare data for Pinecone
         vectors = []
-        for j, (chunk, embedding) in enumerate(zip(chunk_batch, embeddings)):
+        for chunk, embedding in zip(chunk_batch, embeddings):
             # Include both the original metadata and the content in the vector's metadata
             vector_metadata = chunk["metadata"].copy()
             vector_metadata["content"] = chunk["content"]  # Store the actual text content
             
             vectors.append({
-                "id": f"chunk_{i+j}",
+                "id": chunk["id"],
                 "values": embedding,
                 "metadata": vector_metadata
             })
         
-        # Upsert to Pinecone
+        # Upsert to the vector store; only requests that fail are sent again
         try:
-            upsert_response = index.upsert(vectors=vectors, namespace=namespace)
-            print(f"Upserted batch {i//batch_size + 1}, response: {upsert_response}")
+            upserter.add(vectors, namespace=namespace)
         except Exception as e:
-            print(f"Error upserting batch {i//batch_size + 1}: {e}")
+            print(f"Error upserting batch starting at {chunk_batch[0]['id']}: {e}")
             raise
 
-def search_documents(query, namespace, top_k=5):
-    """Search the vector store with the user query."""
-    print(f"\nSearching for: {query}")
+    # Embedding and upserting overlap: batch N+1 is embedded while batch N is upserted.
+    # Leaving the with block sends the buffered rest and stops the upsert threads
+    with upserter:
+        ingest(chunks, get_embeddings, upsert_batch, batch_size=100,
+               embed_concurrency=EMBEDDING_CONCURRENCY, upsert_concurrency=UPSERT_CONCURRENCY)
+    print(upserter.summary())
+
+    # Write the local index to disk (no-op for Pinecone)
+    index.save()
+
+def search_documents(query, namespace, top_k=5, verbose=True, query_embedding=None):
+    """
+    Search the vector store with the user query, printing a preview of each match if verbose.
+    Pass query_embedding if the query was already embedded.
+    """
+    if verbose:
+        print(f"\nSearching for: {query}")
     
     # Get query embedding
-    query_embedding = get_embeddings([query])[0]
+    if query_embedding is None:
+        query_embedding = get_embeddings([query])[0]
     
-    # Search Pinecone
-    result = index.query(
+    # Search the vector store, over-fetching candidates (with their vectors) for MMR
+    result = get_vector_store().query(
         namespace=namespace,
         vector=query_embedding, 
-        top_k=top_k,
+        top_k=max(top_k, MMR_FETCH_K) if SEARCH_MMR else top_k,
         include_metadata=True,
-        include_values=False
+        include_values=SEARCH_MMR
     )
+    matches = result["matches"]
+    if SEARCH_MMR:
+        # Pick a diverse top_k instead of several copies of the same passage
+        matches = mmr_rerank(query_embedding, matches, top_k, MMR_LAMBDA)
     
     # Process and print results
-    print(f"\nTop {top_k} matches:")
+    if verbose:
+        print(f"\nTop {top_k} matches:")
     docs_with_scores = []
-    if hasattr(result, 'matches'):
-        for i, match in enumerate(result.matches, 1):
-            doc_text = match.metadata.get('content', '') if hasattr(match, 'metadata') else ''
+    for i, match in enumerate(matches, 1):
+        doc_text = match["metadata"].get('content', '')
+        if verbose:
             # Show first 100 chars of each match
             preview = (doc_text[:100] + '...') if len(doc_text) > 100 else doc_text
-            print(f"\nMatch {i} (Score: {match.score:.3f}):")
+            print(f"\nMatch {i} (Score: {match['score']:.3f}):")
             print(f"Preview: {preview}")
-            docs_with_scores.append((doc_text, match.score))
+        docs_with_scores.append((doc_text, match["score"]))
     
     return docs_with_scores
 
-def ask_openai(query, documents):
-    """Ask OpenAI a question with context from the documents."""
-    # Join all documents into a single context string
-    context = "\n\n".join([doc for doc, _ in documents])
+def build_messages(query, documents, verbose=True):
+    """Build the chat messages for a question with context from the documents."""
+    # Merge overlapping chunks, drop repeated text and fill the token budget in score order
+    packed = pack_context(documents, CONTEXT_TOKENS, count_chat_tokens)
+    if verbose:
+        print(packed.summary())
+    context = packed.text
     
-    response = client.chat.completions.create(
+    return [
+        {"role": "system", "content": "You are a helpful assistant that answers questions based on the provided context."},
+        {"role": "user", "content": f"Context: {context}\n\nQuestion: {query}\nAnswer:"}
+    ]
+
+def ask_openai(query, documents, verbose=True):
+    """Ask OpenAI a question with context from the documents."""
+    response = get_openai_client().chat.completions.create(
         model=CHAT_MODEL,
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant that answers questions based on the provided context."},
-            {"role": "user", "content": f"Context: {context}\n\nQuestion: {query}\nAnswer:"}
-        ],
+        messages=build_messages(query, documents, verbose),
         temperature=0.7,
         max_tokens=500
     )
     return response.choices[0].message.content.strip()
 
+def ask_openai_stream(query, documents):
+    """
+    Like ask_openai, but yield the answer text as it arrives.
+    Prints the time to first token and tokens/sec once the answer is complete.
+    """
+    stream = stream_chat_completion(
+        get_openai_client().chat.completions.create,
+        model=CHAT_MODEL,
+        messages=build_messages(query, documents),
+        temperature=0.7,
+        max_tokens=500
+    )
+    yield from stream
+    print(f"\n{stream.summary()}")
+
+def answer_query(query, namespace, stream=False):
+    """
+    Answer a question, reusing the cached answer to a near-identical earlier question.
+    With stream=True, returns an iterator over the answer text instead of a string.
+    """
+    # Embeds the question only if its exact text isn't cached
+    answer, query_embedding = get_answer_cache().lookup(query, namespace, CHAT_MODEL, embed_query)
+    if answer is not None:
+        print("Answer cache hit")
+        return iter([answer]) if stream else answer
+
+    docs_and_scores = search_documents(query=query, namespace=namespace, query_embedding=query_embedding)
+    if query_embedding is None:
+        # Reuse the vector search's embedding if it ran; a lexical match is cached by its text only
+        query_embedding = cached_embedding(query)
+    for _, score in docs_and_scores:
+        print(f"Score: {score}")
+    if stream:
+        return get_answer_cache().store_stream(ask_openai_stream(query, docs_and_scores),
+                                               query, query_embedding, namespace, CHAT_MODEL)
+    answer = ask_openai(query, docs_and_scores)
+    get_answer_cache().put(query, query_embedding, answer, namespace, CHAT_MODEL)
+    return answer
+
 def clear_index():
     """Delete all vectors from the index."""
-    global index
+    index = get_vector_store()
     try:
         # First get all vector IDs
         stats = index.describe_index_stats()
         if stats['namespaces'] and 'chunks' in stats['namespaces']:
             # Delete all vectors in the 'chunks' namespace
             index.delete(delete_all=True, namespace="chunks")
+            index.save()
+            manifest = IngestManifest(MANIFEST_PATH, "chunks", ingest_settings())
+            manifest.reset()
+            manifest.save()
+            get_answer_cache().invalidate("chunks")
             print("Successfully cleared all vectors from the 'chunks' namespace")
         else:
             print("No vectors found to delete")
@@ -226,31 +380,86 @@ def clear_index():
 def is_index_populated():
     """Check if the index already has documents."""
     try:
-        stats = index.describe_index_stats()
+        stats = get_vector_store().describe_index_stats()
         return stats['namespaces'].get('chunks', {}).get('vector_count', 0) > 0
     except Exception as e:
         print(f"Error checking index status: {e}")
         return False
 
+def ingest_settings():
+    """Settings that change chunk IDs or vectors; changing any of them re-ingests everything."""
+    return {
+        "embedding_model": EMBEDDING_MODEL,
+        "dimensions": EMBEDDING_DIMENSIONS,
+        "chunker": "sentence-boundary",
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+    }
+
+def ingest_documents(namespace):
+    """
+    Bring the index in line with the letters on disk.
+    Only new or changed letters are chunked and embedded, and vectors
+    belonging to changed or deleted letters are removed.
+    """
+    manifest = IngestManifest(MANIFEST_PATH, namespace, ingest_settings())
+    if manifest.documents and not is_index_populated():
+        print("Index is empty but the manifest is not. Re-ingesting every letter...")
+        manifest.reset()
+
+    changed, removed = manifest.diff(load_documents())
+    if not changed and not removed:
+        print("Index is up to date with the letters on disk.")
+        return
+
+    print(f"{len(changed)} new or changed letters, {len(removed)} removed letters")
+
+    # Chunk IDs are content-derived, so IDs already in the index need no work
+    existing = {vector_id for doc in changed for vector_id in manifest.chunk_ids(doc["metadata"]["source"])}
+    # Group the new chunk IDs by letter so stale IDs can be found and recorded
+    new_ids = {document_key(doc["metadata"]["source"]): [] for doc in changed}
+
+    def new_chunks():
+        # Re-read only the changed letters and stream their chunks into the embedder
+        changed_docs = load_documents([doc["metadata"]["source"] for doc in changed])
+        for chunk in chunk_documents(changed_docs):
+            new_ids[document_key(chunk["metadata"]["source"])].append(chunk["id"])
+            if chunk["id"] not in existing:
+                yield chunk
+
+    embed_documents(new_chunks(), namespace=namespace)
+
+    stale = manifest.stale_ids(new_ids, removed)
+    if stale:
+        index = get_vector_store()
+        index.delete(ids=stale, namespace=namespace)
+        index.save()
+        print(f"Deleted {len(stale)} stale vectors")
+
+    for doc in changed:
+        manifest.record(doc, new_ids[document_key(doc["metadata"]["source"])])
+    for key in removed:
+        manifest.forget(key)
+    manifest.save()
+
+    # Cached answers were built from the old index contents
+    get_answer_cache().invalidate(namespace)
+    print("Documents embedded successfully!")
+
 if __name__ == "__main__":
-    # Check if index is already populated
-    if not is_index_populated():
-        print("Index is empty. Loading and embedding documents...")
-        docs = load_documents()
-        chunks = chunk_documents(docs)
-        embed_documents(chunks, namespace="chunks")
-        print("Documents embedded successfully!")
-    else:
-        print("Index already contains documents. Using existing index.")
+    # Step 1: Embed any new or changed letters
+    ingest_documents(namespace="chunks")
 
     # Step 2: Write a query
     user_query = "When did Berkshire Hathaway purchase it's first coke stock?" # Year: 1988
 
-    # Step 3: Check Pinecone for similar chunks
-    docs_and_scores = search_documents(query=user_query, namespace="chunks")
-    for _, score in docs_and_scores:
-        print(f"Score: {score}")
-    
-    # Step 4: Put docs into prompt and send to OpenAI
-    response = ask_openai(user_query, docs_and_scores)
-    print(response) 
\ No newline at end of file
+    # Step 3: Check the vector store for similar chunks and put them into a prompt for OpenAI.
+    # A near-identical question asked before is answered from the answer cache instead.
+    if STREAM_ANSWERS:
+        # Print the answer as it is generated
+        for text in answer_query(user_query, namespace="chunks", stream=True):
+            print(text, end="", flush=True)
+        print()
+    else:
+        response = answer_query(user_query, namespace="chunks")
+        print(response) 
\ No newline at end of file
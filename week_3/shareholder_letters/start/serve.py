@@ -0,0 +1,33 @@
+"""
+Answer questions about the letters over HTTP.
+
+main.py is imported once, so it connects to the vector store and checks the
+index a single time, and the OpenAI client and the caches stay warm between
+requests. Each question costs only the query embedding, the vector query and
+the chat call. Run main.py first to index the letters.
+
+Usage:
+    python serve.py [--host 127.0.0.1] [--port 8000] [--concurrency 8]
+
+    curl -s localhost:8000/ask -d '{"question": "When did Berkshire buy Coke?"}'
+    curl -sN localhost:8000/ask -d '{"question": "When did Berkshire buy Coke?", "stream": true}'
+"""
+
+import argparse
+import os
+import sys
+
+# Make the repository's shared `common` package importable when run as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+from common.rag_service import run
+
+import main
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve POST /ask for the shareholder letters")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--concurrency", type=int, default=8, help="questions answered at the same time")
+    args = parser.parse_args()
+
+    run(main.answer_query, args.host, args.port, namespace="chunks", max_concurrency=args.concurrency)
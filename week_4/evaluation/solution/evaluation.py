@@ -1,10 +1,14 @@
 import json
 import os
-from openai import OpenAI
+import sys
 from langsmith.evaluation import evaluate
 
+# Make the repository's shared `common` package importable when run as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+from common.llm_clients import get_openai_client
+
 # Initialize the OpenAI client
-client = OpenAI()
+client = get_openai_client()
 
 # Dataset name in LangSmith (already uploaded)
 dataset_name = "news_dataset_class"
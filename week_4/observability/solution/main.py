@@ -1,161 +1,337 @@
 import os
-import glob
-import openai
-from pinecone import Pinecone
+import sys
+import threading
 from typing import List
-from langsmith import Client, traceable
 
-# Initialize OpenAI and Pinecone clients
-openai.api_key = os.environ.get("OPENAI_API_KEY")
-pc = Pinecone(api_key=os.environ.get("PINECONE_API_KEY"))
+# Make the repository's shared `common` package importable when run as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+from common.answer_cache import AnswerCache
+from common.batch_embedder import make_token_counter
+from common.bm25 import BM25Index, hybrid_search
+from common.chat_stream import stream_chat_completion
+from common.chunk_store import ChunkStore
+from common.chunking import iter_document_chunks
+from common.context_packer import pack_context
+from common.document_stream import iter_documents
+from common.embedding_cache import EmbeddingCache
+from common.ingest_pipeline import ingest
+from common.llm_clients import get_openai_client
+from common.mmr import mmr_rerank
+from common.openai_embeddings import embed_texts
+from common.tracing import current_run, traceable
 
-# LangSmith client setup
-langsmith_api_key = os.environ.get("LANGCHAIN_API_KEY")
+# LangSmith setup; traced functions import langsmith on their first call while tracing is on
 langsmith_project = "rag-observability"
-langsmith_client = Client(api_key=langsmith_api_key)
 
 # Constants
 INDEX_NAME = "test"
 EMBEDDING_MODEL = "text-embedding-3-small"
 CHAT_MODEL = "gpt-4o-mini-2024-07-18"
+# Token budget for the retrieved text sent with each question
+CONTEXT_TOKENS = int(os.environ.get("CONTEXT_TOKENS", "3000"))
+count_chat_tokens = make_token_counter(CHAT_MODEL)
+# Print answers token by token as they are generated (set to 0 to wait for the full answer)
+STREAM_ANSWERS = os.environ.get("STREAM_ANSWERS", "1") == "1"
 
-@traceable(name="load_documents")
-def load_documents():
-    """Load all text documents from the letters directory."""
-    documents = []
+# Retrieval: "hybrid" (BM25 + vectors fused with RRF), "vector" or "lexical"
+SEARCH_MODE = os.environ.get("SEARCH_MODE", "hybrid")
+# Re-select vector hits by maximal marginal relevance so near-duplicate chunks don't crowd the prompt
+SEARCH_MMR = os.environ.get("SEARCH_MMR", "1") == "1"
+MMR_FETCH_K = 20  # Candidates fetched, with their vectors, before MMR picks from them
+MMR_LAMBDA = float(os.environ.get("MMR_LAMBDA", "0.7"))  # 1.0 = relevance only
+
+# serve.py calls the getters from several threads, so creation is locked
+_lock = threading.Lock()
+_keyword_indexes = {}
+
+def get_keyword_index(namespace):
+    """Return the BM25 index for a namespace, loading it from disk on first use."""
+    if namespace not in _keyword_indexes:
+        with _lock:
+            if namespace not in _keyword_indexes:
+                script_dir = os.path.dirname(os.path.abspath(__file__))
+                _keyword_indexes[namespace] = BM25Index(os.path.join(script_dir, f"bm25_{namespace}.json"))
+    return _keyword_indexes[namespace]
+
+# On-disk cache so unchanged chunks and repeated queries skip the embeddings API
+_embedding_cache = None
+
+def get_embedding_cache():
+    """Return the embedding cache, opening it on first use."""
+    global _embedding_cache
+    if _embedding_cache is None:
+        with _lock:
+            if _embedding_cache is None:
+                _embedding_cache = EmbeddingCache()
+    return _embedding_cache
+
+# Maps chunk IDs to their byte span in the letters, so search hits read only the matched chunk
+_chunk_store = None
+
+def get_chunk_store():
+    """Return the chunk span store, opening it on first use."""
+    global _chunk_store
+    if _chunk_store is None:
+        with _lock:
+            if _chunk_store is None:
+                _chunk_store = ChunkStore(os.path.join(os.path.dirname(os.path.abspath(__file__)), "chunk_store.sqlite"))
+    return _chunk_store
+
+# Answers to earlier questions, reused for near-identical ones until the next ingestion
+_answer_cache = None
+
+def get_answer_cache():
+    """Return the answer cache, opening it on first use."""
+    global _answer_cache
+    if _answer_cache is None:
+        with _lock:
+            if _answer_cache is None:
+                _answer_cache = AnswerCache(os.path.join(os.path.dirname(os.path.abspath(__file__)), "answer_cache.sqlite"))
+    return _answer_cache
+
+# The openai and pinecone packages are imported, and their clients created, on first use.
+# get_openai_client returns the process's shared, pooled client (common/llm_clients.py)
+_index = None
+
+def get_index():
+    """Return the Pinecone index, creating the handle (and its connection pool) once."""
+    global _index
+    if _index is None:
+        with _lock:
+            if _index is None:
+                from pinecone import Pinecone
+                pc = Pinecone(api_key=os.environ.get("PINECONE_API_KEY"))
+                _index = pc.Index(INDEX_NAME)
+    return _index
+
+# load_documents and chunk_documents are generators, so they are not traced on their own:
+# LangSmith keeps every yielded item of a traced generator in memory. Their time shows
+# up in the embed_documents trace, which is where the chunks are consumed.
+def load_documents(paths=None):
+    """
+    Load text documents from the letters directory one at a time.
+    Large files are memory-mapped instead of read into memory.
+    """
     script_dir = os.path.dirname(os.path.abspath(__file__))
     path = os.path.join(script_dir, "letters/*.txt")
-    files = glob.glob(path)
-    
-    for file_path in files:
-        with open(file_path, 'r') as file:
-            content = file.read()
-            documents.append({"content": content, "metadata": {"source": file_path}})
+    count = 0
+    for doc in iter_documents(path, paths):
+        count += 1
+        yield doc
     
-    print(f"Found {len(documents)} letters")
-    return documents
+    print(f"Found {count} letters")
 
-@traceable(name="chunk_documents")
 def chunk_documents(documents, chunk_size=1000, chunk_overlap=200):
-    """Split documents into smaller chunks for better processing."""
-    chunks = []
-    
+    """
+    Split documents into smaller chunks for better processing, yielding them one at a time.
+    Each chunk records its byte span in the source file for the chunk store.
+    """
     for doc in documents:
-        content = doc["content"]
         metadata = doc["metadata"]
         
-        # Simple text splitting - you can implement more sophisticated chunking if needed
-        for i in range(0, len(content), chunk_size - chunk_overlap):
-            if i > 0:
-                start = i - chunk_overlap
-            else:
-                start = 0
-                
-            chunk_content = content[start:start + chunk_size]
-            if chunk_content:
-                chunks.append({"content": chunk_content, "metadata": metadata})
-    
-    return chunks
+        # Chunks end on sentence or paragraph boundaries and share up to chunk_overlap characters
+        for offset, length, chunk_content in iter_document_chunks(doc, chunk_size, chunk_overlap):
+            yield {"content": chunk_content, "metadata": metadata, "span": (offset, length)}
 
 @traceable(name="get_embeddings")
 def get_embeddings(texts: List[str]):
-    """Generate embeddings for a list of texts using OpenAI."""
-    response = openai.embeddings.create(
-        input=texts,
-        model=EMBEDDING_MODEL
-    )
-    return [embedding.embedding for embedding in response.data]
+    """Generate embeddings for a list of texts using OpenAI, reusing cached vectors."""
+    return get_embedding_cache().embed(texts, EMBEDDING_MODEL, None, request_embeddings)
+
+def request_embeddings(texts: List[str]):
+    """Call the OpenAI embeddings API for texts that are not cached yet, decoding into a float32 matrix."""
+    return embed_texts(texts, EMBEDDING_MODEL, client=get_openai_client())
+
+def embed_query(text):
+    """Embed one question."""
+    return get_embeddings([text])[0]
+
+def cached_embedding(text):
+    """The text's embedding if it was computed before, without calling the API; otherwise None."""
+    return get_embedding_cache().get_many(EMBEDDING_MODEL, None, [text])[0]
 
 @traceable(name="embed_documents")
 def embed_documents(chunks, namespace):
     """Embed documents and store them in Pinecone."""
     # Get Pinecone index
-    index = pc.Index(INDEX_NAME)
-    
-    # Prepare batches (Pinecone usually works well with batches of ~100)
-    batch_size = 100
-    for i in range(0, len(chunks), batch_size):
-        chunk_batch = chunks[i:i+batch_size]
-        
-        # Get text from each chunk
-        texts = [chunk["content"] for chunk in chunk_batch]
-        
-        # Get embeddings
-        embeddings = get_embeddings(texts)
-        
+    index = get_index()
+    keyword_index = get_keyword_index(namespace)
+
+    def upsert_batch(chunk_batch, embeddings):
         # Prepare data for Pinecone
         vectors = []
-        for j, embedding in enumerate(embeddings):
+        for chunk, embedding in zip(chunk_batch, embeddings):
             vectors.append({
-                "id": f"chunk_{i+j}",
-                "values": embedding,
-                "metadata": chunk_batch[j]["metadata"]
+                "id": chunk["id"],
+                "values": embedding.tolist(),  # Pinecone takes lists, not float32 arrays
+                "metadata": chunk["metadata"]
             })
-        
-        # Upsert to Pinecone
         index.upsert(vectors=vectors, namespace=namespace)
+        get_chunk_store().put_many((chunk["id"], chunk["metadata"]["source"]) + tuple(chunk["span"])
+                                   for chunk in chunk_batch)
+        for chunk in chunk_batch:
+            keyword_index.add(chunk["id"], chunk["content"], chunk["metadata"])
+
+    # Embedding and upserting overlap: batch N+1 is embedded while batch N is upserted.
+    # Pinecone usually works well with batches of ~100
+    numbered = ({**chunk, "id": f"chunk_{i}"} for i, chunk in enumerate(chunks))
+    ingest(numbered, get_embeddings, upsert_batch, batch_size=100)
+    keyword_index.save()
+
+    # Cached answers were built from the old index contents
+    get_answer_cache().invalidate(namespace)
+
+# The query embedding is left out of the trace's inputs
+@traceable(name="search_documents",
+           process_inputs=lambda inputs: {k: v for k, v in inputs.items() if k != "query_embedding"})
+def search_documents(query, namespace, top_k=5, mode=SEARCH_MODE, query_embedding=None):
+    """
+    Search for chunks matching the user query.
+
+    In "hybrid" mode the BM25 and Pinecone rankings are merged with reciprocal
+    rank fusion; when BM25 alone is confident the embedding call is skipped.
+    Pass query_embedding if the query was already embedded.
+    """
+    def vector_search(text, n):
+        embedding = get_embeddings([text])[0] if query_embedding is None else query_embedding
+        results = get_index().query(
+            vector=embedding.tolist(),  # Pinecone takes lists, not float32 arrays
+            top_k=max(n, MMR_FETCH_K) if SEARCH_MMR else n,
+            namespace=namespace,
+            include_metadata=True,
+            include_values=SEARCH_MMR
+        )
+        if SEARCH_MMR:
+            return mmr_rerank(embedding, results["matches"], n, MMR_LAMBDA)
+        return results["matches"]
+
+    keyword_index = get_keyword_index(namespace)
+    if not len(keyword_index):
+        # Indexed before the keyword index existed: vectors only
+        mode = "vector"
+    matches = hybrid_search(query, keyword_index, vector_search, top_k=top_k, mode=mode)
+
+    # Read just the matched chunks from the letters; hits on the same chunk are read once
+    chunk_texts = get_chunk_store().read([match["id"] for match in matches])
 
-@traceable(name="search_documents")
-def search_documents(query, namespace, top_k=5):
-    """Search the vector store with the user query."""
-    # Get query embedding
-    query_embedding = get_embeddings([query])[0]
-    
-    # Search Pinecone
-    index = pc.Index(INDEX_NAME)
-    results = index.query(
-        vector=query_embedding,
-        top_k=top_k,
-        namespace=namespace,
-        include_metadata=True,
-        include_values=False
-    )
-    
-    # Get matched documents
     docs_with_scores = []
-    for match in results["matches"]:
-        # Load the document content based on the source file
-        with open(match["metadata"]["source"], 'r') as f:
-            content = f.read()
+    letters = {}
+    for match in matches:
+        content = chunk_texts.get(match["id"])
+        if content is None:
+            # Chunk predates the chunk store, or its letter changed since: fall back to the whole letter
+            source = match["metadata"]["source"]
+            if source not in letters:
+                with open(source, 'r') as f:
+                    letters[source] = f.read()
+            content = letters[source]
         docs_with_scores.append((content, match["score"]))
     
     return docs_with_scores
 
-@traceable(
-        name="ask_openai",
-        project_name=langsmith_project,
-        run_type="llm"
-        )
-def ask_openai(query, documents):
-    """Ask OpenAI a question with context from the documents."""
-    # Join all documents into a single context string
-    context = "\n\n".join([doc for doc, _ in documents])
+def build_messages(query, documents):
+    """Build the chat messages for a question with context from the documents."""
+    # Merge overlapping chunks, drop repeated text and fill the token budget in score order
+    context = pack_context(documents, CONTEXT_TOKENS, count_chat_tokens).text
     
-    # Create messages for OpenAI
-    messages = [
+    return [
         {"role": "system", "content": "Provide an answer to the user's query about Berkshire Hathaway."
                               "Documents from the Berkshire Hathaway shareholder meetings will be provided."
                               "Use those documents to best answer the question."},
         {"role": "system", "content": f"Documents: {context}"},
         {"role": "user", "content": query}
     ]
-    
+
+@traceable(
+        name="ask_openai",
+        project_name=langsmith_project,
+        run_type="llm"
+        )
+def ask_openai(query, documents):
+    """Ask OpenAI a question with context from the documents."""
     # Use LangSmith wrapper for OpenAI client
-    response = openai.chat.completions.create(
+    response = get_openai_client().chat.completions.create(
         model=CHAT_MODEL,
-        messages=messages
+        messages=build_messages(query, documents)
     )
     
     return response.choices[0].message.content
 
+@traceable(
+        name="ask_openai_stream",
+        project_name=langsmith_project,
+        run_type="llm",
+        reduce_fn=lambda pieces: {"output": "".join(pieces)}
+        )
+def ask_openai_stream(query, documents):
+    """
+    Like ask_openai, but yield the answer text as it arrives.
+    Time to first token and tokens/sec are added to the trace's metadata.
+    """
+    stream = stream_chat_completion(
+        get_openai_client().chat.completions.create,
+        model=CHAT_MODEL,
+        messages=build_messages(query, documents)
+    )
+    yield from stream
+    run = current_run()
+    if run is not None:
+        run.add_metadata(stream.stats())
+    print(f"\n{stream.summary()}")
+
+def answer_query(query, namespace, stream=False):
+    """
+    Answer a question, reusing the cached answer to a near-identical earlier question.
+    With stream=True, returns an iterator over the answer text instead of a string.
+    """
+    if stream:
+        return answer_query_stream(query, namespace)
+    return answer_query_text(query, namespace)
+
+@traceable(name="answer_query")
+def answer_query_text(query, namespace):
+    """Answer a question in one piece."""
+    # Embeds the question only if its exact text isn't cached
+    answer, query_embedding = get_answer_cache().lookup(query, namespace, CHAT_MODEL, embed_query)
+    if answer is not None:
+        return answer
+
+    docs_and_scores = search_documents(query=query, namespace=namespace, query_embedding=query_embedding)
+    if query_embedding is None:
+        # Reuse the vector search's embedding if it ran; a lexical match is cached by its text only
+        query_embedding = cached_embedding(query)
+    answer = ask_openai(query, docs_and_scores)
+    get_answer_cache().put(query, query_embedding, answer, namespace, CHAT_MODEL)
+    return answer
+
+# A generator, so the run stays open while the answer streams and ask_openai_stream is traced inside it
+@traceable(name="answer_query", reduce_fn=lambda pieces: {"output": "".join(pieces)})
+def answer_query_stream(query, namespace):
+    """Answer a question, yielding the answer text as it arrives."""
+    # Embeds the question only if its exact text isn't cached
+    answer, query_embedding = get_answer_cache().lookup(query, namespace, CHAT_MODEL, embed_query)
+    if answer is not None:
+        yield answer
+        return
+
+    docs_and_scores = search_documents(query=query, namespace=namespace, query_embedding=query_embedding)
+    if query_embedding is None:
+        # Reuse the vector search's embedding if it ran; a lexical match is cached by its text only
+        query_embedding = cached_embedding(query)
+    yield from get_answer_cache().store_stream(ask_openai_stream(query, docs_and_scores),
+                                               query, query_embedding, namespace, CHAT_MODEL)
+
 if __name__ == "__main__":
     # Step 2: Write a query
     user_query = "When did Berkshire Hathaway purchase it's first coke stock?" # Year: 1988
 
-    # Step 3: Check Pinecone for similar chunks
-    docs_and_scores = search_documents(query=user_query, namespace="chunks")
-    
-    # Step 4: Put docs into prompt and send to OpenAI
-    response = ask_openai(user_query, docs_and_scores)
-        
-    print(response) 
\ No newline at end of file
+    # Step 3: Check Pinecone for similar chunks and put them into a prompt for OpenAI.
+    # A near-identical question asked before is answered from the answer cache instead.
+    if STREAM_ANSWERS:
+        # Print the answer as it is generated
+        for text in answer_query(user_query, namespace="chunks", stream=True):
+            print(text, end="", flush=True)
+        print()
+    else:
+        response = answer_query(user_query, namespace="chunks")
+        print(response)
@@ -1,100 +1,206 @@
+import itertools
 import os
-import glob
-import openai
-from pinecone import Pinecone
-from typing import List, Dict, Any
-from langsmith import Client, traceable
+import sys
+import threading
+from typing import List, Dict, Any, Iterable
 import time
 
-# Initialize OpenAI client
-openai.api_key = os.environ.get("OPENAI_API_KEY")
-if not openai.api_key:
-    raise ValueError("OPENAI_API_KEY environment variable not set")
+# Make the repository's shared `common` package importable when run as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+from common.answer_cache import AnswerCache
+from common.batch_embedder import make_token_counter
+from common.batch_upserter import BatchUpserter
+from common.bm25 import BM25Index, hybrid_search
+from common.chat_stream import stream_chat_completion
+from common.chunk_store import ChunkStore
+from common.chunking import iter_document_chunks
+from common.context_packer import pack_context
+from common.document_stream import iter_documents
+from common.embedding_cache import EmbeddingCache
+from common.ingest_pipeline import StageStats, ingest
+from common.llm_clients import get_openai_client
+from common.mmr import mmr_rerank
+from common.openai_embeddings import embed_texts
+from common.tracing import current_run, traceable
 
-# Initialize Pinecone client
-pinecone_api_key = os.environ.get("PINECONE_API_KEY")
-if not pinecone_api_key:
-    raise ValueError("PINECONE_API_KEY environment variable not set")
+# The openai, pinecone and langsmith packages are imported, and their clients
+# created, on first use, so importing this module (e.g. from serve.py) is quick
 
-pc = Pinecone(api_key=pinecone_api_key)
-
-# LangSmith client setup
+# LangSmith setup; traced functions import langsmith on their first call while tracing is on
 langsmith_api_key = os.environ.get("LANGCHAIN_API_KEY")
 langsmith_project = "rag-observability"
-if langsmith_api_key:
-    langsmith_client = Client(api_key=langsmith_api_key)
-    print("LangSmith client initialized successfully")
-else:
+if not langsmith_api_key:
     print("Warning: LANGCHAIN_API_KEY not set. LangSmith tracing will be disabled.")
 
 # Constants
 INDEX_NAME = "observability-test"
+INDEX_HOST = os.environ.get("PINECONE_INDEX_HOST", "observability-test-gyip7p4.svc.aped-4627-b74a.pinecone.io")
 EMBEDDING_MODEL = "text-embedding-3-small"
 CHAT_MODEL = "gpt-4o-mini-2024-07-18"
+# Token budget for the retrieved text sent with each question
+CONTEXT_TOKENS = int(os.environ.get("CONTEXT_TOKENS", "3000"))
+count_chat_tokens = make_token_counter(CHAT_MODEL)
+# Print answers token by token as they are generated (set to 0 to wait for the full answer)
+STREAM_ANSWERS = os.environ.get("STREAM_ANSWERS", "1") == "1"
+FALLBACK_ANSWER = "I'm sorry, I encountered an error while processing your request. Please try again later."
+
+# Retrieval: "hybrid" (BM25 + vectors fused with RRF), "vector" or "lexical"
+SEARCH_MODE = os.environ.get("SEARCH_MODE", "hybrid")
+# Re-select vector hits by maximal marginal relevance so near-duplicate chunks don't crowd the prompt
+SEARCH_MMR = os.environ.get("SEARCH_MMR", "1") == "1"
+MMR_FETCH_K = 20  # Candidates fetched, with their vectors, before MMR picks from them
+MMR_LAMBDA = float(os.environ.get("MMR_LAMBDA", "0.7"))  # 1.0 = relevance only
+
+# serve.py calls the getters from several threads, so creation is locked;
+# re-entrant because get_index creates the client too
+_lock = threading.RLock()
+_keyword_indexes = {}
+
+def get_keyword_index(namespace):
+    """Return the BM25 index for a namespace, loading it from disk on first use."""
+    if namespace not in _keyword_indexes:
+        with _lock:
+            if namespace not in _keyword_indexes:
+                script_dir = os.path.dirname(os.path.abspath(__file__))
+                _keyword_indexes[namespace] = BM25Index(os.path.join(script_dir, f"bm25_{namespace}.json"))
+    return _keyword_indexes[namespace]
+
+# On-disk cache so unchanged chunks and repeated queries skip the embeddings API
+_embedding_cache = None
+
+def get_embedding_cache():
+    """Return the embedding cache, opening it on first use."""
+    global _embedding_cache
+    if _embedding_cache is None:
+        with _lock:
+            if _embedding_cache is None:
+                _embedding_cache = EmbeddingCache()
+    return _embedding_cache
+
+# Maps chunk IDs to their byte span in the letters, so search hits read only the matched chunk
+_chunk_store = None
+
+def get_chunk_store():
+    """Return the chunk span store, opening it on first use."""
+    global _chunk_store
+    if _chunk_store is None:
+        with _lock:
+            if _chunk_store is None:
+                _chunk_store = ChunkStore(os.path.join(os.path.dirname(os.path.abspath(__file__)), "chunk_store.sqlite"))
+    return _chunk_store
+
+# Answers to earlier questions, reused for near-identical ones until the next ingestion
+_answer_cache = None
 
-@traceable(name="load_documents")
-def load_documents():
-    """Load all text documents from the letters directory."""
-    documents = []
+def get_answer_cache():
+    """Return the answer cache, opening it on first use."""
+    global _answer_cache
+    if _answer_cache is None:
+        with _lock:
+            if _answer_cache is None:
+                _answer_cache = AnswerCache(os.path.join(os.path.dirname(os.path.abspath(__file__)), "answer_cache.sqlite"))
+    return _answer_cache
+
+_pinecone_client = None
+_index = None
+
+def get_pinecone_client():
+    """Return the Pinecone client, creating it on first use."""
+    global _pinecone_client
+    if _pinecone_client is None:
+        with _lock:
+            if _pinecone_client is None:
+                from pinecone import Pinecone
+                api_key = os.environ.get("PINECONE_API_KEY")
+                if not api_key:
+                    raise ValueError("PINECONE_API_KEY environment variable not set")
+                _pinecone_client = Pinecone(api_key=api_key)
+    return _pinecone_client
+
+def get_index():
+    """
+    Return the Pinecone index used for queries, connecting once.
+    The handle keeps its connection pool open, so later queries skip the connection setup.
+    """
+    global _index
+    if _index is None:
+        with _lock:
+            if _index is None:
+                _index = get_pinecone_client().Index(INDEX_NAME, host=INDEX_HOST)
+    return _index
+
+def warm_up():
+    """Connect to the index and check it once, before the first question arrives."""
+    try:
+        stats = get_index().describe_index_stats()
+        print(f"Successfully connected to index: {INDEX_NAME}")
+        print(f"Index stats: {stats}")
+    except Exception as e:
+        print(f"Error connecting to index: {e}")
+        print("Please verify your API key and endpoint URL.")
+
+# load_documents and chunk_documents are generators, so they are not traced on their own:
+# LangSmith keeps every yielded item of a traced generator in memory. Their time shows
+# up in the embed_documents trace, which is where the chunks are consumed.
+def load_documents(paths=None):
+    """
+    Load text documents from the letters directory one at a time.
+    Large files are memory-mapped instead of read into memory.
+    """
     script_dir = os.path.dirname(os.path.abspath(__file__))
     path = os.path.join(script_dir, "letters/*.txt")
-    files = glob.glob(path)
-    
-    for file_path in files:
-        with open(file_path, 'r') as file:
-            content = file.read()
-            documents.append({"content": content, "metadata": {"source": file_path}})
+    count = 0
+    for doc in iter_documents(path, paths):
+        count += 1
+        yield doc
     
-    print(f"Found {len(documents)} letters")
-    return documents
+    print(f"Found {count} letters")
 
-@traceable(name="chunk_documents")
 def chunk_documents(documents, chunk_size=1000, chunk_overlap=200):
-    """Split documents into smaller chunks for better processing."""
-    chunks = []
-    
+    """
+    Split documents into smaller chunks for better processing, yielding them one at a time.
+    Each chunk records its byte span in the source file for the chunk store.
+    """
     for doc in documents:
-        content = doc["content"]
         metadata = doc["metadata"]
         
-        # Simple text splitting - you can implement more sophisticated chunking if needed
-        for i in range(0, len(content), chunk_size - chunk_overlap):
-            if i > 0:
-                start = i - chunk_overlap
-            else:
-                start = 0
-                
-            chunk_content = content[start:start + chunk_size]
-            if chunk_content:
-                chunks.append({"content": chunk_content, "metadata": metadata})
-    
-    return chunks
+        # Chunks end on sentence or paragraph boundaries and share up to chunk_overlap characters
+        for offset, length, chunk_content in iter_document_chunks(doc, chunk_size, chunk_overlap):
+            yield {"content": chunk_content, "metadata": metadata, "span": (offset, length)}
 
 @traceable(name="get_embeddings")
 def get_embeddings(texts: List[str]):
-    """Generate embeddings for a list of texts using OpenAI."""
-    response = openai.embeddings.create(
-        input=texts,
-        model=EMBEDDING_MODEL
-    )
-    return [embedding.embedding for embedding in response.data]
+    """Generate embeddings for a list of texts using OpenAI, reusing cached vectors."""
+    return get_embedding_cache().embed(texts, EMBEDDING_MODEL, None, request_embeddings)
+
+def request_embeddings(texts: List[str]):
+    """Call the OpenAI embeddings API for texts that are not cached yet, decoding into a float32 matrix."""
+    return embed_texts(texts, EMBEDDING_MODEL, client=get_openai_client())
+
+def embed_query(text):
+    """Embed one question."""
+    return get_embeddings([text])[0]
+
+def cached_embedding(text):
+    """The text's embedding if it was computed before, without calling the API; otherwise None."""
+    return get_embedding_cache().get_many(EMBEDDING_MODEL, None, [text])[0]
 
 @traceable(name="embed_documents")
-def embed_documents(chunks: List[Dict[str, Any]], namespace: str) -> None:
+def embed_documents(chunks: Iterable[Dict[str, Any]], namespace: str) -> Dict[str, StageStats]:
     """
     Embed documents and store them in Pinecone.
     
     Args:
-        chunks: List of document chunks with content and metadata
+        chunks: Document chunks with content and metadata; may be a lazy generator
         namespace: Pinecone namespace to store the vectors
+
+    Returns:
+        Per-stage ingestion statistics
     """
-    if not chunks:
-        print("No chunks to process")
-        return
-        
+
     # Get Pinecone index
     try:
-        index = pc.Index(INDEX_NAME)
+        index = get_pinecone_client().Index(INDEX_NAME)
         print(f"Connected to Pinecone index: {INDEX_NAME}")
         
         # Get index stats
@@ -102,100 +208,112 @@ def embed_documents(chunks: List[Dict[str, Any]], namespace: str) -> None:
         print(f"Index dimensions: {stats.dimension}")
         print(f"Total vectors: {stats.total_vector_count}")
         
-        # Prepare batches (Pinecone usually works well with batches of ~100)
-        batch_size = 100
-        total_batches = (len(chunks) + batch_size - 1) // batch_size
-        
-        for i in range(0, len(chunks), batch_size):
-            batch_num = (i // batch_size) + 1
-            chunk_batch = chunks[i:i + batch_size]
-            
-            print(f"\nProcessing batch {batch_num}/{total_batches} with {len(chunk_batch)} chunks")
-            
-            # Get text from each chunk
-            texts = [chunk["content"] for chunk in chunk_batch]
-            
+        keyword_index = get_keyword_index(namespace)
+        # Buffers vectors across pipeline batches, so every request but the last is full
+        upserter = BatchUpserter(index.upsert, max_concurrency=4, max_retries=3, verbose=False)
+        max_retries = 3
+
+        def embed_batch(texts):
             # Get embeddings with retry logic
-            max_retries = 3
             for attempt in range(max_retries):
                 try:
-                    print(f"  Getting embeddings (attempt {attempt + 1}/{max_retries})...")
-                    embeddings = get_embeddings(texts)
-                    break
+                    return get_embeddings(texts)
                 except Exception as e:
                     if attempt == max_retries - 1:
                         print(f"  Failed to get embeddings after {max_retries} attempts: {e}")
-                        return
-                    print(f"  Attempt {attempt + 1} failed, retrying...")
+                        raise
+                    print(f"  Embedding attempt {attempt + 1} failed, retrying...")
                     time.sleep(2 ** attempt)  # Exponential backoff
-            
+
+        def upsert_batch(chunk_batch, embeddings):
             # Prepare data for Pinecone
             vectors = []
-            for j, embedding in enumerate(embeddings):
-                vector_id = f"chunk_{i + j}"
-                metadata = chunk_batch[j].get("metadata", {})
+            for chunk, embedding in zip(chunk_batch, embeddings):
+                metadata = chunk.get("metadata", {})
                 metadata["source"] = metadata.get("source", "unknown")
                 
                 vectors.append({
-                    "id": vector_id,
-                    "values": embedding,
+                    "id": chunk["id"],
+                    "values": embedding.tolist(),  # Pinecone takes lists, not float32 arrays
                     "metadata": metadata
                 })
             
-            # Upsert to Pinecone with retry logic
-            for attempt in range(max_retries):
-                try:
-                    print(f"  Upserting {len(vectors)} vectors to namespace '{namespace}'...")
-                    result = index.upsert(vectors=vectors, namespace=namespace)
-                    print(f"  Successfully upserted batch {batch_num}/{total_batches}")
-                    if hasattr(result, 'upserted_count'):
-                        print(f"  Upserted {result.upserted_count} vectors")
-                    break
-                except Exception as e:
-                    if attempt == max_retries - 1:
-                        print(f"  Failed to upsert after {max_retries} attempts: {e}")
-                        return
-                    print(f"  Attempt {attempt + 1} failed, retrying...")
-                    time.sleep(2 ** attempt)  # Exponential backoff
+            # Requests are sized by payload bytes and sent in parallel; only failed ones are retried
+            sent = upserter.add(vectors, namespace=namespace)
+            get_chunk_store().put_many((chunk["id"], chunk["metadata"]["source"]) + tuple(chunk["span"])
+                                       for chunk in chunk_batch)
+            for chunk in chunk_batch:
+                keyword_index.add(chunk["id"], chunk["content"], chunk["metadata"])
+            print(f"  Added {len(vectors)} vectors for namespace '{namespace}', upserted {sent}")
+
+        # Chunking, embedding and upserting run as overlapping stages with bounded queues.
+        # Pinecone usually works well with batches of ~100
+        numbered = ({**chunk, "id": f"chunk_{i}"} for i, chunk in enumerate(chunks))
+        # Leaving the with block sends the buffered rest and stops the upsert threads
+        with upserter:
+            stage_stats = ingest(numbered, embed_batch, upsert_batch, batch_size=100,
+                                 embed_concurrency=2, upsert_concurrency=4)
+        print(upserter.summary())
+        keyword_index.save()
+
+        # Cached answers were built from the old index contents
+        get_answer_cache().invalidate(namespace)
+        return stage_stats
     
     except Exception as e:
         print(f"Error in embed_documents: {e}")
         raise
 
-@traceable(name="search_documents")
-def search_documents(query, namespace, top_k=5):
-    """Search the vector store with the user query."""
-    # Get query embedding
-    query_embedding = get_embeddings([query])[0]
-    
-    # Connect to Pinecone index
-    index = pc.Index(INDEX_NAME, 
-    host="observability-test-gyip7p4.svc.aped-4627-b74a.pinecone.io")
+# The query embedding is left out of the trace's inputs
+@traceable(name="search_documents",
+           process_inputs=lambda inputs: {k: v for k, v in inputs.items() if k != "query_embedding"})
+def search_documents(query, namespace, top_k=5, mode=SEARCH_MODE, query_embedding=None):
+    """
+    Search for chunks matching the user query.
 
-    # Verify the index connection
-    try:
-        stats = index.describe_index_stats()
-        print(f"Successfully connected to index: {INDEX_NAME}")
-        print(f"Index stats: {stats}")
-    except Exception as e:
-        print(f"Error connecting to index: {e}")
-        print("Please verify your API key and endpoint URL.")
+    In "hybrid" mode the BM25 and Pinecone rankings are merged with reciprocal
+    rank fusion; when BM25 alone is confident the embedding call and the
+    Pinecone query are skipped.
+    Pass query_embedding if the query was already embedded.
+    """
+    def vector_search(text, n):
+        # Get query embedding
+        embedding = get_embeddings([text])[0] if query_embedding is None else query_embedding
+
+        # Search Pinecone
+        results = get_index().query(
+            vector=embedding.tolist(),  # Pinecone takes lists, not float32 arrays
+            top_k=max(n, MMR_FETCH_K) if SEARCH_MMR else n,
+            namespace=namespace,
+            include_metadata=True,
+            include_values=SEARCH_MMR
+        )
+        if SEARCH_MMR:
+            return mmr_rerank(embedding, results["matches"], n, MMR_LAMBDA)
+        return results["matches"]
+
+    keyword_index = get_keyword_index(namespace)
+    if not len(keyword_index):
+        # Indexed before the keyword index existed: vectors only
+        mode = "vector"
+    matches = hybrid_search(query, keyword_index, vector_search, top_k=top_k, mode=mode)
+    if matches:
+        print(f"Retrieval: {matches[0]['retrieval']}")
+
+    # Read just the matched chunks from the letters; hits on the same chunk are read once
+    chunk_texts = get_chunk_store().read([match["id"] for match in matches])
 
-    # Search Pinecone
-    results = index.query(
-        vector=query_embedding,
-        top_k=top_k,
-        namespace=namespace,
-        include_metadata=True,
-        include_values=False
-    )
-    
-    # Get matched documents
     docs_with_scores = []
-    for match in results["matches"]:
-        # Load the document content based on the source file
-        with open(match["metadata"]["source"], 'r') as f:
-            content = f.read()
+    letters = {}
+    for match in matches:
+        content = chunk_texts.get(match["id"])
+        if content is None:
+            # Chunk predates the chunk store, or its letter changed since: fall back to the whole letter
+            source = match["metadata"]["source"]
+            if source not in letters:
+                with open(source, 'r') as f:
+                    letters[source] = f.read()
+            content = letters[source]
         docs_with_scores.append((content, match["score"]))
     
     return docs_with_scores
@@ -203,6 +321,25 @@ def search_documents(query, namespace, top_k=5):
 # TODO: Add traceable decorator to track this function in LangSmith
 # Example: https://docs.smith.langchain.com/observability/how_to_guides/log_traces_to_project
 
+def build_messages(query, documents):
+    """Build the chat messages for a question with context from the documents."""
+    # Merge overlapping chunks, drop repeated text and fill the token budget in score order
+    packed = pack_context(documents, CONTEXT_TOKENS, count_chat_tokens, separator="\n---\n")
+    print(packed.summary())
+    context = packed.text
+    
+    return [
+        {
+            "role": "system",
+            "content": "You are an AI assistant that answers questions about Berkshire Hathaway "
+                      "using provided shareholder letters. Be concise and accurate in your responses."
+        },
+        {
+            "role": "user",
+            "content": f"Context from shareholder letters:\n{context}\n\nQuestion: {query}"
+        }
+    ]
+
 @traceable(
     run_type="llm",
     name="ask_openai",
@@ -218,34 +355,13 @@ def ask_openai(query, documents, max_retries=3, initial_backoff=1):
         max_retries: Maximum number of retry attempts
         initial_backoff: Initial backoff time in seconds
     """
-    # Sort documents by score (highest first) and take top 3
-    sorted_docs = sorted(documents, key=lambda x: x[1], reverse=True)[:3]
-    
-    # Join top documents with a separator
-    context = "\n---\n".join([doc for doc, _ in sorted_docs])
-    
-    # Truncate context to avoid hitting token limits
-    max_context_length = 8000  # Conservative limit to stay under token limits
-    if len(context) > max_context_length:
-        context = context[:max_context_length] + "... [content truncated]"
-    
-    # Create messages for OpenAI
-    messages = [
-        {
-            "role": "system",
-            "content": "You are an AI assistant that answers questions about Berkshire Hathaway "
-                      "using provided shareholder letters. Be concise and accurate in your responses."
-        },
-        {
-            "role": "user",
-            "content": f"Context from shareholder letters:\n{context}\n\nQuestion: {query}"
-        }
-    ]
+    import openai
+    messages = build_messages(query, documents)
     
     # Implement retry logic with exponential backoff
     for attempt in range(max_retries):
         try:
-            response = openai.chat.completions.create(
+            response = get_openai_client().chat.completions.create(
                 model=CHAT_MODEL,
                 messages=messages,
                 temperature=0.3,  # Lower temperature for more focused answers
@@ -265,11 +381,126 @@ def ask_openai(query, documents, max_retries=3, initial_backoff=1):
         except Exception as e:
             print(f"Error in OpenAI API call: {str(e)}")
             if attempt == max_retries - 1:
-                return "I'm sorry, I encountered an error while processing your request. Please try again later."
+                return FALLBACK_ANSWER
             time.sleep(initial_backoff * (2 ** attempt))
 
+@traceable(
+    run_type="llm",
+    name="ask_openai_stream",
+    project_name=langsmith_project,
+    reduce_fn=lambda pieces: {"output": "".join(pieces)}
+)
+def ask_openai_stream(query, documents, max_retries=3, initial_backoff=1):
+    """
+    Like ask_openai, but yield the answer text as it arrives.
+    
+    Starting the request is retried like ask_openai; once text has been shown
+    an error can't be replaced by an apology, so the last failure is raised.
+    Time to first token and tokens/sec are added to the trace's metadata.
+    
+    Args:
+        query: The user's question
+        documents: List of (document_text, score) tuples
+        max_retries: Maximum number of retry attempts
+        initial_backoff: Initial backoff time in seconds
+    """
+    messages = build_messages(query, documents)
+    
+    for attempt in range(max_retries):
+        try:
+            stream = stream_chat_completion(
+                get_openai_client().chat.completions.create,
+                model=CHAT_MODEL,
+                messages=messages,
+                temperature=0.3,  # Lower temperature for more focused answers
+                max_tokens=500    # Limit response length
+            )
+            break
+        except Exception as e:
+            if attempt == max_retries - 1:
+                raise
+            backoff_time = initial_backoff * (2 ** attempt)
+            print(f"Error starting the answer stream: {e}. Retrying in {backoff_time} seconds... "
+                  f"(Attempt {attempt + 1}/{max_retries})")
+            time.sleep(backoff_time)
+    
+    yield from stream
+    run = current_run()
+    if run is not None:
+        run.add_metadata(stream.stats())
+    print(f"\n{stream.summary()}")
+
+def answer_query(query, namespace, stream=False):
+    """
+    Answer a question, reusing the cached answer to a near-identical earlier question.
+    With stream=True, returns an iterator over the answer text instead of a string.
+
+    Returns None when no matching documents are found.
+    """
+    if not stream:
+        return answer_query_text(query, namespace)
+    pieces = answer_query_stream(query, namespace)
+    # Runs the cache lookup and the search, so a question without documents still gets None
+    first = next(pieces, None)
+    if first is None:
+        return None
+    return itertools.chain([first], pieces)
+
+@traceable(name="answer_query")
+def answer_query_text(query, namespace):
+    """Answer a question in one piece, or return None when no matching documents are found."""
+    # Embeds the question only if its exact text isn't cached
+    answer, query_embedding = get_answer_cache().lookup(query, namespace, CHAT_MODEL, embed_query)
+    if answer is not None:
+        print("Answer cache hit")
+        return answer
+
+    docs_and_scores = find_documents(query, namespace, query_embedding)
+    if not docs_and_scores:
+        return None
+    if query_embedding is None:
+        # Reuse the vector search's embedding if it ran; a lexical match is cached by its text only
+        query_embedding = cached_embedding(query)
+
+    answer = ask_openai(query, docs_and_scores)
+    # Don't keep serving the apology after a transient API failure
+    if answer != FALLBACK_ANSWER:
+        get_answer_cache().put(query, query_embedding, answer, namespace, CHAT_MODEL)
+    return answer
+
+# A generator, so the run stays open while the answer streams and ask_openai_stream is traced inside it
+@traceable(name="answer_query", reduce_fn=lambda pieces: {"output": "".join(pieces)})
+def answer_query_stream(query, namespace):
+    """Answer a question, yielding the answer text as it arrives; yields nothing without matching documents."""
+    # Embeds the question only if its exact text isn't cached
+    answer, query_embedding = get_answer_cache().lookup(query, namespace, CHAT_MODEL, embed_query)
+    if answer is not None:
+        print("Answer cache hit")
+        yield answer
+        return
+
+    docs_and_scores = find_documents(query, namespace, query_embedding)
+    if not docs_and_scores:
+        return
+    if query_embedding is None:
+        # Reuse the vector search's embedding if it ran; a lexical match is cached by its text only
+        query_embedding = cached_embedding(query)
+    yield from get_answer_cache().store_stream(ask_openai_stream(query, docs_and_scores),
+                                               query, query_embedding, namespace, CHAT_MODEL)
+
+def find_documents(query, namespace, query_embedding):
+    """Search for the question's documents, reporting what was found."""
+    docs_and_scores = search_documents(query=query, namespace=namespace, query_embedding=query_embedding)
+    if not docs_and_scores:
+        print("No matching documents found.")
+        return docs_and_scores
+    print(f"\nFound {len(docs_and_scores)} relevant documents")
+    print("\nGenerating response...")
+    return docs_and_scores
+
 def create_or_get_index():
     """Ensure the Pinecone index exists and return it."""
+    pc = get_pinecone_client()
     try:
         # Get the correct dimension for the embedding model
         embedding_dimension = 1536  # text-embedding-3-small uses 1536 dimensions
@@ -313,45 +544,42 @@ if __name__ == "__main__":
         print("Initializing Pinecone...")
         index = create_or_get_index()
         
-        # Step 2: Load and prepare documents
+        # Step 2: Load and prepare documents (lazily, one letter at a time)
         print("\nLoading documents...")
         documents = load_documents()
-        print(f"Loaded {len(documents)} documents")
         
-        if not documents:
-            print("No documents found. Please check the 'letters' directory.")
-            exit(1)
-        
-        # Step 3: Chunk documents
-        print("\nChunking documents...")
+        # Step 3: Chunk documents as they are loaded
         chunks = chunk_documents(documents)
-        print(f"Created {len(chunks)} chunks")
         
-        # Step 4: Embed and store in Pinecone
-        print("\nEmbedding and storing documents in Pinecone...")
-        embed_documents(chunks, namespace="chunks")
+        # Step 4: Embed and store in Pinecone while the chunks stream in
+        print("\nChunking, embedding and storing documents in Pinecone...")
+        stats = embed_documents(chunks, namespace="chunks")
+        
+        if not stats["chunk"].items:
+            print("No documents found. Please check the 'letters' directory.")
+            exit(1)
         
-        # Step 5: Search with a query
+        # Step 5: Search with a query and get an answer from OpenAI.
+        # A near-identical question asked before is answered from the answer cache instead.
         user_query = "When did Berkshire Hathaway purchase its first Coke stock?"  # Year: 1988
         print(f"\nSearching for: {user_query}")
         
-        docs_and_scores = search_documents(query=user_query, namespace="chunks")
+        response = answer_query(user_query, namespace="chunks", stream=STREAM_ANSWERS)
         
-        if not docs_and_scores:
-            print("No matching documents found.")
+        if response is None:
             exit(1)
-            
-        print(f"\nFound {len(docs_and_scores)} relevant documents")
-        
-        # Step 6: Get answer from OpenAI
-        print("\nGenerating response...")
-        response = ask_openai(user_query, docs_and_scores)
         
         print("\n" + "="*80)
         print("QUESTION:", user_query)
         print("="*80)
         print("\nANSWER:")
-        print(response)
+        if STREAM_ANSWERS:
+            # Print the answer as it is generated
+            for text in response:
+                print(text, end="", flush=True)
+            print()
+        else:
+            print(response)
         print("\n" + "="*80)
         
     except Exception as e:
@@ -12,10 +12,14 @@ Each step includes human verification and modification options.
 import json
 from typing import Dict, Optional, List
 from dataclasses import dataclass
-from openai import OpenAI
 import os
+import sys
 from pydantic import BaseModel, Field
 
+# Make the repository's shared `common` package importable when run as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+from common.llm_clients import get_openai_client
+
 @dataclass
 class TripPlan:
     """Represents a complete trip plan."""
@@ -37,7 +41,7 @@ class Itinerary(BaseModel):
 
 class TripPlanner:
     def __init__(self):
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.client = get_openai_client()
         self.trip_plan = None
 
     def suggest_destination(self) -> str:
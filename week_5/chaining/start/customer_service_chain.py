@@ -14,11 +14,12 @@ Requirements:
 """
 
 import os
+import sys
 from typing import Dict, List, Optional
-import openai
 
-# Configure your OpenAI API key (in a real app, use environment variables)
-openai.api_key = os.environ.get("OPENAI_API_KEY")
+# Make the repository's shared `common` package importable when run as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+from common.llm_clients import get_openai_client
 
 class CustomerServiceChain:
     """
@@ -39,7 +40,7 @@ class CustomerServiceChain:
         Returns:
             A title summarizing the conversation topic
         """
-        response = openai.chat.completions.create(
+        response = get_openai_client().chat.completions.create(
             model="gpt-4o-mini-2024-07-18",
             messages=[
                 {"role": "system", "content": "You are a customer service assistant. Create a short, descriptive title (max 5 words) for this customer inquiry."},
@@ -58,7 +59,7 @@ class CustomerServiceChain:
         Returns:
             A dictionary containing analysis components
         """
-        response = openai.chat.completions.create(
+        response = get_openai_client().chat.completions.create(
             model="gpt-4o-mini-2024-07-18",
             messages=[
                 {"role": "system", "content": """Analyze the customer's question and provide:
@@ -82,7 +83,7 @@ class CustomerServiceChain:
         Returns:
             A strategy for crafting the response
         """
-        response = openai.chat.completions.create(
+        response = get_openai_client().chat.completions.create(
             model="gpt-4o-mini-2024-07-18",
             messages=[
                 {"role": "system", "content": "Based on the analysis, create a response strategy that addresses the customer's needs while maintaining a professional and empathetic tone."},
@@ -102,7 +103,7 @@ class CustomerServiceChain:
         Returns:
             The final response to send to the customer
         """
-        response = openai.chat.completions.create(
+        response = get_openai_client().chat.completions.create(
             model="gpt-4o-mini-2024-07-18",
             messages=[
                 {"role": "system", "content": "Write a professional, helpful response to the customer's question. Be concise but thorough."},
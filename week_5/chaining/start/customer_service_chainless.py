@@ -11,11 +11,12 @@ Requirements:
 """
 
 import os
+import sys
 from typing import Dict, List, Optional
-import openai
 
-# Configure your OpenAI API key (in a real app, use environment variables)
-openai.api_key = os.environ.get("OPENAI_API_KEY")
+# Make the repository's shared `common` package importable when run as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+from common.llm_clients import get_openai_client
 
 class CustomerServiceChainless:
     """
@@ -37,7 +38,7 @@ class CustomerServiceChainless:
             A dictionary containing all components of the response
         """
         # Try to do everything in one prompt (this is not the best approach!)
-        response = openai.chat.completions.create(
+        response = get_openai_client().chat.completions.create(
             model="gpt-4o-mini-2024-07-18",
             messages=[
                 {"role": "system", "content": """You are a customer service assistant. For the given customer question: